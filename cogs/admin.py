@@ -0,0 +1,228 @@
+import discord
+from discord.ext import commands
+import asyncio
+import logging
+from datetime import datetime
+from config import Config
+from core.ratelimit import parse_limit
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger('AdminCog')
+
+class AdminCog(commands.Cog):
+    # Owner-only, so exempt from command rate limits
+    rate_limited = False
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = Config
+
+    async def cog_check(self, ctx):
+        """Admin commands are restricted to the bot owner"""
+        return await self.bot.is_owner(ctx.author)
+
+    @commands.command(name='reload', aliases=['rl'])
+    async def reload_cog(self, ctx, extension: str = 'all'):
+        """Reload a cog without restarting, keeping its in-memory state"""
+        if extension == 'all':
+            names = list(self.bot.extensions)
+        else:
+            name = extension if extension.startswith('cogs.') else f'cogs.{extension}'
+            if name not in self.bot.extensions:
+                await ctx.send(f"❌ Extension '{extension}' is not loaded!")
+                return
+            names = [name]
+
+        lines = []
+        total = 0.0
+        for name in names:
+            try:
+                elapsed, restored = await self.bot.reload_extension_with_state(name)
+            except commands.ExtensionError as e:
+                logger.error(f"Failed to reload {name}: {e}")
+                lines.append(f"❌ `{name}`: {e}")
+                continue
+
+            total += elapsed
+            state_note = f" (state: {', '.join(restored)})" if restored else ""
+            lines.append(f"✅ `{name}` in {elapsed * 1000:.1f}ms{state_note}")
+
+        embed = discord.Embed(
+            title="🔄 Reload Complete",
+            description="\n".join(lines)[:4000],
+            color=0x00ff00 if all(line.startswith("✅") for line in lines) else 0xffa500
+        )
+        embed.set_footer(text=f"Total reload time: {total * 1000:.1f}ms")
+        embed.timestamp = datetime.utcnow()
+
+        await ctx.send(embed=embed)
+
+    @commands.group(name='debug', invoke_without_command=True)
+    async def debug(self, ctx):
+        """Bot internals and diagnostics"""
+        await ctx.send(f"Usage: `{self.config.BOT_PREFIX}debug memory|jobs|runjob <name>`")
+
+    @debug.command(name='memory', aliases=['mem'])
+    async def debug_memory(self, ctx):
+        """Show cache sizes per guild"""
+        flags = self.bot.member_cache_flags
+        cached_flags = [name for name, enabled in flags if enabled] or ['none']
+
+        embed = discord.Embed(
+            title="🧠 Memory Report",
+            description=f"**Member cache:** {', '.join(cached_flags)}\n"
+                        f"**Chunking:** {self.config.MEMBER_CHUNKING}",
+            color=0x1e90ff
+        )
+
+        cached_members = sum(len(guild.members) for guild in self.bot.guilds)
+        embed.add_field(name="Guilds", value=str(len(self.bot.guilds)), inline=True)
+        embed.add_field(name="Cached Members", value=str(cached_members), inline=True)
+        embed.add_field(name="Cached Users", value=str(len(self.bot.users)), inline=True)
+        embed.add_field(name="Cached Messages", value=str(len(self.bot.cached_messages)), inline=True)
+        moderation = self.bot.get_cog('ModerationCog')
+        if moderation:
+            snapshots = moderation.recent_messages
+            embed.add_field(
+                name="Message Snapshots",
+                value=f"{len(snapshots)} in {snapshots.channels} channels "
+                      f"({snapshots.size / 2 ** 20:.1f}/{snapshots.max_bytes / 2 ** 20:.0f} MB)",
+                inline=True
+            )
+            embed.add_field(
+                name="Ban Lists",
+                value=f"{len(moderation.bans)} bans in {moderation.bans.guilds} guilds",
+                inline=True
+            )
+
+        if resource:
+            # ru_maxrss is reported in kilobytes on Linux
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            embed.add_field(name="Peak RSS", value=f"{peak_rss:.1f} MB", inline=True)
+
+        # Largest guilds first; embeds are limited to 25 fields
+        guilds = sorted(self.bot.guilds, key=lambda g: len(g.members), reverse=True)
+        lines = []
+        for guild in guilds[:10]:
+            status = "✅" if guild.chunked else "⏳"
+            lines.append(f"{status} **{guild.name}**: {len(guild.members)}/{guild.member_count} members, "
+                         f"{len(guild.channels)} channels, {len(guild.roles)} roles")
+        if len(guilds) > 10:
+            lines.append(f"... and {len(guilds) - 10} more")
+
+        embed.add_field(name="Per Guild (cached/total)", value="\n".join(lines) or "No guilds", inline=False)
+        embed.set_footer(text="✅ = chunked, ⏳ = partial cache")
+        embed.timestamp = datetime.utcnow()
+
+        await ctx.send(embed=embed)
+
+    @debug.command(name='jobs', aliases=['maintenance'])
+    async def debug_jobs(self, ctx):
+        """Show maintenance job timings"""
+        jobs = self.bot.maintenance.jobs
+        if not jobs:
+            await ctx.send("ℹ️ No maintenance jobs registered.")
+            return
+
+        embed = discord.Embed(
+            title="🧹 Maintenance Jobs",
+            description=f"{len(jobs)} jobs registered",
+            color=0x1e90ff
+        )
+        for job in list(jobs.values())[:25]:
+            if job.durations:
+                timing = (f"last {job.last_duration * 1000:.1f}ms, avg {job.average_duration * 1000:.1f}ms, "
+                          f"max {max(job.durations) * 1000:.1f}ms")
+            else:
+                timing = "not run yet"
+            value = (f"Every {job.interval}s (±{job.jitter}s), timeout {job.timeout}s\n"
+                     f"Runs: {job.runs} | Failures: {job.failures} | Timeouts: {job.timeouts} | Skipped: {job.skipped}\n"
+                     f"{timing}")
+            if job.running:
+                value += "\n🔄 Running now"
+            if job.last_error:
+                value += f"\n⚠️ {job.last_error}"
+            embed.add_field(name=job.name, value=value, inline=False)
+        embed.timestamp = datetime.utcnow()
+
+        await ctx.send(embed=embed)
+
+    @debug.command(name='runjob')
+    async def debug_run_job(self, ctx, name: str):
+        """Run a maintenance job now"""
+        if name not in self.bot.maintenance.jobs:
+            await ctx.send(f"❌ Maintenance job '{name}' not found!")
+            return
+
+        await self.bot.maintenance.run_now(name)
+        job = self.bot.maintenance.jobs.get(name)
+        if job and job.last_error:
+            await ctx.send(f"⚠️ `{name}` finished with an error: {job.last_error}")
+        elif job:
+            await ctx.send(f"✅ `{name}` finished in {job.last_duration * 1000:.1f}ms")
+
+    @commands.group(name='limits', aliases=['ratelimits'], invoke_without_command=True)
+    async def limits(self, ctx):
+        """Show command rate limits and bucket usage"""
+        limiter = self.bot.limiter
+
+        embed = discord.Embed(
+            title="🚦 Command Rate Limits",
+            description=f"Rejected since startup: **{limiter.rejected}**",
+            color=0x1e90ff
+        )
+        for scope, pool in limiter.pools.items():
+            embed.add_field(
+                name=scope.title(),
+                value=f"{pool.capacity:g} tokens / {pool.per:g}s\n{len(pool)} active buckets",
+                inline=True
+            )
+        costs = ", ".join(f"`{name}`: {cost:g}" for name, cost in sorted(limiter.costs.items()))
+        embed.add_field(name="Command Costs", value=costs or "All commands cost 1 token", inline=False)
+        embed.set_footer(text=f"{self.config.BOT_PREFIX}limits set <scope> <capacity/seconds> | "
+                              f"{self.config.BOT_PREFIX}limits cost <command> <tokens>")
+        embed.timestamp = datetime.utcnow()
+
+        await ctx.send(embed=embed)
+
+    @limits.command(name='set')
+    async def limits_set(self, ctx, scope: str, limit: str):
+        """Change the user, channel or guild limit, e.g. 6/30"""
+        scope = scope.lower()
+        if scope not in self.bot.limiter.pools:
+            await ctx.send(f"❌ Scope must be one of: {', '.join(self.bot.limiter.pools)}")
+            return
+        try:
+            capacity, per = parse_limit(limit)
+        except ValueError:
+            await ctx.send("❌ Limit must be in the form capacity/seconds, e.g. `6/30`")
+            return
+
+        self.bot.limiter.set_limit(scope, capacity, per)
+        await asyncio.to_thread(self.bot.save_rate_limits)
+        logger.info(f"{ctx.author} set the {scope} rate limit to {capacity:g}/{per:g}s")
+        await ctx.send(f"✅ {scope.title()} limit set to {capacity:g} tokens per {per:g}s")
+
+    @limits.command(name='cost')
+    async def limits_cost(self, ctx, command_name: str, cost: float):
+        """Set how many tokens a command costs (0 exempts it)"""
+        command = self.bot.get_command(command_name)
+        if not command:
+            await ctx.send(f"❌ Command '{command_name}' not found!")
+            return
+        smallest = min(pool.capacity for pool in self.bot.limiter.pools.values())
+        if not 0 <= cost <= smallest:
+            await ctx.send(f"❌ Cost must be between 0 and {smallest:g} (the smallest bucket capacity)")
+            return
+
+        self.bot.limiter.set_cost(command.qualified_name, cost)
+        await asyncio.to_thread(self.bot.save_rate_limits)
+        logger.info(f"{ctx.author} set the cost of {command.qualified_name} to {cost:g}")
+        await ctx.send(f"✅ `{command.qualified_name}` now costs {cost:g} tokens")
+
+async def setup(bot):
+    await bot.add_cog(AdminCog(bot))
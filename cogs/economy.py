@@ -0,0 +1,116 @@
+import discord
+from discord.ext import commands
+import asyncio
+import logging
+from datetime import datetime
+from config import Config
+from core.ledger import Ledger
+from core.storage import data_path
+
+logger = logging.getLogger('EconomyCog')
+
+class EconomyCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = Config
+        self.ledger = Ledger(data_path('ledger.db'), data_path('ledger.log'), Config.STARTING_BALANCE)
+
+    async def cog_load(self):
+        if self.qualified_name in self.bot.restoring:
+            # Hot reload: restore_state hands over the live ledger, whose log may not be checkpointed yet
+            return
+        # After a clean shutdown the final checkpoint already emptied the log
+        await asyncio.to_thread(self.ledger.load, not self.bot.clean_start)
+        self.register_jobs()
+
+    def register_jobs(self):
+        self.bot.maintenance.register('ledger-log', self.ledger.flush_log,
+                                      interval=self.config.LEDGER_LOG_FLUSH_SECONDS, timeout=30)
+        self.bot.maintenance.register('ledger-checkpoint', self.ledger.checkpoint,
+                                      interval=self.config.LEDGER_CHECKPOINT_SECONDS, jitter=10, timeout=120)
+        self.bot.register_flush_hook('ledger', self.ledger.checkpoint)
+
+    async def cog_unload(self):
+        self.bot.maintenance.unregister('ledger-log')
+        self.bot.maintenance.unregister('ledger-checkpoint')
+        self.bot.unregister_flush_hook('ledger')
+
+    def snapshot_state(self):
+        return {'ledger': self.ledger}
+
+    def restore_state(self, state):
+        self.ledger.close()
+        self.ledger = state['ledger']
+        self.register_jobs()
+
+    @commands.command(name='balance', aliases=['bal', 'points'])
+    async def balance(self, ctx, member: discord.Member = None):
+        """Check your virtual points balance"""
+        if member is None:
+            member = ctx.author
+
+        balance = self.ledger.balance(ctx.guild.id, member.id)
+        rank = self.ledger.leaderboards[ctx.guild.id].rank(member.id)
+
+        embed = discord.Embed(
+            title=f"💰 {member.display_name}'s Balance",
+            description=f"**{balance:,}** virtual points",
+            color=0xffd700
+        )
+        if rank:
+            embed.add_field(name="Rank", value=f"#{rank}", inline=True)
+        embed.set_thumbnail(url=member.avatar.url if member.avatar else member.default_avatar.url)
+        embed.timestamp = datetime.utcnow()
+
+        await ctx.send(embed=embed)
+
+    @commands.command(name='daily')
+    @commands.cooldown(1, 86400, commands.BucketType.member)
+    async def daily(self, ctx):
+        """Claim your daily virtual points"""
+        balance = self.ledger.apply(ctx.guild.id, ctx.author.id, self.config.DAILY_REWARD)
+
+        embed = discord.Embed(
+            title="🎁 Daily Reward",
+            description=f"**{ctx.author.display_name}** claimed **{self.config.DAILY_REWARD:,}** points!",
+            color=0x00ff00
+        )
+        embed.add_field(name="Balance", value=f"{balance:,} points", inline=True)
+        embed.timestamp = datetime.utcnow()
+
+        await ctx.send(embed=embed)
+
+    @commands.command(name='leaderboard', aliases=['lb', 'top'])
+    async def leaderboard(self, ctx, page: int = 1):
+        """Show the richest members of the server"""
+        index = self.ledger.leaderboards[ctx.guild.id]
+        per_page = 10
+        pages = max(1, (len(index) + per_page - 1) // per_page)
+        page = min(max(page, 1), pages)
+
+        entries = index.top(per_page, offset=(page - 1) * per_page)
+        if not entries:
+            await ctx.send("❌ Nobody has played yet!")
+            return
+
+        medals = ['🥇', '🥈', '🥉']
+        lines = []
+        for position, (user_id, balance) in enumerate(entries, start=(page - 1) * per_page + 1):
+            prefix = medals[position - 1] if position <= 3 else f"`{position}.`"
+            lines.append(f"{prefix} <@{user_id}> - **{balance:,}** points")
+
+        embed = discord.Embed(
+            title="🏆 Leaderboard",
+            description="\n".join(lines),
+            color=0xffd700
+        )
+        rank = index.rank(ctx.author.id)
+        if rank:
+            embed.add_field(name="Your Rank", value=f"#{rank} of {len(index)}", inline=True)
+        embed.set_footer(text=f"Page {page}/{pages}")
+        embed.timestamp = datetime.utcnow()
+
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(EconomyCog(bot))
@@ -5,11 +5,95 @@ import asyncio
 import json
 from datetime import datetime
 from config import Config
+from core.embeds import EmbedTemplate
+from core.trivia import DIFFICULTIES, QuestionBank
+
+EIGHT_BALL_RESPONSES = (
+    "It is certain.", "It is decidedly so.", "Without a doubt.", "Yes - definitely.",
+    "You may rely on it.", "As I see it, yes.", "Most likely.", "Outlook good.",
+    "Yes.", "Signs point to yes.", "Reply hazy, try again.", "Ask again later.",
+    "Better not tell you now.", "Cannot predict now.", "Concentrate and ask again.",
+    "Don't count on it.", "My reply is no.", "My sources say no.",
+    "Outlook not so good.", "Very doubtful."
+)
+
+MEMES = (
+    "When you finally beat that impossible boss after 50 attempts 😂",
+    "Loading screens: where gaming goes to die",
+    "That moment when your friend says 'It's just one more game'",
+    "Me: Just one more level... 6 hours later:",
+    "When the server crashes during a raid",
+    "Gaming addiction level: Professional",
+    "Me trying to explain to my mom why I need a $3000 PC",
+    "When someone says console gaming is better",
+    "That feeling when you find a legendary item",
+    "Me pretending I know what I'm doing in ranked"
+)
+
+COMPLIMENTS = (
+    "You're an amazing gamer! 🎮",
+    "Your skills are legendary! 🏆",
+    "You bring joy to this server! 😊",
+    "You're a fantastic friend! ❤️",
+    "Your positive energy is contagious! ✨",
+    "You're one of a kind! 🌟",
+    "You make this community better! 🎯",
+    "Your dedication is inspiring! 💪",
+    "You're a true gaming champion! 👑",
+    "You have great taste in games! 🎲"
+)
+
+RPS_EMOJIS = {'rock': '🪨', 'paper': '📄', 'scissors': '✂️'}
+RPS_CHOICES = tuple(RPS_EMOJIS)
+RPS_BEATS = {'rock': 'scissors', 'paper': 'rock', 'scissors': 'paper'}
+SLOT_SYMBOLS = ('🍒', '🍋', '🍊', '🍇', '⭐', '💎')
+
+EIGHT_BALL_TEMPLATE = EmbedTemplate(
+    lambda guild: discord.Embed(title="🔮 Magic 8-Ball", color=0x4b0082).set_thumbnail(url="https://i.imgur.com/7AJf0sX.png")
+)
+MEME_TEMPLATE = EmbedTemplate(
+    lambda guild: discord.Embed(title="😂 Random Gaming Meme", color=0xff69b4).set_thumbnail(url="https://i.imgur.com/8Jm6nGx.gif")
+)
 
 class FunCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config = Config
+        self.trivia_bank = QuestionBank(Config.TRIVIA_BANK_PATH, Config.TRIVIA_QUESTIONS)
+        self.trivia_parties = set()  # Channel IDs with a running trivia party
+    
+    async def cog_load(self):
+        await asyncio.to_thread(self.trivia_bank.load)
+    
+    async def cog_unload(self):
+        self.trivia_bank.close()
+    
+    @property
+    def ledger(self):
+        """The economy ledger, if the economy cog is loaded"""
+        economy = self.bot.get_cog('EconomyCog')
+        return economy.ledger if economy else None
+    
+    async def check_bet(self, ctx, bet):
+        """Make sure a bet is positive and covered by the player's balance"""
+        if bet < 1:
+            await ctx.send("❌ Bet must be at least 1 point!")
+            return False
+        
+        ledger = self.ledger
+        if ledger:
+            balance = ledger.balance(ctx.guild.id, ctx.author.id)
+            if balance < bet:
+                await ctx.send(f"❌ You only have **{balance:,}** points! Use `{self.config.BOT_PREFIX}daily` to get more.")
+                return False
+        return True
+    
+    def settle_bet(self, ctx, net, embed):
+        """Apply a game's net result to the player's balance"""
+        ledger = self.ledger
+        if ledger:
+            balance = ledger.apply(ctx.guild.id, ctx.author.id, net)
+            embed.add_field(name="Balance", value=f"{balance:,} points ({net:+,})", inline=False)
         
     @commands.command(name='roll', aliases=['dice', 'r'])
     async def roll_dice(self, ctx, sides: int = 6):
@@ -41,25 +125,10 @@ class FunCog(commands.Cog):
     @commands.command(name='8ball', aliases=['8b', 'fortune'])
     async def eight_ball(self, ctx, *, question):
         """Ask the magic 8-ball a question"""
-        responses = [
-            "It is certain.", "It is decidedly so.", "Without a doubt.", "Yes - definitely.",
-            "You may rely on it.", "As I see it, yes.", "Most likely.", "Outlook good.",
-            "Yes.", "Signs point to yes.", "Reply hazy, try again.", "Ask again later.",
-            "Better not tell you now.", "Cannot predict now.", "Concentrate and ask again.",
-            "Don't count on it.", "My reply is no.", "My sources say no.",
-            "Outlook not so good.", "Very doubtful."
-        ]
+        response = random.choice(EIGHT_BALL_RESPONSES)
         
-        response = random.choice(responses)
-        
-        embed = discord.Embed(
-            title="🔮 Magic 8-Ball",
-            description=f"**Question:** {question}",
-            color=0x4b0082
-        )
+        embed = EIGHT_BALL_TEMPLATE.render(ctx.guild, description=f"**Question:** {question}")
         embed.add_field(name="Answer", value=f"**{response}**", inline=False)
-        embed.set_thumbnail(url="https://i.imgur.com/7AJf0sX.png")
-        embed.timestamp = datetime.utcnow()
         
         await ctx.send(embed=embed)
     
@@ -79,16 +148,44 @@ class FunCog(commands.Cog):
         
         await ctx.send(embed=embed)
     
+    async def sample_online_member(self, guild, attempts=5):
+        """Pick a random member from the online index, dropping stale entries"""
+        for _ in range(attempts):
+            member_id = self.bot.presence.sample(guild.id)
+            if member_id is None:
+                return None
+            
+            member = guild.get_member(member_id)
+            if member is None:
+                try:
+                    member = await guild.fetch_member(member_id)
+                except discord.HTTPException:
+                    member = None
+            
+            if member is None or member.bot:
+                self.bot.presence.discard(guild.id, member_id)
+                continue
+            return member
+        return None
+    
     @commands.command(name='randomuser', aliases=['randuser', 'pick'])
     async def random_user(self, ctx):
         """Pick a random online member"""
-        online_members = [member for member in ctx.guild.members if member.status == discord.Status.online and not member.bot]
-        
-        if not online_members:
-            await ctx.send("❌ No online members found!")
-            return
-        
-        chosen_member = random.choice(online_members)
+        if self.config.PRESENCE_INTENT:
+            chosen_member = await self.sample_online_member(ctx.guild)
+            status = "Online"
+            if not chosen_member:
+                await ctx.send("❌ No online members found!")
+                return
+        else:
+            # Without the presence intent every member looks offline, so pick from everyone
+            members = await self.bot.get_members(ctx.guild)
+            humans = [member for member in members if not member.bot]
+            if not humans:
+                await ctx.send("❌ No members found!")
+                return
+            chosen_member = random.choice(humans)
+            status = "Unknown"
         
         embed = discord.Embed(
             title="🎯 Random User",
@@ -97,27 +194,36 @@ class FunCog(commands.Cog):
         )
         embed.set_thumbnail(url=chosen_member.avatar.url if chosen_member.avatar else chosen_member.default_avatar.url)
         embed.add_field(name="User", value=chosen_member.display_name, inline=True)
-        embed.add_field(name="Status", value=str(chosen_member.status).title(), inline=True)
+        embed.add_field(name="Status", value=status, inline=True)
         embed.timestamp = datetime.utcnow()
         
         await ctx.send(embed=embed)
     
     @commands.command(name='trivia', aliases=['quiz'])
-    async def trivia(self, ctx, difficulty: str = 'easy'):
+    async def trivia(self, ctx, difficulty: str = 'easy', *, category: str = None):
         """Start a trivia game"""
         difficulty = difficulty.lower()
-        if difficulty not in ['easy', 'medium', 'hard']:
+        if difficulty not in DIFFICULTIES:
             await ctx.send("❌ Difficulty must be: easy, medium, or hard!")
             return
         
-        # Get a random question
-        question_data = random.choice(self.config.TRIVIA_QUESTIONS)
-        question = question_data["question"]
-        answer = question_data["answer"].lower()
+        if category:
+            category = category.lower()
+            if category not in self.trivia_bank.categories:
+                categories = ", ".join(sorted(self.trivia_bank.categories))
+                await ctx.send(f"❌ Unknown category! Available: {categories}")
+                return
+        
+        # Get the next question this channel hasn't seen yet
+        question_data = self.trivia_bank.pick(ctx.channel.id, difficulty, category)
+        if question_data is None:
+            await ctx.send("❌ No trivia questions available!")
+            return
+        question = question_data.question
         
         embed = discord.Embed(
             title="🧠 Trivia Time!",
-            description=f"**Difficulty:** {difficulty.title()}",
+            description=f"**Difficulty:** {question_data.difficulty.title()} | **Category:** {question_data.category.title()}",
             color=0x1e90ff
         )
         embed.add_field(name="Question", value=question, inline=False)
@@ -128,83 +234,139 @@ class FunCog(commands.Cog):
         message = await ctx.send(embed=embed)
         await message.add_reaction('✅')
         
-        def check(reaction, user):
-            return (user == ctx.author and 
-                    str(reaction.emoji) == '✅' and 
-                    reaction.message.id == message.id)
-        
-        try:
-            reaction, user = await self.bot.wait_for('reaction_add', timeout=30.0, check=check)
-            
-            # Ask for answer
-            await ctx.send(f"{ctx.author.mention} What is your answer?")
-            
-            def answer_check(m):
-                return m.author == ctx.author and m.channel == ctx.channel
-            
+        with self.bot.sessions.open(message_id=message.id) as session:
             try:
-                answer_msg = await self.bot.wait_for('message', timeout=30.0, check=answer_check)
-                user_answer = answer_msg.content.lower().strip()
-                
-                if user_answer in answer or answer in user_answer:
-                    result_embed = discord.Embed(
-                        title="🎉 Correct!",
-                        description=f"**{ctx.author.display_name}** got it right!",
-                        color=0x00ff00
-                    )
-                    result_embed.add_field(name="Answer", value=question_data["answer"], inline=False)
-                else:
-                    result_embed = discord.Embed(
-                        title="❌ Incorrect",
-                        description=f"**{ctx.author.display_name}** got it wrong!",
-                        color=0xff0000
-                    )
-                    result_embed.add_field(name="Correct Answer", value=question_data["answer"], inline=False)
-                    result_embed.add_field(name="Your Answer", value=answer_msg.content, inline=False)
+                await session.wait_for('reaction', timeout=30.0,
+                                       check=lambda reaction, user: user == ctx.author and str(reaction.emoji) == '✅')
                 
-                await ctx.send(embed=result_embed)
+                # Ask for answer
+                session.watch_channel(ctx.channel.id)
+                await ctx.send(f"{ctx.author.mention} What is your answer?")
                 
+                try:
+                    answer_msg = await session.wait_for('message', timeout=30.0,
+                                                        check=lambda m: m.author == ctx.author)
+                    
+                    if question_data.check(answer_msg.content):
+                        result_embed = discord.Embed(
+                            title="🎉 Correct!",
+                            description=f"**{ctx.author.display_name}** got it right!",
+                            color=0x00ff00
+                        )
+                        result_embed.add_field(name="Answer", value=question_data.answer, inline=False)
+                    else:
+                        result_embed = discord.Embed(
+                            title="❌ Incorrect",
+                            description=f"**{ctx.author.display_name}** got it wrong!",
+                            color=0xff0000
+                        )
+                        result_embed.add_field(name="Correct Answer", value=question_data.answer, inline=False)
+                        result_embed.add_field(name="Your Answer", value=answer_msg.content, inline=False)
+                    
+                    await ctx.send(embed=result_embed)
+                    
+                except asyncio.TimeoutError:
+                    await ctx.send(f"{ctx.author.mention} Time's up! The answer was: **{question_data.answer}**")
+                    
             except asyncio.TimeoutError:
-                await ctx.send(f"{ctx.author.mention} Time's up! The answer was: **{question_data['answer']}**")
-                
-        except asyncio.TimeoutError:
-            await ctx.send("⏰ Trivia timed out!")
+                await ctx.send("⏰ Trivia timed out!")
+    
+    @commands.command(name='triviaparty', aliases=['tp', 'quizparty'])
+    async def trivia_party(self, ctx, rounds: int = 5, difficulty: str = 'easy'):
+        """Play multiplayer trivia: first correct answer in the channel scores"""
+        difficulty = difficulty.lower()
+        if difficulty not in DIFFICULTIES:
+            await ctx.send("❌ Difficulty must be: easy, medium, or hard!")
+            return
+        
+        if rounds < 1 or rounds > 20:
+            await ctx.send("❌ Rounds must be between 1 and 20!")
+            return
+        
+        if ctx.channel.id in self.trivia_parties:
+            await ctx.send("❌ A trivia party is already running in this channel!")
+            return
+        
+        self.trivia_parties.add(ctx.channel.id)
+        scores = {}
+        names = {}
+        
+        try:
+            with self.bot.sessions.open(channel_id=ctx.channel.id) as session:
+                for round_number in range(1, rounds + 1):
+                    question_data = self.trivia_bank.pick(ctx.channel.id, difficulty)
+                    if question_data is None:
+                        await ctx.send("❌ No trivia questions available!")
+                        return
+                    
+                    embed = discord.Embed(
+                        title=f"🧠 Trivia Party - Round {round_number}/{rounds}",
+                        description=f"**Category:** {question_data.category.title()}",
+                        color=0x1e90ff
+                    )
+                    embed.add_field(name="Question", value=question_data.question, inline=False)
+                    embed.set_footer(text="First correct answer in this channel wins the round! (20s)")
+                    await ctx.send(embed=embed)
+                    
+                    try:
+                        winner_msg = await session.wait_for('message', timeout=20.0,
+                                                            check=lambda m: question_data.check(m.content))
+                        scores[winner_msg.author.id] = scores.get(winner_msg.author.id, 0) + 1
+                        names[winner_msg.author.id] = winner_msg.author.display_name
+                        await ctx.send(f"🎉 **{winner_msg.author.display_name}** got it! The answer was **{question_data.answer}**")
+                    except asyncio.TimeoutError:
+                        await ctx.send(f"⏰ Nobody got it! The answer was **{question_data.answer}**")
+        finally:
+            self.trivia_parties.discard(ctx.channel.id)
+        
+        # Final scoreboard
+        embed = discord.Embed(
+            title="🏆 Trivia Party Results",
+            color=0xffd700
+        )
+        if scores:
+            ranking = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            medals = ['🥇', '🥈', '🥉']
+            lines = [
+                f"{medals[i] if i < 3 else f'{i + 1}.'} **{names[user_id]}**: {score} point{'s' if score != 1 else ''}"
+                for i, (user_id, score) in enumerate(ranking[:10])
+            ]
+            embed.description = "\n".join(lines)
+        else:
+            embed.description = "Nobody scored this time!"
+        embed.timestamp = datetime.utcnow()
+        
+        await ctx.send(embed=embed)
     
     @commands.command(name='rps', aliases=['rockpaperscissors'])
     async def rock_paper_scissors(self, ctx, choice: str):
         """Play rock, paper, scissors"""
         choice = choice.lower()
-        valid_choices = ['rock', 'paper', 'scissors']
         
-        if choice not in valid_choices:
+        if choice not in RPS_EMOJIS:
             await ctx.send("❌ Please choose: rock, paper, or scissors!")
             return
         
-        bot_choice = random.choice(valid_choices)
+        bot_choice = random.choice(RPS_CHOICES)
         
         # Determine winner
         if choice == bot_choice:
             result = "🤝 It's a tie!"
             color = 0xffa500
-        elif (choice == 'rock' and bot_choice == 'scissors') or \
-             (choice == 'paper' and bot_choice == 'rock') or \
-             (choice == 'scissors' and bot_choice == 'paper'):
+        elif RPS_BEATS[choice] == bot_choice:
             result = "🎉 You win!"
             color = 0x00ff00
         else:
             result = "😢 You lose!"
             color = 0xff0000
         
-        # Get emojis
-        emojis = {'rock': '🪨', 'paper': '📄', 'scissors': '✂️'}
-        
         embed = discord.Embed(
             title="✊✋✌️ Rock, Paper, Scissors",
             description=f"**{ctx.author.display_name}** vs **Bot**",
             color=color
         )
-        embed.add_field(name=f"{ctx.author.display_name}", value=f"{emojis[choice]} {choice.title()}", inline=True)
-        embed.add_field(name="Bot", value=f"{emojis[bot_choice]} {bot_choice.title()}", inline=True)
+        embed.add_field(name=f"{ctx.author.display_name}", value=f"{RPS_EMOJIS[choice]} {choice.title()}", inline=True)
+        embed.add_field(name="Bot", value=f"{RPS_EMOJIS[bot_choice]} {bot_choice.title()}", inline=True)
         embed.add_field(name="Result", value=result, inline=False)
         embed.timestamp = datetime.utcnow()
         
@@ -213,28 +375,7 @@ class FunCog(commands.Cog):
     @commands.command(name='meme', aliases=['funny'])
     async def meme(self, ctx):
         """Get a random gaming meme"""
-        memes = [
-            "When you finally beat that impossible boss after 50 attempts 😂",
-            "Loading screens: where gaming goes to die",
-            "That moment when your friend says 'It's just one more game'",
-            "Me: Just one more level... 6 hours later:",
-            "When the server crashes during a raid",
-            "Gaming addiction level: Professional",
-            "Me trying to explain to my mom why I need a $3000 PC",
-            "When someone says console gaming is better",
-            "That feeling when you find a legendary item",
-            "Me pretending I know what I'm doing in ranked"
-        ]
-        
-        meme = random.choice(memes)
-        
-        embed = discord.Embed(
-            title="😂 Random Gaming Meme",
-            description=meme,
-            color=0xff69b4
-        )
-        embed.set_thumbnail(url="https://i.imgur.com/8Jm6nGx.gif")
-        embed.timestamp = datetime.utcnow()
+        embed = MEME_TEMPLATE.render(ctx.guild, description=random.choice(MEMES))
         
         await ctx.send(embed=embed)
     
@@ -244,20 +385,7 @@ class FunCog(commands.Cog):
         if member is None:
             member = ctx.author
         
-        compliments = [
-            "You're an amazing gamer! 🎮",
-            "Your skills are legendary! 🏆",
-            "You bring joy to this server! 😊",
-            "You're a fantastic friend! ❤️",
-            "Your positive energy is contagious! ✨",
-            "You're one of a kind! 🌟",
-            "You make this community better! 🎯",
-            "Your dedication is inspiring! 💪",
-            "You're a true gaming champion! 👑",
-            "You have great taste in games! 🎲"
-        ]
-        
-        compliment = random.choice(compliments)
+        compliment = random.choice(COMPLIMENTS)
         
         embed = discord.Embed(
             title="💝 Compliment",
@@ -273,18 +401,24 @@ class FunCog(commands.Cog):
     async def dice_game(self, ctx, bet: int = 100):
         """Play a dice game (virtual currency)"""
         # This is just for fun - no real gambling involved
+        if not await self.check_bet(ctx, bet):
+            return
+        
         player_roll = random.randint(1, 6)
         bot_roll = random.randint(1, 6)
         
         if player_roll > bot_roll:
             result = "🎉 You win!"
             color = 0x00ff00
+            net = bet
         elif player_roll < bot_roll:
             result = "😢 You lose!"
             color = 0xff0000
+            net = -bet
         else:
             result = "🤝 It's a tie!"
             color = 0xffa500
+            net = 0
         
         embed = discord.Embed(
             title="🎲 Dice Game",
@@ -294,6 +428,7 @@ class FunCog(commands.Cog):
         embed.add_field(name=f"{ctx.author.display_name}", value=f"🎲 {player_roll}", inline=True)
         embed.add_field(name="Bot", value=f"🎲 {bot_roll}", inline=True)
         embed.add_field(name="Result", value=result, inline=False)
+        self.settle_bet(ctx, net, embed)
         embed.timestamp = datetime.utcnow()
         
         await ctx.send(embed=embed)
@@ -301,12 +436,13 @@ class FunCog(commands.Cog):
     @commands.command(name='slots', aliases=['slotmachine'])
     async def slots(self, ctx, bet: int = 100):
         """Play a virtual slot machine"""
-        symbols = ['🍒', '🍋', '🍊', '🍇', '⭐', '💎']
+        if not await self.check_bet(ctx, bet):
+            return
         
         # Generate 3 spins
-        spin1 = random.choice(symbols)
-        spin2 = random.choice(symbols)
-        spin3 = random.choice(symbols)
+        spin1 = random.choice(SLOT_SYMBOLS)
+        spin2 = random.choice(SLOT_SYMBOLS)
+        spin3 = random.choice(SLOT_SYMBOLS)
         
         # Determine payout
         if spin1 == spin2 == spin3:
@@ -331,6 +467,7 @@ class FunCog(commands.Cog):
         embed.add_field(name="Outcome", value=result, inline=False)
         if payout > 0:
             embed.add_field(name="Payout", value=f"+{payout} points", inline=False)
+        self.settle_bet(ctx, payout - bet, embed)
         embed.timestamp = datetime.utcnow()
         
         await ctx.send(embed=embed)
@@ -1,39 +1,145 @@
 import discord
 from discord.ext import commands
-from datetime import datetime
+import logging
+import time
 from config import Config
+from core.embeds import EmbedTemplate
+from core.helpindex import HelpIndex
+
+logger = logging.getLogger('HelpCog')
+
+# Display names and descriptions for the categories; other cogs fall back to their class name
+CATEGORY_LABELS = {
+    'ModerationCog': ('Moderation', 'Server management and moderation tools'),
+    'FunCog': ('Fun', 'Gaming commands and entertainment'),
+    'UtilsCog': ('Utilities', 'Helpful utility commands'),
+    'ServerMgmtCog': ('Server Mgmt', 'Server setup and management'),
+    'EconomyCog': ('Economy', 'Virtual points and leaderboards'),
+    'LevelingCog': ('Levels', 'Activity XP and ranks'),
+    'StatsCog': ('Stats', 'Command usage statistics'),
+    'HelpCog': ('Help', 'This help system'),
+}
+CATEGORY_EMOJIS = {
+    'ModerationCog': '🛡️',
+    'FunCog': '🎮',
+    'UtilsCog': '🔧',
+    'ServerMgmtCog': '⚙️',
+    'EconomyCog': '💰',
+    'LevelingCog': '📈',
+    'StatsCog': '📊',
+    'HelpCog': '📖',
+}
+HIDDEN_CATEGORIES = {'AdminCog'}
+COMMANDS_PER_PAGE = 8
+
+class HelpView(discord.ui.View):
+    """Previous/home/next buttons over a fixed list of help pages"""
+
+    def __init__(self, pages, author_id, guild, page=0):
+        super().__init__(timeout=120)
+        self.pages = pages
+        self.author_id = author_id
+        self.guild = guild
+        self.page = page
+        self.message = None
+        self.update_buttons()
+
+    def render(self):
+        return self.pages[self.page].render(self.guild)
+
+    def update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.home_page.disabled = self.page == 0
+        self.next_page.disabled = self.page == len(self.pages) - 1
+
+    async def show(self, interaction, page):
+        self.page = page
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ This help menu isn't yours!", ephemeral=True)
+            return False
+        return True
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+    @discord.ui.button(emoji='◀️', style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        await self.show(interaction, self.page - 1)
+
+    @discord.ui.button(emoji='🏠', style=discord.ButtonStyle.primary)
+    async def home_page(self, interaction, button):
+        await self.show(interaction, 0)
+
+    @discord.ui.button(emoji='▶️', style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        await self.show(interaction, self.page + 1)
 
 class HelpCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config = Config
-    
-    @commands.command(name='help', aliases=['h', 'commands'])
-    async def help_command(self, ctx, command_name: str = None):
-        """Show help information for commands"""
-        if command_name:
-            await self.show_command_help(ctx, command_name)
-        else:
-            await self.show_general_help(ctx)
-    
-    async def show_general_help(self, ctx):
-        """Show general help embed"""
+        self.index = None
+        self.pages = []  # overview followed by every category's pages
+        self.category_pages = {}  # category key -> index of its first page
+        self.command_pages = {}  # qualified name -> EmbedTemplate
+
+    async def cog_load(self):
+        self.build_index()
+
+    @commands.Cog.listener()
+    async def on_cogs_changed(self):
+        self.build_index()
+
+    def build_index(self):
+        """Index the loaded commands and pre-build every help page"""
+        start = time.perf_counter()
+        self.index = HelpIndex(self.bot, hidden_cogs=HIDDEN_CATEGORIES, labels=CATEGORY_LABELS)
+
+        pages = [EmbedTemplate(self.build_overview, per_guild=True)]
+        category_pages = {}
+        for category in self.index.categories:
+            category_pages[category.key] = len(pages)
+            chunks = [category.entries[i:i + COMMANDS_PER_PAGE]
+                      for i in range(0, len(category.entries), COMMANDS_PER_PAGE)]
+            for number, entries in enumerate(chunks, start=1):
+                embed = self.build_category_page(category, entries, number, len(chunks))
+                pages.append(EmbedTemplate(lambda guild, embed=embed: embed))
+
+        self.pages = pages
+        self.category_pages = category_pages
+        self.command_pages = {}
+        logger.debug(f"Indexed {len(self.index)} commands into {len(pages)} help pages "
+                     f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def build_overview(self, guild):
         embed = discord.Embed(
             title="🎮 Gaming Community Bot Help",
-            description=f"Welcome to {ctx.guild.name}! I'm your gaming community bot.",
+            description=f"Welcome to {guild.name}! I'm your gaming community bot.",
             color=0x1e90ff
         )
         embed.add_field(
             name="🚀 Getting Started",
-            value=f"Use `{self.config.BOT_PREFIX}help <command>` for detailed help on a specific command.",
+            value=f"Use `{self.config.BOT_PREFIX}help <command>` for detailed help on a specific command, "
+                  f"`{self.config.BOT_PREFIX}help <category>` to list a category, or the buttons below to browse.",
             inline=False
         )
         embed.add_field(
             name="📖 Command Categories",
-            value="**Moderation**: Server management and moderation tools\n"
-                  "**Fun**: Gaming commands and entertainment\n"
-                  "**Utilities**: Helpful utility commands\n"
-                  "**Server Mgmt**: Server setup and management",
+            value="\n".join(
+                f"{CATEGORY_EMOJIS.get(category.key, '📁')} **{category.name}** ({len(category.entries)}): "
+                f"{category.description or 'No description'}"
+                for category in self.index.categories
+            ) or "No commands loaded",
             inline=False
         )
         embed.add_field(
@@ -46,56 +152,86 @@ class HelpCog(commands.Cog):
             inline=False
         )
         embed.set_footer(text=f"Prefix: {self.config.BOT_PREFIX} | Bot Version 1.0")
-        embed.timestamp = datetime.utcnow()
-        
-        await ctx.send(embed=embed)
-    
-    async def show_command_help(self, ctx, command_name):
-        """Show help for a specific command"""
-        command = self.bot.get_command(command_name.lower())
-        
-        if not command:
-            embed = discord.Embed(
-                title="❌ Command Not Found",
-                description=f"Command '{command_name}' not found!",
-                color=0xff0000
-            )
-            embed.add_field(name="Tip", value=f"Use `{self.config.BOT_PREFIX}help` to see all commands", inline=False)
-            await ctx.send(embed=embed)
-            return
-        
-        # Get command category
-        if command.cog:
-            cog_name = command.cog.qualified_name
-        else:
-            cog_name = "General"
-        
-        # Build description
-        description = command.help or "No description available"
-        
+        return embed
+
+    def build_category_page(self, category, entries, number, total):
+        embed = discord.Embed(
+            title=f"{CATEGORY_EMOJIS.get(category.key, '📁')} {category.name} Commands",
+            description=category.description,
+            color=0x1e90ff
+        )
+        for entry in entries:
+            usage = f"{self.config.BOT_PREFIX}{entry.name} {entry.signature}".strip()
+            embed.add_field(name=f"`{usage}`", value=entry.summary, inline=False)
+        embed.set_footer(text=f"{category.name} • Page {number}/{total} | <> = required, [] = optional")
+        return embed
+
+    def build_command_page(self, entry):
         embed = discord.Embed(
-            title=f"📖 Help: {command.name}",
-            description=description,
+            title=f"📖 Help: {entry.name}",
+            description=entry.help,
             color=0x1e90ff
         )
-        
-        # Add aliases
-        if command.aliases:
-            aliases_str = ", ".join(f"`{alias}`" for alias in command.aliases)
+
+        if entry.aliases:
+            aliases_str = ", ".join(f"`{alias}`" for alias in entry.aliases)
             embed.add_field(name="Aliases", value=aliases_str, inline=True)
-        
-        # Add usage
-        usage = f"{self.config.BOT_PREFIX}{command.name}"
-        if command.signature:
-            usage += f" {command.signature}"
+
+        usage = f"{self.config.BOT_PREFIX}{entry.name} {entry.signature}".strip()
         embed.add_field(name="Usage", value=f"`{usage}`", inline=False)
-        
-        # Add category
-        embed.add_field(name="Category", value=cog_name, inline=True)
-        
+        embed.add_field(name="Category", value=entry.category.name if entry.category else "General", inline=True)
+
         embed.set_footer(text="<> = required, [] = optional")
-        embed.timestamp = datetime.utcnow()
-        
+        return embed
+
+    @commands.command(name='help', aliases=['h', 'commands'])
+    async def help_command(self, ctx, *, query: str = None):
+        """Show help for a command or category, or browse all commands"""
+        if query:
+            await self.show_command_help(ctx, query)
+        else:
+            await self.show_pages(ctx, 0)
+
+    async def show_pages(self, ctx, page):
+        """Send a help page with buttons to browse the others"""
+        view = HelpView(self.pages, ctx.author.id, ctx.guild, page)
+        view.message = await ctx.send(embed=view.render(), view=view)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before, after):
+        """Rebuild the cached overview when the server name or locale changes"""
+        if before.name != after.name or before.preferred_locale != after.preferred_locale:
+            self.pages[0].invalidate(after.id)
+
+    async def show_command_help(self, ctx, query):
+        """Show help for a command or category, or suggest close matches"""
+        entry = self.index.lookup(query)
+        if entry:
+            template = self.command_pages.get(entry.name)
+            if template is None:
+                embed = self.build_command_page(entry)
+                template = self.command_pages[entry.name] = EmbedTemplate(lambda guild, embed=embed: embed)
+            await ctx.send(embed=template.render())
+            return
+
+        category = self.index.category(query)
+        if category:
+            await self.show_pages(ctx, self.category_pages[category.key])
+            return
+
+        embed = discord.Embed(
+            title="❌ Command Not Found",
+            description=f"Command '{query}' not found!",
+            color=0xff0000
+        )
+        suggestions = self.index.search(query)
+        if suggestions:
+            embed.add_field(
+                name="Did you mean",
+                value="\n".join(f"`{self.config.BOT_PREFIX}{entry.name}` - {entry.summary}" for entry in suggestions),
+                inline=False
+            )
+        embed.add_field(name="Tip", value=f"Use `{self.config.BOT_PREFIX}help` to see all commands", inline=False)
         await ctx.send(embed=embed)
 
 async def setup(bot):
@@ -0,0 +1,167 @@
+import discord
+from discord.ext import commands
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime
+from config import Config
+from core.leveling import LEVEL_THRESHOLDS, XPTracker, level_for_xp
+from core.storage import data_path
+
+logger = logging.getLogger('LevelingCog')
+
+class LevelingCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = Config
+        self.tracker = XPTracker(data_path('levels.db'))
+        self.last_award = {}  # (guild_id, user_id) -> monotonic time of last XP award
+        self.rewards = asyncio.Queue(maxsize=10000)
+        self.reward_worker = None
+
+    async def cog_load(self):
+        await asyncio.to_thread(self.tracker.load)
+        self.start_background()
+
+    def start_background(self):
+        self.bot.maintenance.register('xp-flush', self.tracker.flush,
+                                      interval=self.config.XP_FLUSH_SECONDS, jitter=5, timeout=60)
+        self.bot.maintenance.register('xp-cooldowns', self.prune_cooldowns,
+                                      interval=600, jitter=60, timeout=30)
+        self.bot.register_flush_hook('xp', self.tracker.flush)
+        self.reward_worker = asyncio.create_task(self.process_rewards())
+
+    async def cog_unload(self):
+        self.bot.maintenance.unregister('xp-flush')
+        self.bot.maintenance.unregister('xp-cooldowns')
+        self.bot.unregister_flush_hook('xp')
+        if self.reward_worker:
+            self.reward_worker.cancel()
+
+    def snapshot_state(self):
+        return {'tracker': self.tracker, 'last_award': self.last_award, 'rewards': self.rewards}
+
+    def restore_state(self, state):
+        if self.reward_worker:
+            self.reward_worker.cancel()
+        self.tracker.close()
+        self.tracker = state['tracker']
+        self.last_award = state['last_award']
+        self.rewards = state['rewards']
+        self.start_background()
+
+    async def prune_cooldowns(self):
+        """Forget cooldowns that have already expired"""
+        cutoff = time.monotonic() - self.config.XP_COOLDOWN_SECONDS
+        self.last_award = {key: last for key, last in self.last_award.items() if last > cutoff}
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        """Award XP for chatting, at most once per cooldown"""
+        if message.author.bot or not message.guild:
+            return
+
+        key = (message.guild.id, message.author.id)
+        now = time.monotonic()
+        if now - self.last_award.get(key, -self.config.XP_COOLDOWN_SECONDS) < self.config.XP_COOLDOWN_SECONDS:
+            return
+        self.last_award[key] = now
+
+        old_level, new_level = self.tracker.add(key[0], key[1], random.randint(15, 25))
+        if new_level > old_level:
+            try:
+                self.rewards.put_nowait((message.author, message.channel, new_level))
+            except asyncio.QueueFull:
+                logger.warning(f"Level reward queue full, dropping level up for {message.author}")
+
+    async def process_rewards(self):
+        """Announce level ups and grant reward roles at a steady rate"""
+        while True:
+            member, channel, level = await self.rewards.get()
+            try:
+                await self.grant_level_rewards(member, channel, level)
+            except discord.HTTPException as e:
+                logger.warning(f"Failed to process level up for {member}: {e}")
+            except Exception as e:
+                logger.error(f"Error processing level up for {member}: {e}")
+            await asyncio.sleep(self.config.LEVEL_REWARD_INTERVAL)
+
+    async def grant_level_rewards(self, member, channel, level):
+        role_name = self.config.LEVEL_ROLE_REWARDS.get(level)
+        role = discord.utils.get(member.guild.roles, name=role_name) if role_name else None
+
+        if role and role not in member.roles:
+            try:
+                await member.add_roles(role, reason=f"Reached level {level}")
+            except discord.Forbidden:
+                logger.warning(f"Could not add level reward role {role_name} to {member}")
+                role = None
+
+        message = f"🎉 {member.mention} reached **level {level}**!"
+        if role:
+            message += f" You earned the **{role.name}** role!"
+        await channel.send(message)
+
+    @commands.command(name='rank', aliases=['level', 'xp'])
+    async def rank(self, ctx, member: discord.Member = None):
+        """Show your level and server rank"""
+        if member is None:
+            member = ctx.author
+
+        self.tracker.refresh_ranks()
+        xp = self.tracker.get(ctx.guild.id, member.id)
+        level = level_for_xp(xp)
+        level_start = LEVEL_THRESHOLDS[level]
+        level_size = LEVEL_THRESHOLDS[level + 1] - level_start
+        progress = xp - level_start
+        index = self.tracker.ranks[ctx.guild.id]
+        rank = index.rank(member.id)
+
+        filled = int(progress / level_size * 10)
+        bar = "🟩" * filled + "⬜" * (10 - filled)
+
+        embed = discord.Embed(
+            title=f"📊 {member.display_name}'s Rank",
+            color=member.color
+        )
+        embed.add_field(name="Level", value=str(level), inline=True)
+        embed.add_field(name="Rank", value=f"#{rank} of {len(index)}" if rank else "Unranked", inline=True)
+        embed.add_field(name="Total XP", value=f"{xp:,}", inline=True)
+        embed.add_field(name="Progress", value=f"{bar}\n{progress:,}/{level_size:,} XP", inline=False)
+        embed.set_thumbnail(url=member.avatar.url if member.avatar else member.default_avatar.url)
+        embed.timestamp = datetime.utcnow()
+
+        await ctx.send(embed=embed)
+
+    @commands.command(name='levels', aliases=['xplb', 'ranks'])
+    async def levels(self, ctx, page: int = 1):
+        """Show the most active members of the server"""
+        self.tracker.refresh_ranks()
+        index = self.tracker.ranks[ctx.guild.id]
+        per_page = 10
+        pages = max(1, (len(index) + per_page - 1) // per_page)
+        page = min(max(page, 1), pages)
+
+        entries = index.top(per_page, offset=(page - 1) * per_page)
+        if not entries:
+            await ctx.send("❌ Nobody has earned XP yet!")
+            return
+
+        lines = [
+            f"`{position}.` <@{user_id}> - Level **{level_for_xp(xp)}** ({xp:,} XP)"
+            for position, (user_id, xp) in enumerate(entries, start=(page - 1) * per_page + 1)
+        ]
+
+        embed = discord.Embed(
+            title="📈 Level Leaderboard",
+            description="\n".join(lines),
+            color=0x1e90ff
+        )
+        embed.set_footer(text=f"Page {page}/{pages}")
+        embed.timestamp = datetime.utcnow()
+
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(LevelingCog(bot))
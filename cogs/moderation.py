@@ -1,15 +1,110 @@
 import discord
 from discord.ext import commands
+import asyncio
+import io
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from config import Config
+from core.antinuke import WATCHED_ACTIONS, ActionTracker
+from core.automod import RULE_TYPES, AutoModEngine
+from core.bancache import BanCache, ban_matcher
+from core.bulkactions import AUDIT_REASON_LIMIT, chunked, parse_user_ids, run_bounded, strip_user_ids
+from core.imagehash import ImageScreener
+from core.linkscan import DomainBlocklist, InviteResolver
+from core.snapshots import MessageSnapshot, SnapshotBuffer
+from core.timedactions import format_duration, parse_duration
+from core.storage import data_path, read_json, write_json_atomic
 
 logger = logging.getLogger('ModerationCog')
 
 class ModerationCog(commands.Cog):
+    # Staff commands must keep working during a raid, so they skip command rate limits
+    rate_limited = False
+    
     def __init__(self, bot):
         self.bot = bot
         self.config = Config
+        self.screener = ImageScreener(
+            max_bytes=Config.IMAGE_SCREEN_MAX_BYTES,
+            max_distance=Config.IMAGE_SCREEN_DISTANCE,
+            workers=Config.IMAGE_SCREEN_WORKERS,
+            cache_size=Config.IMAGE_HASH_CACHE_SIZE
+        )
+        # Recent messages, so deletions can be logged and sniped
+        self.recent_messages = SnapshotBuffer(Config.SNAPSHOTS_PER_CHANNEL, Config.SNAPSHOT_CACHE_MB * 1024 * 1024)
+        self.deleted_messages = SnapshotBuffer(Config.SNIPE_DEPTH, Config.SNAPSHOT_CACHE_MB * 1024 * 1024 // 4)
+        self.removal_reasons = {}  # message id -> why the bot is deleting it
+        self.domains = DomainBlocklist(Config.LINK_BLOCKLIST_PATH)
+        self.invites = InviteResolver(bot, cache_size=Config.INVITE_CACHE_SIZE)
+        self.bans = BanCache(idle_seconds=Config.BAN_CACHE_IDLE_SECONDS)
+        self.nuke_tracker = ActionTracker(Config.ANTI_NUKE_THRESHOLDS, window=Config.ANTI_NUKE_WINDOW_SECONDS)
+        # Servers without their own automod settings keep the global spam and bad word filters
+        self.automod = AutoModEngine(
+            defaults={
+                'length': {'enabled': Config.SPAM_PROTECTION, 'max_length': Config.MAX_MESSAGE_LENGTH},
+                'badwords': {'enabled': Config.BAD_WORDS_FILTER, 'words': Config.BAD_WORDS},
+                'links': {'enabled': Config.LINK_SCANNING},
+            },
+            workers=Config.AUTOMOD_WORKERS,
+            expensive_timeout=Config.AUTOMOD_RULE_TIMEOUT,
+            context={'domains': self.domains, 'invites': self.invites},
+            cache_size=Config.AUTOMOD_CACHE_SIZE
+        )
+    
+    async def cog_load(self):
+        self.bot.timed_actions.register_handler('tempban', self.expire_tempban)
+        self.automod.load(await asyncio.to_thread(read_json, data_path('automod.json'), {}))
+        self.bot.maintenance.register('automod-replan', self.replan_automod, interval=3600, jitter=60, timeout=10)
+        await self.domains.reload_if_changed()
+        self.bot.maintenance.register(
+            'link-blocklist-reload', self.domains.reload_if_changed,
+            interval=self.config.LINK_BLOCKLIST_RELOAD_SECONDS, jitter=5, timeout=120
+        )
+        self.bot.maintenance.register('ban-cache-evict', self.evict_ban_lists, interval=600, jitter=30, timeout=5)
+        
+        if not self.config.IMAGE_SCREENING:
+            return
+        if not self.screener.available:
+            logger.warning("Pillow is not installed, attachment screening is disabled")
+            return
+        self.screener.load(await asyncio.to_thread(read_json, data_path('image_blocklist.json'), {}))
+        # Worker processes are only started once some server has blocked an image
+        if self.screener.blocklists:
+            self.screener.start()
+    
+    async def cog_unload(self):
+        self.bot.timed_actions.unregister_handler('tempban')
+        self.bot.maintenance.unregister('automod-replan')
+        self.bot.maintenance.unregister('link-blocklist-reload')
+        self.bot.maintenance.unregister('ban-cache-evict')
+        self.automod.close()
+        self.screener.close()
+    
+    def snapshot_state(self):
+        return {'recent': self.recent_messages, 'deleted': self.deleted_messages, 'bans': self.bans,
+                'nuke_tracker': self.nuke_tracker}
+    
+    def restore_state(self, state):
+        self.recent_messages = state['recent']
+        self.deleted_messages = state['deleted']
+        self.bans = state['bans']
+        self.nuke_tracker = state['nuke_tracker']
+    
+    async def replan_automod(self):
+        """Reorder every server's rules by their measured cost"""
+        self.automod.replan()
+    
+    async def save_automod(self):
+        await asyncio.to_thread(write_json_atomic, data_path('automod.json'), self.automod.to_dict())
+    
+    async def save_image_blocklist(self):
+        await asyncio.to_thread(write_json_atomic, data_path('image_blocklist.json'), self.screener.to_dict())
+    
+    async def evict_ban_lists(self):
+        evicted = self.bans.evict_idle()
+        if evicted:
+            logger.debug(f"Dropped {evicted} idle ban lists")
         
     @commands.command(name='kick', aliases=['k'])
     @commands.has_permissions(kick_members=True)
@@ -51,6 +146,7 @@ class ModerationCog(commands.Cog):
             embed.timestamp = datetime.utcnow()
             
             await member.ban(reason=reason)
+            self.bans.add(ctx.guild.id, member, reason)
             await ctx.send(embed=embed)
             logger.info(f"{ctx.author} banned {member} for: {reason}")
             
@@ -59,25 +155,72 @@ class ModerationCog(commands.Cog):
         except discord.HTTPException as e:
             await ctx.send(f"❌ Failed to ban member: {e}")
     
+    @commands.command(name='tempban', aliases=['tb'])
+    @commands.has_permissions(ban_members=True)
+    async def tempban_member(self, ctx, member: discord.Member, duration: str, *, reason="No reason provided"):
+        """Ban a member for a while (e.g. 12h, 7d, 1d12h)"""
+        try:
+            seconds = parse_duration(duration)
+        except ValueError:
+            await ctx.send("❌ Invalid duration format! Use: 30m, 12h, 7d, 1d12h, etc.")
+            return
+        
+        try:
+            await member.ban(reason=f"{reason} (temporary: {format_duration(seconds)})")
+            self.bans.add(ctx.guild.id, member, f"{reason} (temporary: {format_duration(seconds)})")
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to ban this member!")
+            return
+        except discord.HTTPException as e:
+            await ctx.send(f"❌ Failed to ban member: {e}")
+            return
+        action = await self.bot.timed_actions.schedule('tempban', ctx.guild.id, member.id, seconds, reason=reason)
+        
+        embed = discord.Embed(
+            title="⏳ Member Temporarily Banned",
+            description=f"**{member.display_name}** has been banned for {format_duration(seconds)}.",
+            color=0xff0000
+        )
+        embed.add_field(name="Reason", value=reason, inline=False)
+        embed.add_field(name="Moderator", value=ctx.author.display_name, inline=False)
+        embed.add_field(name="Unban", value=f"<t:{int(action.expires_at)}:R>", inline=True)
+        embed.add_field(name="Member ID", value=member.id, inline=True)
+        embed.timestamp = datetime.utcnow()
+        
+        await ctx.send(embed=embed)
+        logger.info(f"{ctx.author} temporarily banned {member} for {format_duration(seconds)}: {reason}")
+    
+    async def expire_tempban(self, guild, action):
+        try:
+            await guild.unban(discord.Object(action.target_id), reason="Temporary ban expired")
+        except discord.NotFound:
+            return  # Already unbanned by hand
+        logger.info(f"Temporary ban of {action.target_id} in {guild.name} expired")
+    
     @commands.command(name='unban')
     @commands.has_permissions(ban_members=True)
     async def unban_member(self, ctx, user_id: int):
         """Unban a member by their ID"""
         try:
-            user = await self.bot.fetch_user(user_id)
-            await ctx.guild.unban(user)
+            # The ban list already has the user's name, so there's no need to fetch the user
+            await ctx.guild.unban(discord.Object(user_id))
+            record = self.bans.remove(ctx.guild.id, user_id)
+            name = record.name if record else f"<@{user_id}>"
+            pending = self.bot.timed_actions.get('tempban', ctx.guild.id, user_id)
+            if pending:
+                await self.bot.timed_actions.cancel(pending)
             
             embed = discord.Embed(
                 title="✅ Member Unbanned",
-                description=f"**{user.display_name}** has been unbanned from the server.",
+                description=f"**{name}** has been unbanned from the server.",
                 color=0x00ff00
             )
             embed.add_field(name="Moderator", value=ctx.author.display_name, inline=False)
-            embed.add_field(name="User ID", value=user.id, inline=True)
+            embed.add_field(name="User ID", value=user_id, inline=True)
             embed.timestamp = datetime.utcnow()
             
             await ctx.send(embed=embed)
-            logger.info(f"{ctx.author} unbanned {user}")
+            logger.info(f"{ctx.author} unbanned {name} ({user_id})")
             
         except discord.NotFound:
             await ctx.send("❌ User not found in ban list!")
@@ -154,6 +297,203 @@ class ModerationCog(commands.Cog):
         except discord.HTTPException as e:
             await ctx.send(f"❌ Failed to remove timeout: {e}")
     
+    @commands.command(name='massban')
+    @commands.has_permissions(ban_members=True)
+    async def mass_ban(self, ctx, *, text: str = ""):
+        """Ban a list of user IDs or mentions (or an attached .txt file of them)"""
+        if not ctx.guild.me.guild_permissions.ban_members:
+            await ctx.send("❌ I don't have permission to ban members!")
+            return
+        await self.mass_action(ctx, 'ban', text)
+    
+    @commands.command(name='masskick')
+    @commands.has_permissions(kick_members=True)
+    async def mass_kick(self, ctx, *, text: str = ""):
+        """Kick a list of user IDs or mentions (or an attached .txt file of them)"""
+        if not ctx.guild.me.guild_permissions.kick_members:
+            await ctx.send("❌ I don't have permission to kick members!")
+            return
+        await self.mass_action(ctx, 'kick', text)
+    
+    async def collect_user_ids(self, ctx, text):
+        """IDs pasted in the command and in attached text files, deduplicated"""
+        sources = [text]
+        for attachment in ctx.message.attachments:
+            is_text = (attachment.content_type or '').startswith('text/') or attachment.filename.endswith(('.txt', '.csv'))
+            if is_text and attachment.size <= 1024 * 1024:
+                sources.append((await attachment.read()).decode('utf-8', errors='ignore'))
+        return parse_user_ids('\n'.join(sources))
+    
+    async def find_members(self, guild, user_ids):
+        """{user_id: Member} for the IDs that are in the server"""
+        members = {}
+        missing = []
+        for user_id in user_ids:
+            member = guild.get_member(user_id)
+            if member:
+                members[user_id] = member
+            else:
+                missing.append(user_id)
+        # With a partial member cache, ask the gateway about the rest, 100 IDs per query
+        if missing and not guild.chunked and self.bot.intents.members:
+            for chunk in chunked(missing, 100):
+                try:
+                    for member in await guild.query_members(user_ids=chunk, limit=len(chunk), cache=False):
+                        members[member.id] = member
+                except asyncio.TimeoutError:
+                    logger.warning(f"Timed out looking up {len(chunk)} members in {guild.name}")
+        return members
+    
+    def mass_action_exemption(self, ctx, user_id, member):
+        """Why a user is left out of a mass ban or kick, or None"""
+        if user_id in (ctx.author.id, ctx.guild.owner_id, self.bot.user.id):
+            return "protected"
+        if member is None:
+            return None
+        if member.top_role >= ctx.guild.me.top_role:
+            return "role above mine"
+        if ctx.author.id != ctx.guild.owner_id and member.top_role >= ctx.author.top_role:
+            return "role above yours"
+        return None
+    
+    async def mass_action(self, ctx, kind, text):
+        """Confirm and run a mass ban or kick, editing a status message as it goes"""
+        ban = kind == 'ban'
+        user_ids = await self.collect_user_ids(ctx, text)
+        if not user_ids:
+            await ctx.send(f"❌ No user IDs found! Usage: `{self.config.BOT_PREFIX}mass{kind} <IDs or mentions> [reason]` "
+                           "or attach a .txt file with the IDs")
+            return
+        if len(user_ids) > self.config.MASS_ACTION_LIMIT:
+            await ctx.send(f"❌ That's {len(user_ids)} users; the limit is {self.config.MASS_ACTION_LIMIT} per command!")
+            return
+        reason = (strip_user_ids(text) or f"Mass {kind} by {ctx.author}")[:AUDIT_REASON_LIMIT]
+        
+        async with ctx.typing():
+            members = await self.find_members(ctx.guild, user_ids)
+        skipped = {}
+        targets = []
+        for user_id in user_ids:
+            member = members.get(user_id)
+            why = self.mass_action_exemption(ctx, user_id, member)
+            if why is None and member is None and not ban:
+                why = "not in the server"
+            if why is None and ban and self.bans.get_cached(ctx.guild.id, user_id):
+                why = "already banned"
+            if why:
+                skipped[why] = skipped.get(why, 0) + 1
+            else:
+                targets.append(user_id)
+        skipped_text = "\n".join(f"{count} {why}" for why, count in skipped.items())
+        
+        if not targets:
+            await ctx.send(f"❌ None of the {len(user_ids)} users can be {'banned' if ban else 'kicked'}!\n{skipped_text}")
+            return
+        
+        # Confirmation
+        embed = discord.Embed(
+            title=f"⚠️ Mass {kind.title()}",
+            description=f"Are you sure you want to {kind} {len(targets)} users?",
+            color=0xffa500
+        )
+        embed.add_field(name="Reason", value=reason[:1024], inline=False)
+        if skipped_text:
+            embed.add_field(name="Skipped", value=skipped_text, inline=False)
+        
+        message = await ctx.send(embed=embed)
+        await message.add_reaction('✅')
+        await message.add_reaction('❌')
+        
+        def check(reaction, user):
+            return user == ctx.author and str(reaction.emoji) in ['✅', '❌']
+        
+        try:
+            with self.bot.sessions.open(message_id=message.id) as session:
+                reaction, user = await session.wait_for('reaction', timeout=30.0, check=check)
+        except asyncio.TimeoutError:
+            await ctx.send(f"⏰ Mass {kind} timed out!")
+            return
+        if str(reaction.emoji) == '❌':
+            await ctx.send(f"❌ Mass {kind} cancelled!")
+            return
+        
+        def status_embed(done, title, color=0xffa500):
+            embed = discord.Embed(title=title, description=f"{done}/{len(targets)} processed", color=color)
+            embed.timestamp = datetime.utcnow()
+            return embed
+        
+        status = await ctx.send(embed=status_embed(0, f"⏳ Mass {kind} in progress..."))
+        
+        async def on_progress(done):
+            await status.edit(embed=status_embed(done, f"⏳ Mass {kind} in progress..."))
+        
+        start = time.perf_counter()
+        if ban:
+            results = await self.execute_mass_ban(ctx.guild, targets, reason, on_progress)
+        else:
+            results = await run_bounded(
+                targets, lambda user_id: members[user_id].kick(reason=reason),
+                concurrency=self.config.MASS_ACTION_CONCURRENCY, on_progress=on_progress
+            )
+        elapsed = time.perf_counter() - start
+        succeeded = [user_id for user_id, error in results.items() if error is None]
+        failed = len(results) - len(succeeded)
+        
+        embed = status_embed(len(results), f"✅ Mass {kind.title()} Complete", 0x00ff00)
+        embed.description = (f"{'Banned' if ban else 'Kicked'} {len(succeeded)} of {len(user_ids)} users "
+                             f"in {elapsed:.1f}s")
+        embed.add_field(name="Reason", value=reason[:1024], inline=False)
+        if skipped_text:
+            embed.add_field(name="Skipped", value=skipped_text, inline=True)
+        if failed:
+            embed.add_field(name="Failed", value=str(failed), inline=True)
+        await status.edit(embed=embed)
+        logger.info(f"{ctx.author} mass {kind}ed {len(succeeded)} users in {ctx.guild.name} "
+                    f"({failed} failed, {elapsed:.1f}s): {reason}")
+        
+        channel = self.mod_log_channel(ctx.guild.id)
+        if channel and succeeded:
+            embed.add_field(name="Moderator", value=ctx.author.mention, inline=False)
+            file = discord.File(io.BytesIO("\n".join(map(str, succeeded)).encode('utf-8')),
+                                filename=f"mass{kind}-{ctx.guild.id}.txt")
+            try:
+                await channel.send(embed=embed, file=file)
+            except discord.HTTPException as e:
+                logger.warning(f"Could not log mass {kind} to the mod log: {e}")
+    
+    async def execute_mass_ban(self, guild, user_ids, reason, on_progress):
+        """Ban users 200 at a time with the bulk ban endpoint, or one at a time concurrently
+
+        Returns {user_id: error or None}. The bulk endpoint also needs
+        Manage Server; without it, or for a chunk it rejects, the bans are
+        made individually.
+        """
+        results = {}
+        remaining = user_ids
+        if guild.me.guild_permissions.manage_guild:
+            remaining = []
+            for chunk in chunked(user_ids, 200):
+                try:
+                    result = await guild.bulk_ban([discord.Object(user_id) for user_id in chunk], reason=reason)
+                except discord.HTTPException as e:
+                    logger.warning(f"Bulk ban of {len(chunk)} users in {guild.name} failed, banning one by one: {e}")
+                    remaining.extend(chunk)
+                    continue
+                for user in result.banned:
+                    results[user.id] = None
+                for user in result.failed:
+                    results[user.id] = "rejected by Discord"
+                await on_progress(len(results))
+        
+        if remaining:
+            done = len(results)
+            results.update(await run_bounded(
+                remaining, lambda user_id: guild.ban(discord.Object(user_id), reason=reason),
+                concurrency=self.config.MASS_ACTION_CONCURRENCY,
+                on_progress=lambda count: on_progress(done + count)
+            ))
+        return results
+    
     @commands.command(name='clear', aliases=['purge', 'delete'])
     @commands.has_permissions(manage_messages=True)
     async def clear_messages(self, ctx, amount: int = 5):
@@ -226,28 +566,723 @@ class ModerationCog(commands.Cog):
         
         await ctx.send(embed=embed)
     
+    @commands.group(name='timed', aliases=['scheduled'], invoke_without_command=True)
+    @commands.has_permissions(kick_members=True)
+    async def timed_actions(self, ctx):
+        """List this server's pending tempbans, temporary roles and timed locks"""
+        pending = self.bot.timed_actions.pending(ctx.guild.id)
+        
+        embed = discord.Embed(
+            title="⏳ Timed Actions",
+            description=f"{len(pending)} pending" if pending else "Nothing is scheduled.",
+            color=0x1e90ff
+        )
+        targets = {
+            'tempban': lambda action: f"Unban <@{action.target_id}>",
+            'temprole': lambda action: f"Remove <@&{action.subject_id}> from <@{action.target_id}>",
+            'lock': lambda action: f"Unlock <#{action.target_id}>",
+        }
+        lines = [
+            f"`#{action.id}` {targets.get(action.kind, lambda a: a.kind)(action)} <t:{int(action.expires_at)}:R>"
+            for action in pending[:20]
+        ]
+        if len(pending) > 20:
+            lines.append(f"... and {len(pending) - 20} more")
+        if lines:
+            embed.add_field(name="Upcoming", value="\n".join(lines), inline=False)
+        embed.set_footer(text=f"{self.config.BOT_PREFIX}timed cancel <id> keeps the action in place for good")
+        embed.timestamp = datetime.utcnow()
+        
+        await ctx.send(embed=embed)
+    
+    @timed_actions.command(name='cancel')
+    @commands.has_permissions(kick_members=True)
+    async def timed_cancel(self, ctx, action_id: int):
+        """Cancel a timed action so it is never undone"""
+        action = self.bot.timed_actions.actions.get(action_id)
+        if action is None or action.guild_id != ctx.guild.id:
+            await ctx.send(f"❌ No pending action #{action_id}!")
+            return
+        
+        # Making a ban or lock permanent needs the permission that created it
+        required = {'tempban': 'ban_members', 'temprole': 'manage_roles', 'lock': 'manage_channels'}.get(action.kind)
+        if required and not getattr(ctx.author.guild_permissions, required):
+            await ctx.send(f"❌ You need the {required.replace('_', ' ')} permission to cancel that!")
+            return
+        
+        await self.bot.timed_actions.cancel(action)
+        await ctx.send(f"✅ Cancelled {action.kind} #{action.id}; it will not be undone automatically")
+        logger.info(f"{ctx.author} cancelled timed {action.kind} #{action.id} in {ctx.guild.name}")
+    
+    @staticmethod
+    def ban_line(record):
+        line = f"`{record.user_id}` **{discord.utils.escape_markdown(record.name)}**"
+        if record.reason:
+            line += f" — {record.reason[:60]}"
+        if record.banned_at:
+            line += f" <t:{int(record.banned_at)}:R>"
+        return line
+    
+    @staticmethod
+    def ban_filter(text):
+        """A BanRecord predicate from a name, ID or pattern and/or since:/before: durations"""
+        # Bans older than the audit log have no date, so they count as older than any before:
+        now = time.time()
+        checks = []
+        words = []
+        for word in text.split():
+            key, _, value = word.partition(':')
+            if key.lower() == 'since' and value:
+                cutoff = now - parse_duration(value)
+                checks.append(lambda record, cutoff=cutoff: record.banned_at is not None and record.banned_at >= cutoff)
+            elif key.lower() == 'before' and value:
+                cutoff = now - parse_duration(value)
+                checks.append(lambda record, cutoff=cutoff: record.banned_at is None or record.banned_at < cutoff)
+            else:
+                words.append(word)
+        if words:
+            checks.append(ban_matcher(' '.join(words)))
+        if not checks:
+            raise ValueError("empty filter")
+        return lambda record: all(check(record) for check in checks)
+    
+    async def load_bans(self, ctx):
+        """The guild's ban list, or None after telling the caller it couldn't be read"""
+        try:
+            async with ctx.typing():
+                return await self.bans.get(ctx.guild)
+        except discord.Forbidden:
+            await ctx.send("❌ I need the Ban Members permission to read the ban list!")
+        except discord.HTTPException as e:
+            await ctx.send(f"❌ Failed to load the ban list: {e}")
+        return None
+    
+    @commands.group(name='bans', invoke_without_command=True)
+    @commands.has_permissions(ban_members=True)
+    async def bans_group(self, ctx):
+        """Show how many users are banned and the latest bans"""
+        records = await self.load_bans(ctx)
+        if records is None:
+            return
+        latest = sorted(
+            (record for record in records.values() if record.banned_at),
+            key=lambda record: record.banned_at, reverse=True
+        )[:10]
+        
+        embed = discord.Embed(
+            title="🔨 Bans",
+            description=f"{len(records)} banned users" if records else "Nobody is banned.",
+            color=0xff0000
+        )
+        if latest:
+            embed.add_field(name="Latest", value="\n".join(self.ban_line(record) for record in latest)[:1024], inline=False)
+        embed.set_footer(text=f"{self.config.BOT_PREFIX}bans search <name, ID or pattern> • "
+                              f"{self.config.BOT_PREFIX}bans unban <pattern, since:7d or before:30d>")
+        embed.timestamp = datetime.utcnow()
+        
+        await ctx.send(embed=embed)
+    
+    @bans_group.command(name='search', aliases=['find'])
+    @commands.has_permissions(ban_members=True)
+    async def bans_search(self, ctx, *, pattern: str):
+        """Search bans by user ID, name or reason (* and ? wildcards match whole names)"""
+        records = await self.load_bans(ctx)
+        if records is None:
+            return
+        matches_pattern = ban_matcher(pattern)
+        matches = [record for record in records.values() if matches_pattern(record)]
+        
+        embed = discord.Embed(
+            title="🔍 Ban Search",
+            description=f"{len(matches)} of {len(records)} bans match `{discord.utils.escape_markdown(pattern)}`",
+            color=0x1e90ff
+        )
+        lines = [self.ban_line(record) for record in matches[:15]]
+        if len(matches) > 15:
+            lines.append(f"... and {len(matches) - 15} more, narrow the search to see them")
+        if lines:
+            embed.add_field(name="Matches", value="\n".join(lines)[:1024], inline=False)
+        embed.timestamp = datetime.utcnow()
+        
+        await ctx.send(embed=embed)
+    
+    @bans_group.command(name='unban')
+    @commands.has_permissions(ban_members=True)
+    async def bans_unban(self, ctx, *, filter: str):
+        """Unban everyone matching a pattern and/or since:<duration> or before:<duration>"""
+        try:
+            matches_filter = self.ban_filter(filter)
+        except ValueError:
+            await ctx.send("❌ Invalid filter! Use a name, ID or pattern and/or since:7d, before:30d, etc.")
+            return
+        records = await self.load_bans(ctx)
+        if records is None:
+            return
+        targets = [record for record in records.values() if matches_filter(record)]
+        if not targets:
+            await ctx.send(f"❌ No bans match `{discord.utils.escape_markdown(filter)}`!")
+            return
+        
+        # Confirmation
+        rate = self.config.BULK_UNBAN_PER_SECOND
+        embed = discord.Embed(
+            title="⚠️ Bulk Unban",
+            description=f"Are you sure you want to unban {len(targets)} users?",
+            color=0xffa500
+        )
+        examples = [self.ban_line(record) for record in targets[:10]]
+        if len(targets) > 10:
+            examples.append(f"... and {len(targets) - 10} more")
+        embed.add_field(name="Users to unban", value="\n".join(examples)[:1024], inline=False)
+        embed.add_field(name="Estimated time", value=format_duration(len(targets) / rate), inline=True)
+        
+        message = await ctx.send(embed=embed)
+        await message.add_reaction('✅')
+        await message.add_reaction('❌')
+        
+        def check(reaction, user):
+            return user == ctx.author and str(reaction.emoji) in ['✅', '❌']
+        
+        try:
+            with self.bot.sessions.open(message_id=message.id) as session:
+                reaction, user = await session.wait_for('reaction', timeout=30.0, check=check)
+        except asyncio.TimeoutError:
+            await ctx.send("⏰ Bulk unban timed out!")
+            return
+        if str(reaction.emoji) == '❌':
+            await ctx.send("❌ Bulk unban cancelled!")
+            return
+        
+        def progress_embed(done, title="⏳ Unbanning...", color=0xffa500):
+            embed = discord.Embed(title=title, description=f"{done}/{len(targets)} processed", color=color)
+            embed.add_field(name="Unbanned", value=str(unbanned), inline=True)
+            embed.add_field(name="Failed", value=str(failed), inline=True)
+            embed.timestamp = datetime.utcnow()
+            return embed
+        
+        # One at a time: discord.py waits out the rate limit buckets, and the pause keeps
+        # a long run from starving the bot's other requests to the same endpoint
+        unbanned = failed = done = 0
+        status = await ctx.send(embed=progress_embed(0))
+        last_update = time.monotonic()
+        reason = f"Bulk unban by {ctx.author}"
+        for record in targets:
+            try:
+                await ctx.guild.unban(discord.Object(record.user_id), reason=reason)
+                unbanned += 1
+            except discord.NotFound:
+                pass  # Already unbanned
+            except discord.Forbidden:
+                await ctx.send("❌ I don't have permission to unban members!")
+                break
+            except discord.HTTPException as e:
+                failed += 1
+                logger.warning(f"Bulk unban of {record.user_id} in {ctx.guild.name} failed: {e}")
+                continue
+            finally:
+                done += 1
+            self.bans.remove(ctx.guild.id, record.user_id)
+            pending = self.bot.timed_actions.get('tempban', ctx.guild.id, record.user_id)
+            if pending:
+                await self.bot.timed_actions.cancel(pending)
+            
+            if time.monotonic() - last_update >= 5:
+                await status.edit(embed=progress_embed(done))
+                last_update = time.monotonic()
+            await asyncio.sleep(1 / rate)
+        
+        await status.edit(embed=progress_embed(done, "✅ Bulk Unban Complete", 0x00ff00))
+        logger.info(f"{ctx.author} bulk unbanned {unbanned} users in {ctx.guild.name} ({filter})")
+    
+    @commands.group(name='imageblock', aliases=['imgblock'], invoke_without_command=True)
+    @commands.has_permissions(manage_messages=True)
+    async def imageblock(self, ctx):
+        """List the images blocked in this server"""
+        entries = list(self.screener.blocklists.get(ctx.guild.id, {}).values())
+        
+        embed = discord.Embed(
+            title="🖼️ Blocked Images",
+            description=f"{len(entries)} images blocked" if entries else "No images are blocked.",
+            color=0xff0000
+        )
+        for entry in entries[:25]:
+            embed.add_field(
+                name=f"`{entry['hash']}`",
+                value=f"{entry['label']}\nAdded by <@{entry['added_by']}>",
+                inline=True
+            )
+        embed.set_footer(text=f"{self.config.BOT_PREFIX}imageblock add [label] | {self.config.BOT_PREFIX}imageblock remove <hash>")
+        embed.timestamp = datetime.utcnow()
+        
+        await ctx.send(embed=embed)
+    
+    @imageblock.command(name='add')
+    @commands.has_permissions(manage_messages=True)
+    async def imageblock_add(self, ctx, *, label: str = "No label"):
+        """Block an attached image, or the image in the message you reply to"""
+        if not self.screener.available or not self.config.IMAGE_SCREENING:
+            await ctx.send("❌ Image screening is not enabled!")
+            return
+        
+        attachments = ctx.message.attachments
+        if not attachments and ctx.message.reference:
+            try:
+                replied = ctx.message.reference.resolved or await ctx.channel.fetch_message(ctx.message.reference.message_id)
+                attachments = replied.attachments
+            except discord.HTTPException:
+                attachments = []
+        images = [attachment for attachment in attachments if self.screener.screenable(attachment)]
+        if not images:
+            await ctx.send("❌ Attach an image (or reply to a message with one) to block it!")
+            return
+        
+        image_hash = await self.screener.hash_attachment(images[0])
+        if image_hash is None:
+            await ctx.send("❌ Couldn't read that image!")
+            return
+        
+        hex_hash = f"{image_hash:016x}"
+        self.screener.start()
+        self.screener.block(ctx.guild.id, image_hash, {'hash': hex_hash, 'label': label[:100], 'added_by': ctx.author.id})
+        await self.save_image_blocklist()
+        
+        await ctx.send(f"✅ Blocked image `{hex_hash}` ({label[:100]})")
+        logger.info(f"{ctx.author} blocked image {hex_hash} in {ctx.guild.name}")
+    
+    @imageblock.command(name='remove', aliases=['delete'])
+    @commands.has_permissions(manage_messages=True)
+    async def imageblock_remove(self, ctx, image_hash: str):
+        """Unblock an image by its hash"""
+        try:
+            removed = self.screener.unblock(ctx.guild.id, int(image_hash, 16))
+        except ValueError:
+            removed = None
+        if not removed:
+            await ctx.send(f"❌ Image `{image_hash}` is not blocked!")
+            return
+        
+        await self.save_image_blocklist()
+        await ctx.send(f"✅ Unblocked image `{removed['hash']}` ({removed['label']})")
+        logger.info(f"{ctx.author} unblocked image {removed['hash']} in {ctx.guild.name}")
+    
+    @commands.group(name='automod', aliases=['am'], invoke_without_command=True)
+    @commands.has_permissions(manage_guild=True)
+    async def automod_group(self, ctx):
+        """Show this server's auto-moderation rules"""
+        embed = discord.Embed(
+            title="🛡️ Auto-Moderation Rules",
+            description="Disabled" if not self.config.AUTO_MODERATION else None,
+            color=0x1e90ff
+        )
+        for name in RULE_TYPES:
+            options = self.automod.options(ctx.guild.id, name)
+            details = []
+            for key, value in options.items():
+                if key == 'enabled':
+                    continue
+                if isinstance(value, list):
+                    value = f"{len(value)} entries"
+                details.append(f"{key}: {value}")
+            embed.add_field(
+                name=f"{'✅' if options['enabled'] else '❌'} {name}",
+                value="\n".join(details) or "No options",
+                inline=True
+            )
+        embed.set_footer(text=f"{self.config.BOT_PREFIX}automod enable|disable <rule> | "
+                              f"set <rule> <option> <value> | add|remove <rule> <value> | stats")
+        embed.timestamp = datetime.utcnow()
+        
+        await ctx.send(embed=embed)
+    
+    async def configure_automod(self, ctx, rule, **options):
+        """Apply a rule change and save it, reporting errors to the channel"""
+        if rule not in RULE_TYPES:
+            await ctx.send(f"❌ Unknown rule! Rules: {', '.join(RULE_TYPES)}")
+            return False
+        try:
+            self.automod.configure(ctx.guild.id, rule, **options)
+        except ValueError as e:
+            await ctx.send(f"❌ Invalid setting: {e}")
+            return False
+        await self.save_automod()
+        logger.info(f"{ctx.author} changed automod rule {rule} in {ctx.guild.name}: {options}")
+        return True
+    
+    @automod_group.command(name='enable', aliases=['on'])
+    @commands.has_permissions(manage_guild=True)
+    async def automod_enable(self, ctx, rule: str):
+        """Turn an auto-moderation rule on"""
+        if await self.configure_automod(ctx, rule.lower(), enabled=True):
+            await ctx.send(f"✅ Enabled the `{rule.lower()}` rule")
+    
+    @automod_group.command(name='disable', aliases=['off'])
+    @commands.has_permissions(manage_guild=True)
+    async def automod_disable(self, ctx, rule: str):
+        """Turn an auto-moderation rule off"""
+        if await self.configure_automod(ctx, rule.lower(), enabled=False):
+            await ctx.send(f"✅ Disabled the `{rule.lower()}` rule")
+    
+    @automod_group.command(name='set')
+    @commands.has_permissions(manage_guild=True)
+    async def automod_set(self, ctx, rule: str, option: str, *, value: str):
+        """Change a rule option, e.g. caps ratio 0.8, or its reply message"""
+        rule, option = rule.lower(), option.lower()
+        if rule not in RULE_TYPES:
+            await ctx.send(f"❌ Unknown rule! Rules: {', '.join(RULE_TYPES)}")
+            return
+        
+        current = self.automod.options(ctx.guild.id, rule)
+        if option != 'message' and option not in current:
+            await ctx.send(f"❌ `{rule}` has no option `{option}`!")
+            return
+        
+        # Parse the value as the option's current type
+        old = current.get(option, '')
+        try:
+            if isinstance(old, list):
+                await ctx.send(f"❌ Use `{self.config.BOT_PREFIX}automod add|remove {rule} <value>` for lists!")
+                return
+            elif isinstance(old, bool):
+                new = value.lower() in ('true', 'yes', 'on', '1')
+            elif isinstance(old, int):
+                new = int(value)
+            elif isinstance(old, float):
+                new = float(value)
+            else:
+                new = value
+        except ValueError:
+            await ctx.send(f"❌ `{value}` is not a valid value for `{option}`!")
+            return
+        
+        if await self.configure_automod(ctx, rule, **{option: new}):
+            await ctx.send(f"✅ Set `{rule}` {option} to `{new}`")
+    
+    @automod_group.command(name='add')
+    @commands.has_permissions(manage_guild=True)
+    async def automod_add(self, ctx, rule: str, *, value: str):
+        """Add a word or regex pattern to a list rule"""
+        await self.edit_automod_list(ctx, rule.lower(), value, add=True)
+    
+    @automod_group.command(name='remove')
+    @commands.has_permissions(manage_guild=True)
+    async def automod_remove(self, ctx, rule: str, *, value: str):
+        """Remove a word or regex pattern from a list rule"""
+        await self.edit_automod_list(ctx, rule.lower(), value, add=False)
+    
+    async def edit_automod_list(self, ctx, rule, value, add):
+        if rule not in RULE_TYPES:
+            await ctx.send(f"❌ Unknown rule! Rules: {', '.join(RULE_TYPES)}")
+            return
+        lists = {key: item for key, item in self.automod.options(ctx.guild.id, rule).items() if isinstance(item, list)}
+        if not lists:
+            await ctx.send(f"❌ `{rule}` has no list to edit!")
+            return
+        
+        key, items = next(iter(lists.items()))
+        if add:
+            if value in items:
+                await ctx.send(f"ℹ️ `{value}` is already in `{rule}`")
+                return
+            items = items + [value]
+        else:
+            if value not in items:
+                await ctx.send(f"❌ `{value}` is not in `{rule}`!")
+                return
+            items = [item for item in items if item != value]
+        
+        if await self.configure_automod(ctx, rule, **{key: items}):
+            await ctx.send(f"✅ {'Added' if add else 'Removed'} `{value}` {'to' if add else 'from'} `{rule}` "
+                           f"({len(items)} {key})")
+    
+    @automod_group.command(name='stats')
+    @commands.has_permissions(manage_guild=True)
+    async def automod_stats(self, ctx):
+        """Show how often each rule fires and what it costs"""
+        rows = sorted(
+            ((name, stats) for (guild_id, name), stats in self.automod.stats.items() if guild_id == ctx.guild.id),
+            key=lambda row: row[1].hits, reverse=True
+        )
+        if not rows:
+            await ctx.send("ℹ️ No messages have been checked yet.")
+            return
+        
+        plan = self.automod.plan(ctx.guild.id)
+        order = " → ".join(rule.name for rule in plan.rules)
+        lookups = self.invites.hits + self.invites.misses
+        
+        embed = discord.Embed(
+            title="📊 Auto-Moderation Stats",
+            description=f"**Evaluation order:** {order or 'no rules enabled'}\n"
+                        f"**Blocked domains:** {len(self.domains):,}\n"
+                        f"**Invite lookups:** {lookups:,} ({self.invites.hits / lookups if lookups else 0:.0%} cached)\n"
+                        f"**Verdict cache:** {self.automod.cache_hits:,} hits, {self.automod.cache_misses:,} misses "
+                        f"({self.automod.cache_hit_rate:.0%})",
+            color=0x1e90ff
+        )
+        for name, stats in rows[:25]:
+            value = (f"Checked: {stats.evaluations:,} | Fired: {stats.hits:,}\n"
+                     f"Avg {stats.mean_us:.1f}µs, max {stats.max_ns / 1000:.1f}µs")
+            if stats.timeouts:
+                value += f"\n⚠️ Timeouts: {stats.timeouts}"
+            embed.add_field(name=name, value=value, inline=True)
+        embed.timestamp = datetime.utcnow()
+        
+        await ctx.send(embed=embed)
+    
     # Auto-moderation features
+    async def remove_message(self, message, reason):
+        """Delete a message, noting why for the mod log; returns whether it was deleted"""
+        if len(self.removal_reasons) > 1000:
+            self.removal_reasons.clear()  # Only left over when a delete event never arrived
+        self.removal_reasons[message.id] = reason
+        try:
+            await message.delete()
+        except discord.HTTPException as e:
+            self.removal_reasons.pop(message.id, None)
+            if not isinstance(e, discord.NotFound):
+                logger.warning(f"Could not remove a message in {message.guild.name}: {e}")
+            return False
+        return True
+    
+    async def enforce_automod(self, message, edited=False):
+        """Delete a message that breaks one of the server's rules; returns whether it did"""
+        verdict = await self.automod.evaluate(message)
+        if not verdict:
+            return False
+        if not await self.remove_message(message, f"Auto-moderation: {verdict.rule} ({verdict.reason})"):
+            return True
+        await message.channel.send(f"{message.author.mention} {verdict.message}", delete_after=5)
+        logger.info(f"Auto-moderation removed {'an edited' if edited else 'a'} message from {message.author} in "
+                    f"{message.guild.name}: {verdict.rule} ({verdict.reason})")
+        return True
+    
     @commands.Cog.listener()
     async def on_message(self, message):
-        """Auto-moderation for spam and bad words"""
+        """Auto-moderation with the server's rules and image blocklist"""
+        if message.author.bot or not message.guild:
+            return
+        
+        self.recent_messages.add(message.channel.id, MessageSnapshot.from_message(message))
+        
+        if self.config.AUTO_MODERATION and await self.enforce_automod(message):
+            return
+        
+        # Check attachments against the server's image blocklist
+        if self.config.IMAGE_SCREENING and message.attachments:
+            match = await self.screener.screen(message.guild.id, message.attachments)
+            if match:
+                attachment, distance, entry = match
+                if not await self.remove_message(message, f"Blocked image: {entry['label']}"):
+                    return
+                await message.channel.send(f"{message.author.mention} That image is not allowed here!", delete_after=5)
+                logger.info(f"Removed blocklisted image {attachment.filename} from {message.author} in "
+                            f"{message.guild.name} (matched {entry['hash']} '{entry['label']}', distance {distance})")
+    
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        """Check edited messages against the same rules, including ones older than the message cache"""
+        if payload.guild_id is None:
+            return
+        message = payload.message
         if message.author.bot:
             return
+        # Link embeds and pins also send edits; those leave the content unchanged
+        before = payload.cached_message
+        if before is not None and before.content == message.content:
+            return
+        
+        self.recent_messages.replace(payload.channel_id, MessageSnapshot.from_message(message))
+        if self.config.AUTO_MODERATION:
+            await self.enforce_automod(message, edited=True)
+    
+    def mod_log_channel(self, guild_id):
+        channel = self.bot.get_channel(self.config.MOD_LOG_CHANNEL_ID) if self.config.MOD_LOG_CHANNEL_ID else None
+        if channel and channel.guild.id == guild_id:
+            return channel
+        return None
+    
+    def snapshot_embed(self, snapshot, title, channel_id, color=0xff0000):
+        embed = discord.Embed(
+            title=title,
+            description=snapshot.content or "*(no text)*",
+            color=color
+        )
+        embed.add_field(name="Author", value=f"<@{snapshot.author_id}> ({snapshot.author_name})", inline=True)
+        embed.add_field(name="Channel", value=f"<#{channel_id}>", inline=True)
+        if snapshot.attachments:
+            embed.add_field(name="Attachments", value="\n".join(snapshot.attachments)[:1024], inline=False)
+        embed.set_footer(text=f"Message ID: {snapshot.id}{' | edited' if snapshot.edited else ''}")
+        return embed
+    
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        """Keep deleted messages for !snipe and log them to the mod log"""
+        if payload.guild_id is None:
+            return
+        reason = self.removal_reasons.pop(payload.message_id, None)
+        snapshot = self.recent_messages.pop(payload.channel_id, payload.message_id)
+        if snapshot is None:
+            cached = payload.cached_message
+            if cached is None or cached.author.bot:
+                return
+            snapshot = MessageSnapshot.from_message(cached)
+        self.deleted_messages.add(payload.channel_id, snapshot)
+        
+        channel = self.mod_log_channel(payload.guild_id)
+        if channel is None or channel.id == payload.channel_id:
+            return
+        embed = self.snapshot_embed(snapshot, "🗑️ Message Deleted", payload.channel_id)
+        if reason:
+            embed.add_field(name="Reason", value=reason[:1024], inline=False)
+        embed.timestamp = discord.utils.utcnow()
+        try:
+            await channel.send(embed=embed)
+        except discord.HTTPException as e:
+            logger.warning(f"Could not write to the mod log: {e}")
+    
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        """Log a purge as one transcript instead of a message per deletion"""
+        if payload.guild_id is None:
+            return
+        snapshots = []
+        for message_id in sorted(payload.message_ids):
+            snapshot = self.recent_messages.pop(payload.channel_id, message_id)
+            if snapshot:
+                self.deleted_messages.add(payload.channel_id, snapshot)
+                snapshots.append(snapshot)
+        
+        channel = self.mod_log_channel(payload.guild_id)
+        if channel is None or channel.id == payload.channel_id:
+            return
+        embed = discord.Embed(
+            title="🗑️ Messages Purged",
+            description=f"**{len(payload.message_ids)}** messages deleted in <#{payload.channel_id}> "
+                        f"({len(snapshots)} recorded)",
+            color=0xff0000
+        )
+        embed.timestamp = discord.utils.utcnow()
+        
+        file = None
+        if snapshots:
+            transcript = "\n".join(
+                f"[{datetime.fromtimestamp(snapshot.created_at, tz=timezone.utc):%Y-%m-%d %H:%M:%S}] "
+                f"{snapshot.author_name} ({snapshot.author_id}): {snapshot.content}"
+                + (f" [attachments: {', '.join(snapshot.attachments)}]" if snapshot.attachments else "")
+                for snapshot in snapshots
+            )
+            file = discord.File(io.BytesIO(transcript.encode('utf-8')), filename=f"purge-{payload.channel_id}.txt")
+        try:
+            await channel.send(embed=embed, file=file)
+        except discord.HTTPException as e:
+            logger.warning(f"Could not write to the mod log: {e}")
+    
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.recent_messages.drop_channel(channel.id)
+        self.deleted_messages.drop_channel(channel.id)
+    
+    @commands.Cog.listener()
+    async def on_member_ban(self, guild, user):
+        self.bans.add(guild.id, user)
+    
+    @commands.Cog.listener()
+    async def on_member_unban(self, guild, user):
+        self.bans.remove(guild.id, user.id)
+    
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.bans.drop(guild.id)
+        self.nuke_tracker.forget(guild.id)
+    
+    @commands.Cog.listener()
+    async def on_audit_log_entry_create(self, entry):
+        """Watch for accounts deleting, banning or kicking faster than anyone should"""
+        action = WATCHED_ACTIONS.get(entry.action)
+        if action is None or not self.config.ANTI_NUKE:
+            return
+        guild = entry.guild
+        actor_id = entry.user_id
+        if actor_id is None or actor_id in (self.bot.user.id, guild.owner_id) or actor_id in self.config.ANTI_NUKE_TRUSTED_IDS:
+            return
+        if self.nuke_tracker.record(guild.id, actor_id, action):
+            await self.contain_nuker(guild, actor_id, action)
+    
+    async def contain_nuker(self, guild, actor_id, action):
+        """Take the roles off an account that passed an anti-nuke limit and alert staff"""
+        limit = self.config.ANTI_NUKE_THRESHOLDS[action]
+        window = self.config.ANTI_NUKE_WINDOW_SECONDS
+        reason = f"Anti-nuke: {limit}+ {action.replace('_', ' ')}s in {window}s"
+        logger.warning(f"{reason} by {actor_id} in {guild.name}")
         
-        # Check for spam
-        if self.config.SPAM_PROTECTION:
-            # Basic spam detection (this would be more sophisticated in a real implementation)
-            if len(message.content) > self.config.MAX_MESSAGE_LENGTH:
-                await message.delete()
-                await message.channel.send(f"{message.author.mention} Your message was too long!", delete_after=5)
-        
-        # Check for bad words
-        if self.config.BAD_WORDS_FILTER:
-            content_lower = message.content.lower()
-            for bad_word in self.config.BAD_WORDS:
-                if bad_word.lower() in content_lower:
-                    await message.delete()
-                    await message.channel.send(f"{message.author.mention} Inappropriate language detected!", delete_after=5)
-                    break
+        member = guild.get_member(actor_id)
+        if member is None:
+            try:
+                member = await guild.fetch_member(actor_id)
+            except discord.HTTPException:
+                member = None
+        
+        if member is not None and any(role.id in self.config.ANTI_NUKE_TRUSTED_ROLE_IDS for role in member.roles):
+            logger.info(f"Not containing {member} in {guild.name}: they have a trusted role")
+            return
+        
+        if member is None:
+            outcome = "Not in the server any more"
+        else:
+            # Managed roles and roles at or above the bot's can't be taken away
+            keep = [role for role in member.roles if role.is_default() or role.managed or role >= guild.me.top_role]
+            removed = len(member.roles) - len(keep)
+            try:
+                if removed:
+                    await member.edit(roles=keep, reason=reason)
+                outcome = f"Removed {removed} roles"
+                # A bot's permissions come from its managed role, so it has to go instead
+                if member.bot and any(role.managed for role in keep):
+                    await member.kick(reason=reason)
+                    outcome += " and kicked the bot"
+                elif any(not role.is_default() and not role.managed for role in keep):
+                    outcome += "; some of their roles are above mine"
+            except discord.HTTPException as e:
+                outcome = f"Could not remove their roles: {e}"
+        
+        embed = discord.Embed(
+            title="🚨 Anti-Nuke Triggered",
+            description=f"<@{actor_id}> made {limit} or more {action.replace('_', ' ')}s within {window}s.",
+            color=0xff0000
+        )
+        embed.add_field(name="Action Taken", value=outcome, inline=False)
+        embed.add_field(name="User ID", value=actor_id, inline=True)
+        embed.set_footer(text="Check the audit log and restore anything that was removed")
+        embed.timestamp = datetime.utcnow()
+        
+        # Without a mod log channel, tell the owner directly
+        channel = self.mod_log_channel(guild.id)
+        try:
+            if channel:
+                await channel.send(embed=embed)
+            elif guild.owner:
+                await guild.owner.send(embed=embed)
+        except discord.HTTPException as e:
+            logger.warning(f"Could not send the anti-nuke alert for {guild.name}: {e}")
+    
+    @commands.command(name='snipe')
+    @commands.has_permissions(manage_messages=True)
+    async def snipe(self, ctx, number: int = 1):
+        """Show a recently deleted message in this channel (1 = the latest)"""
+        deleted = self.deleted_messages.recent(ctx.channel.id)
+        if not deleted:
+            await ctx.send("ℹ️ No deleted messages to snipe here.")
+            return
+        if number < 1 or number > len(deleted):
+            await ctx.send(f"❌ Choose a number between 1 and {len(deleted)}!")
+            return
+        
+        snapshot = deleted[number - 1]
+        embed = self.snapshot_embed(snapshot, "🔍 Sniped Message", ctx.channel.id, color=0x1e90ff)
+        embed.set_footer(text=f"Deleted message {number}/{len(deleted)} | Message ID: {snapshot.id}")
+        embed.timestamp = datetime.fromtimestamp(snapshot.created_at, tz=timezone.utc)
+        
+        await ctx.send(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(ModerationCog(bot))
@@ -1,13 +1,42 @@
 import discord
 from discord.ext import commands
 import asyncio
+import json
+import logging
+import os
+import re
+import time
 from datetime import datetime
+from typing import Optional
 from config import Config
+from core.backups import BackupStore, load_backup, snapshot_guild
+from core.storage import read_json
+from core.templates import apply_plan, load_template, plan_template
+from core.timedactions import format_duration, parse_duration
+
+logger = logging.getLogger('ServerMgmtCog')
 
 class ServerMgmtCog(commands.Cog):
+    # Staff commands, exempt from command rate limits
+    rate_limited = False
+    
     def __init__(self, bot):
         self.bot = bot
         self.config = Config
+        self.backups = BackupStore(Config.BACKUP_DIR, keep=Config.BACKUP_KEEP, full_every=Config.BACKUP_FULL_EVERY)
+        self.backup_locks = {}  # guild_id -> asyncio.Lock, one writer per backup file
+    
+    async def cog_load(self):
+        self.bot.timed_actions.register_handler('temprole', self.expire_temprole)
+        self.bot.timed_actions.register_handler('lock', self.expire_lock)
+        if self.config.BACKUP_INTERVAL_HOURS > 0:
+            self.bot.maintenance.register('guild-backups', self.backup_all_guilds,
+                                          interval=int(self.config.BACKUP_INTERVAL_HOURS * 3600), jitter=600, timeout=600)
+    
+    async def cog_unload(self):
+        self.bot.timed_actions.unregister_handler('temprole')
+        self.bot.timed_actions.unregister_handler('lock')
+        self.bot.maintenance.unregister('guild-backups')
         
     @commands.command(name='setup', aliases=['init'])
     @commands.has_permissions(administrator=True)
@@ -16,65 +45,251 @@ class ServerMgmtCog(commands.Cog):
         await ctx.send("🔧 Setting up server configuration...")
         
         try:
-            # Create basic roles
-            await self.create_basic_roles(ctx.guild)
-            
-            # Create basic channels
-            await self.create_basic_channels(ctx.guild)
-            
-            embed = discord.Embed(
-                title="✅ Server Setup Complete",
-                description="Basic server structure has been created!",
-                color=0x00ff00
-            )
-            embed.add_field(name="Created Roles", value="• Gamer\n• Newcomer\n• Verified", inline=True)
-            embed.add_field(name="Created Channels", value="• welcome\n• rules\n• general\n• gaming\n• memes", inline=True)
-            embed.timestamp = datetime.utcnow()
-            
+            plan = plan_template(ctx.guild, load_template(self.config.DEFAULT_TEMPLATE))
+            # Runs without confirmation, so it only adds what's missing and never edits existing things
+            skipped = plan.drop_updates()
+            start = time.perf_counter()
+            failed = await apply_plan(plan, concurrency=self.config.TEMPLATE_CONCURRENCY, reason="Basic server setup")
+            embed = self.template_result_embed(plan, failed, time.perf_counter() - start, "Server Setup")
+            if skipped:
+                embed.set_footer(text=f"{skipped} existing roles or channels differ from the template; "
+                                      f"{self.config.BOT_PREFIX}template apply default updates them")
             await ctx.send(embed=embed)
-            
         except Exception as e:
             await ctx.send(f"❌ Setup failed: {e}")
     
-    async def create_basic_roles(self, guild):
-        """Create basic server roles"""
-        role_names = [
-            (self.config.GAMING_ROLE_NAME, 0x00ff00),
-            (self.config.NEW_MEMBER_ROLE_NAME, 0xffa500),
-            (self.config.VERIFIED_ROLE_NAME, 0x1e90ff)
-        ]
+    async def load_named_template(self, ctx, name):
+        """The template attached to the command, or the named one; sends an error and returns None if it can't load"""
+        try:
+            attachment = next((a for a in ctx.message.attachments if a.filename.endswith('.json')), None)
+            if attachment:
+                data = json.loads(await attachment.read())
+            elif name == 'default':
+                data = self.config.DEFAULT_TEMPLATE
+            elif re.fullmatch(r'[\w-]+', name):
+                path = os.path.join(self.config.TEMPLATE_DIR, f"{name}.json")
+                data = await asyncio.to_thread(read_json, path, None)
+                if data is None and os.path.exists(path):
+                    raise ValueError(f"{name}.json is not valid JSON")
+            else:
+                data = None
+            if data is None:
+                await ctx.send(f"❌ No template named '{name}'! See `{self.config.BOT_PREFIX}template list`")
+                return None
+            return load_template(data)
+        except ValueError as e:  # Includes malformed JSON
+            await ctx.send(f"❌ Invalid template: {e}")
+            return None
+    
+    def template_plan_embed(self, plan, title):
+        embed = discord.Embed(
+            title=title,
+            description=f"{len(plan)} changes, {plan.unchanged} already match" if plan else
+                        "This server already matches.",
+            color=0x1e90ff
+        )
+        lines = [step.describe() for step in plan.steps[:25]]
+        if len(plan) > 25:
+            lines.append(f"... and {len(plan) - 25} more")
+        if lines:
+            embed.add_field(name="Changes", value="\n".join(lines)[:1024], inline=False)
+        embed.timestamp = datetime.utcnow()
+        return embed
+    
+    def template_result_embed(self, plan, failed, elapsed, title):
+        """What applying a plan actually did"""
+        created = [step.label for step in plan.steps if step.action == 'create' and step.error is None]
+        updated = [f"{step.label} ({', '.join(step.changes)})" for step in plan.steps
+                   if step.action != 'create' and step.error is None]
+        errors = [f"{step.describe()}: {step.error[:80]}" for step in plan.steps if step.error is not None]
+        
+        embed = discord.Embed(
+            title=f"✅ {title} Complete" if not failed else f"⚠️ {title} Finished With Errors",
+            description=f"{len(created)} created, {len(updated)} updated, {plan.unchanged} already existed, "
+                        f"{failed} failed in {elapsed:.1f}s",
+            color=0x00ff00 if not failed else 0xffa500
+        )
+        for name, lines in (("Created", created), ("Updated", updated), ("Failed", errors)):
+            if lines:
+                shown = lines[:15] + ([f"... and {len(lines) - 15} more"] if len(lines) > 15 else [])
+                embed.add_field(name=name, value="\n".join(f"• {line}" for line in shown)[:1024], inline=False)
+        embed.timestamp = datetime.utcnow()
+        return embed
+    
+    @commands.group(name='template', aliases=['tpl'], invoke_without_command=True)
+    @commands.has_permissions(administrator=True)
+    async def template_group(self, ctx):
+        """List the server templates"""
+        await ctx.invoke(self.template_list)
+    
+    @template_group.command(name='list')
+    @commands.has_permissions(administrator=True)
+    async def template_list(self, ctx):
+        """List the server templates"""
+        try:
+            files = sorted(name[:-5] for name in os.listdir(self.config.TEMPLATE_DIR) if name.endswith('.json'))
+        except FileNotFoundError:
+            files = []
+        embed = discord.Embed(
+            title="📋 Server Templates",
+            description="\n".join(f"• {name}" for name in ['default'] + files),
+            color=0x1e90ff
+        )
+        embed.set_footer(text=f"{self.config.BOT_PREFIX}template preview <name> • "
+                              f"{self.config.BOT_PREFIX}template apply <name> (or attach a .json template)")
+        await ctx.send(embed=embed)
+    
+    @template_group.command(name='preview', aliases=['diff'])
+    @commands.has_permissions(administrator=True)
+    async def template_preview(self, ctx, name: str = 'default'):
+        """Show what applying a template would change, without changing anything"""
+        template = await self.load_named_template(ctx, name)
+        if template:
+            await ctx.send(embed=self.template_plan_embed(plan_template(ctx.guild, template),
+                                                          f"📋 Template Preview: {name}"))
+    
+    @template_group.command(name='apply')
+    @commands.has_permissions(administrator=True)
+    async def template_apply(self, ctx, name: str = 'default'):
+        """Create and update roles and channels to match a template"""
+        template = await self.load_named_template(ctx, name)
+        if not template:
+            return
+        plan = plan_template(ctx.guild, template)
+        if not plan:
+            await ctx.send("✅ This server already matches the template.")
+            return
+        await self.confirm_and_apply(ctx, plan, f"📋 Template Preview: {name}", "Template",
+                                     reason=f"Template {name} applied by {ctx.author}")
+    
+    async def confirm_and_apply(self, ctx, plan, preview_title, title, reason):
+        """Show a plan, wait for the author's ✅ and apply it with progress updates; returns how many steps failed"""
+        message = await ctx.send(embed=self.template_plan_embed(plan, preview_title))
+        await message.add_reaction('✅')
+        await message.add_reaction('❌')
+        
+        def check(reaction, user):
+            return user == ctx.author and str(reaction.emoji) in ['✅', '❌']
+        
+        try:
+            with self.bot.sessions.open(message_id=message.id) as session:
+                reaction, user = await session.wait_for('reaction', timeout=30.0, check=check)
+        except asyncio.TimeoutError:
+            await ctx.send(f"⏰ {title} timed out!")
+            return None
+        if str(reaction.emoji) == '❌':
+            await ctx.send(f"❌ {title} cancelled!")
+            return None
+        
+        status = await ctx.send(f"⏳ Applying {len(plan)} changes...")
+        
+        async def on_progress(done):
+            await status.edit(content=f"⏳ Applying changes... {done}/{len(plan)}")
+        
+        start = time.perf_counter()
+        failed = await apply_plan(plan, concurrency=self.config.TEMPLATE_CONCURRENCY, reason=reason,
+                                  on_progress=on_progress)
+        elapsed = time.perf_counter() - start
+        await status.edit(content=None, embed=self.template_result_embed(plan, failed, elapsed, title))
+        logger.info(f"{reason} in {ctx.guild.name}: {len(plan) - failed} changes, {failed} failed in {elapsed:.1f}s")
+        return failed
+    
+    async def backup_guild(self, guild, author):
+        """Store a snapshot of a guild's structure; returns (version, changes) or (None, 0) if nothing changed"""
+        lock = self.backup_locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            return await asyncio.to_thread(self.backups.add, guild.id, snapshot_guild(guild), author)
+    
+    async def backup_all_guilds(self):
+        saved = 0
+        for guild in list(self.bot.guilds):
+            try:
+                version, _ = await self.backup_guild(guild, "automatic")
+            except OSError as e:
+                logger.error(f"Could not back up {guild.name}: {e}")
+                continue
+            saved += version is not None
+        if saved:
+            logger.info(f"Backed up {saved} changed guilds")
+    
+    @commands.group(name='backup', invoke_without_command=True)
+    @commands.has_permissions(administrator=True)
+    async def backup_group(self, ctx):
+        """Save a snapshot of this server's roles and channels"""
+        await ctx.invoke(self.backup_create)
+    
+    @backup_group.command(name='create', aliases=['save'])
+    @commands.has_permissions(administrator=True)
+    async def backup_create(self, ctx):
+        """Save a snapshot of this server's roles and channels"""
+        try:
+            version, changed = await self.backup_guild(ctx.guild, str(ctx.author))
+        except OSError as e:
+            await ctx.send(f"❌ Backup failed: {e}")
+            return
+        if version is None:
+            await ctx.send("✅ Nothing changed since the last backup.")
+            return
         
-        for role_name, color in role_names:
-            if not discord.utils.get(guild.roles, name=role_name):
-                await guild.create_role(
-                    name=role_name,
-                    color=discord.Color(color),
-                    reason="Basic server setup"
-                )
+        embed = discord.Embed(
+            title="🗄️ Backup Saved",
+            description=f"Version {version['version']}: " + (
+                f"full snapshot of {changed} roles and channels" if 'full' in version else f"{changed} changes"),
+            color=0x00ff00
+        )
+        embed.add_field(name="File Size", value=f"{self.backups.size(ctx.guild.id) / 1024:.1f} KB", inline=True)
+        embed.set_footer(text=f"{self.config.BOT_PREFIX}backup restore {version['version']} brings this back")
+        embed.timestamp = datetime.utcnow()
+        await ctx.send(embed=embed)
+        logger.info(f"{ctx.author} backed up {ctx.guild.name} (version {version['version']}, {changed} changes)")
     
-    async def create_basic_channels(self, guild):
-        """Create basic server channels"""
-        channels_to_create = [
-            ("welcome", discord.ChannelType.text, "Welcome new members!"),
-            ("rules", discord.ChannelType.text, "Server rules and guidelines"),
-            ("general", discord.ChannelType.text, "General discussion"),
-            ("gaming", discord.ChannelType.text, "Gaming discussions"),
-            ("memes", discord.ChannelType.text, "Share your best memes!"),
-            ("voice-general", discord.ChannelType.voice, "General voice chat"),
-            ("voice-gaming", discord.ChannelType.voice, "Gaming voice chat")
+    @backup_group.command(name='list')
+    @commands.has_permissions(administrator=True)
+    async def backup_list(self, ctx):
+        """List this server's backups"""
+        data = await asyncio.to_thread(self.backups.load, ctx.guild.id)
+        versions = data['versions']
+        embed = discord.Embed(
+            title="🗄️ Backups",
+            description=f"{len(versions)} versions, {self.backups.size(ctx.guild.id) / 1024:.1f} KB" if versions else
+                        f"No backups yet. Use `{self.config.BOT_PREFIX}backup` to make one.",
+            color=0x1e90ff
+        )
+        lines = [
+            f"`v{version['version']}` <t:{int(version['created_at'])}:R> by {version['author']}: "
+            f"{'full' if 'full' in version else str(version['changed']) + ' changes'}"
+            for version in reversed(versions[-15:])
         ]
+        if lines:
+            embed.add_field(name="Versions", value="\n".join(lines)[:1024], inline=False)
+        embed.timestamp = datetime.utcnow()
+        await ctx.send(embed=embed)
+    
+    @backup_group.command(name='restore')
+    @commands.has_permissions(administrator=True)
+    async def backup_restore(self, ctx, version: int = None):
+        """Recreate and repair roles and channels from a backup (default the latest)"""
+        data = await asyncio.to_thread(self.backups.load, ctx.guild.id)
+        try:
+            state = self.backups.state(data['versions'], version)
+        except (KeyError, ValueError):
+            await ctx.send(f"❌ No backup version {version}!" if version else "❌ This server has no backups!")
+            return
+        number = version or data['versions'][-1]['version']
         
-        for channel_name, channel_type, topic in channels_to_create:
-            existing_channel = discord.utils.get(guild.channels, name=channel_name)
-            if not existing_channel:
-                await guild.create_text_channel(
-                    name=channel_name,
-                    topic=topic,
-                    reason="Basic server setup"
-                ) if channel_type == discord.ChannelType.text else await guild.create_voice_channel(
-                    name=channel_name,
-                    reason="Basic server setup"
-                )
+        plan = plan_template(ctx.guild, load_backup(state))
+        if not plan:
+            await ctx.send(f"✅ This server already matches backup version {number}.")
+            return
+        failed = await self.confirm_and_apply(ctx, plan, f"🗄️ Restore Preview: version {number}", "Restore",
+                                              reason=f"Backup version {number} restored by {ctx.author}")
+        if failed is None:
+            return
+        # Recreated roles and channels have new IDs; the overwrites and categories above were mapped to them
+        remapped = sum(1 for step in plan.steps if step.action == 'create' and step.error is None)
+        if remapped:
+            await ctx.send(f"🔁 {remapped} deleted roles and channels were recreated with new IDs. "
+                           f"Run `{self.config.BOT_PREFIX}backup` to snapshot them.")
     
     @commands.command(name='setwelcome', aliases=['welcomeset'])
     @commands.has_permissions(manage_guild=True)
@@ -193,6 +408,9 @@ class ServerMgmtCog(commands.Cog):
         
         try:
             await member.remove_roles(role)
+            pending = self.bot.timed_actions.get('temprole', ctx.guild.id, member.id, role.id)
+            if pending:
+                await self.bot.timed_actions.cancel(pending)
             embed = discord.Embed(
                 title="✅ Role Removed",
                 description=f"Removed {role.mention} from {member.mention}",
@@ -202,6 +420,53 @@ class ServerMgmtCog(commands.Cog):
         except discord.Forbidden:
             await ctx.send("❌ I don't have permission to remove this role!")
     
+    @commands.command(name='temprole', aliases=['tr'])
+    @commands.has_permissions(manage_roles=True)
+    async def temp_role(self, ctx, member: discord.Member, duration: str, *, role_name: str):
+        """Give a member a role for a while (e.g. 1h, 7d)"""
+        try:
+            seconds = parse_duration(duration)
+        except ValueError:
+            await ctx.send("❌ Invalid duration format! Use: 30m, 12h, 7d, 1d12h, etc.")
+            return
+        
+        role = discord.utils.get(ctx.guild.roles, name=role_name)
+        if not role:
+            await ctx.send(f"❌ Role '{role_name}' not found!")
+            return
+        
+        if role >= ctx.author.top_role and ctx.author != ctx.guild.owner:
+            await ctx.send("❌ You can't assign a role higher than your own!")
+            return
+        
+        try:
+            await member.add_roles(role, reason=f"Temporary role for {format_duration(seconds)} by {ctx.author}")
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to add this role!")
+            return
+        action = await self.bot.timed_actions.schedule('temprole', ctx.guild.id, member.id, seconds, subject_id=role.id)
+        
+        embed = discord.Embed(
+            title="⏳ Temporary Role Added",
+            description=f"Added {role.mention} to {member.mention} for {format_duration(seconds)}",
+            color=0x00ff00
+        )
+        embed.add_field(name="Removed", value=f"<t:{int(action.expires_at)}:R>", inline=True)
+        await ctx.send(embed=embed)
+    
+    async def expire_temprole(self, guild, action):
+        role = guild.get_role(action.subject_id)
+        if role is None:
+            return  # Role was deleted
+        member = guild.get_member(action.target_id)
+        if member is None:
+            try:
+                member = await guild.fetch_member(action.target_id)
+            except discord.NotFound:
+                return  # Member left
+        await member.remove_roles(role, reason="Temporary role expired")
+        logger.info(f"Temporary role {role.name} of {member} in {guild.name} expired")
+    
     @commands.command(name='slowmode', aliases=['slow'])
     @commands.has_permissions(manage_channels=True)
     async def set_slowmode(self, ctx, seconds: int):
@@ -223,14 +488,28 @@ class ServerMgmtCog(commands.Cog):
     
     @commands.command(name='lock', aliases=['lockdown'])
     @commands.has_permissions(manage_channels=True)
-    async def lock_channel(self, ctx, channel: discord.TextChannel = None):
-        """Lock a channel"""
+    async def lock_channel(self, ctx, channel: Optional[discord.TextChannel] = None, duration: str = None):
+        """Lock a channel, optionally for a while (e.g. 30m, 2h)"""
         if channel is None:
             channel = ctx.channel
         
+        seconds = None
+        if duration:
+            try:
+                seconds = parse_duration(duration)
+            except ValueError:
+                await ctx.send("❌ Invalid duration format! Use: 30m, 12h, 7d, 1d12h, etc.")
+                return
+        
         try:
-            # Remove send permissions for @everyone
-            await channel.set_permissions(ctx.guild.default_role, send_messages=False)
+            # Remember the existing setting so a timed lock can put it back
+            overwrite = channel.overwrites_for(ctx.guild.default_role)
+            pending = self.bot.timed_actions.get('lock', ctx.guild.id, channel.id)
+            previous = pending.data['previous'] if pending else overwrite.send_messages
+            
+            # Remove send permissions for @everyone, keeping its other overwrites
+            overwrite.send_messages = False
+            await channel.set_permissions(ctx.guild.default_role, overwrite=overwrite)
             
             embed = discord.Embed(
                 title="🔒 Channel Locked",
@@ -238,6 +517,11 @@ class ServerMgmtCog(commands.Cog):
                 color=0xff0000
             )
             embed.add_field(name="Moderator", value=ctx.author.display_name, inline=False)
+            if seconds:
+                action = await self.bot.timed_actions.schedule('lock', ctx.guild.id, channel.id, seconds, previous=previous)
+                embed.add_field(name="Unlocks", value=f"<t:{int(action.expires_at)}:R>", inline=True)
+            elif pending:
+                await self.bot.timed_actions.cancel(pending)
             embed.timestamp = datetime.utcnow()
             
             await ctx.send(embed=embed)
@@ -253,8 +537,13 @@ class ServerMgmtCog(commands.Cog):
             channel = ctx.channel
         
         try:
-            # Restore send permissions for @everyone
-            await channel.set_permissions(ctx.guild.default_role, send_messages=None)
+            # Restore send permissions for @everyone, as they were before a timed lock
+            pending = self.bot.timed_actions.get('lock', ctx.guild.id, channel.id)
+            overwrite = channel.overwrites_for(ctx.guild.default_role)
+            overwrite.send_messages = pending.data['previous'] if pending else None
+            await channel.set_permissions(ctx.guild.default_role, overwrite=overwrite)
+            if pending:
+                await self.bot.timed_actions.cancel(pending)
             
             embed = discord.Embed(
                 title="🔓 Channel Unlocked",
@@ -269,6 +558,15 @@ class ServerMgmtCog(commands.Cog):
         except discord.Forbidden:
             await ctx.send("❌ I don't have permission to unlock this channel!")
     
+    async def expire_lock(self, guild, action):
+        channel = guild.get_channel(action.target_id)
+        if channel is None:
+            return  # Channel was deleted
+        overwrite = channel.overwrites_for(guild.default_role)
+        overwrite.send_messages = action.data['previous']
+        await channel.set_permissions(guild.default_role, overwrite=overwrite, reason="Timed lock expired")
+        logger.info(f"Timed lock of #{channel.name} in {guild.name} expired")
+    
     @commands.command(name='verify', aliases=['v'])
     async def verify_member(self, ctx, member: discord.Member = None):
         """Verify a member (adds verified role)"""
@@ -311,7 +609,7 @@ class ServerMgmtCog(commands.Cog):
             description=f"Are you sure you want to add {role.mention} to all members?",
             color=0xffa500
         )
-        embed.add_field(name="Members to affect", value=str(len(ctx.guild.members)), inline=False)
+        embed.add_field(name="Members to affect", value=str(ctx.guild.member_count), inline=False)
         
         message = await ctx.send(embed=embed)
         await message.add_reaction('✅')
@@ -321,7 +619,8 @@ class ServerMgmtCog(commands.Cog):
             return user == ctx.author and str(reaction.emoji) in ['✅', '❌']
         
         try:
-            reaction, user = await self.bot.wait_for('reaction_add', timeout=30.0, check=check)
+            with self.bot.sessions.open(message_id=message.id) as session:
+                reaction, user = await session.wait_for('reaction', timeout=30.0, check=check)
             
             if str(reaction.emoji) == '❌':
                 await ctx.send("❌ Mass role assignment cancelled!")
@@ -329,7 +628,8 @@ class ServerMgmtCog(commands.Cog):
             
             # Apply role to all members
             success_count = 0
-            for member in ctx.guild.members:
+            members = await self.bot.get_members(ctx.guild)
+            for member in members:
                 try:
                     await member.add_roles(role)
                     success_count += 1
@@ -0,0 +1,90 @@
+import discord
+from discord.ext import commands
+import logging
+from datetime import datetime
+from config import Config
+from core.analytics import CommandUsageRecorder
+from core.storage import data_path
+
+logger = logging.getLogger('StatsCog')
+
+STATS_RANGES = {
+    'day': 86400,
+    'week': 86400 * 7,
+    'month': 86400 * 30
+}
+
+class StatsCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = Config
+        self.usage = CommandUsageRecorder(data_path('command_usage.bin'))
+
+    async def cog_load(self):
+        self.bot.maintenance.register('usage-compact', self.compact_usage,
+                                      interval=86400, jitter=3600, timeout=300)
+        self.register_jobs()
+
+    def register_jobs(self):
+        self.bot.maintenance.register('usage-flush', self.usage.flush,
+                                      interval=self.config.STATS_FLUSH_SECONDS, jitter=5, timeout=30)
+        self.bot.register_flush_hook('usage', self.usage.flush)
+
+    async def cog_unload(self):
+        self.bot.maintenance.unregister('usage-flush')
+        self.bot.maintenance.unregister('usage-compact')
+        self.bot.unregister_flush_hook('usage')
+
+    def snapshot_state(self):
+        return {'usage': self.usage}
+
+    def restore_state(self, state):
+        self.usage = state['usage']
+        self.register_jobs()
+
+    async def compact_usage(self):
+        await self.usage.flush()
+        await self.usage.compact(self.config.STATS_RETENTION_DAYS)
+
+    @commands.Cog.listener()
+    async def on_command(self, ctx):
+        """Record every command invocation"""
+        self.usage.record(ctx.guild.id if ctx.guild else None, ctx.command.qualified_name)
+
+    @commands.group(name='stats', invoke_without_command=True)
+    async def stats(self, ctx):
+        """Bot usage statistics"""
+        await ctx.send(f"Usage: `{self.config.BOT_PREFIX}stats commands [day|week|month]`")
+
+    @stats.command(name='commands', aliases=['cmds'])
+    async def stats_commands(self, ctx, period: str = 'day'):
+        """Show the most used commands in this server"""
+        period = period.lower()
+        if period not in STATS_RANGES:
+            await ctx.send("❌ Period must be: day, week, or month!")
+            return
+
+        guild_id = ctx.guild.id if ctx.guild else 0
+        totals = await self.usage.query(guild_id, STATS_RANGES[period])
+
+        embed = discord.Embed(
+            title="📈 Command Usage",
+            description=f"Most used commands in the last **{period}**",
+            color=0x1e90ff
+        )
+
+        if totals:
+            top = totals.most_common(15)
+            width = len(str(top[0][1]))
+            lines = [f"`{count:>{width}}` {self.config.BOT_PREFIX}{name}" for name, count in top]
+            embed.add_field(name="Top Commands", value="\n".join(lines), inline=False)
+            embed.add_field(name="Total Invocations", value=str(sum(totals.values())), inline=True)
+            embed.add_field(name="Distinct Commands", value=str(len(totals)), inline=True)
+        else:
+            embed.add_field(name="No Data", value="No commands have been used in this period.", inline=False)
+
+        embed.timestamp = datetime.utcnow()
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(StatsCog(bot))
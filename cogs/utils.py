@@ -3,14 +3,133 @@ from discord.ext import commands
 import asyncio
 import json
 import requests
+import logging
 from datetime import datetime, timedelta
 from config import Config
+from core.embeds import EmbedTemplate
+from core.storage import data_path, read_json, write_json_atomic
+
+logger = logging.getLogger('UtilsCog')
+
+POLL_OPTION_EMOJIS = ('1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟')
+
+def build_invite_embed(guild):
+    embed = discord.Embed(
+        title="🔗 Bot Invite",
+        description="Use this link to invite me to your server!",
+        color=0x00ff00
+    )
+    
+    # Get client ID from config
+    client_id = Config.DISCORD_CLIENT_ID
+    if client_id:
+        invite_url = f"https://discord.com/api/oauth2/authorize?client_id={client_id}&permissions=8&scope=bot%20applications.commands"
+        embed.add_field(name="Bot Invite Link", value=f"[Click here]({invite_url})", inline=False)
+    else:
+        embed.add_field(name="⚠️ Note", value="Client ID not configured. Please set DISCORD_CLIENT_ID in .env", inline=False)
+    return embed
+
+def build_support_embed(guild):
+    embed = discord.Embed(
+        title="🆘 Support",
+        description="Need help with the bot? Here's how to get support!",
+        color=0xffa500
+    )
+    embed.add_field(name="Commands Help", value=f"Use `{Config.BOT_PREFIX}help` for all commands", inline=False)
+    embed.add_field(name="Report Issues", value="Contact server administrators", inline=False)
+    embed.add_field(name="Feature Requests", value="Suggest new features to moderators", inline=False)
+    return embed
+
+INVITE_TEMPLATE = EmbedTemplate(build_invite_embed)
+SUPPORT_TEMPLATE = EmbedTemplate(build_support_embed)
 
 class UtilsCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config = Config
-        self.reminders = {}  # Simple in-memory storage for reminders
+        self.reminders = {}  # User ID -> pending reminder
+        self.reminder_tasks = {}
+        self.reminders_lock = asyncio.Lock()  # keeps an older save from landing after a newer one
+    
+    async def cog_load(self):
+        """Restore saved reminders and register the flush hook"""
+        saved = read_json(data_path('reminders.json'), {})
+        for user_id, reminder in saved.items():
+            self.reminders[int(user_id)] = {
+                'message': reminder['message'],
+                'time': datetime.fromisoformat(reminder['time']),
+                'channel': reminder['channel']
+            }
+            self.schedule_reminder(int(user_id))
+        if saved:
+            logger.info(f"Restored {len(saved)} reminders")
+        
+        self.bot.register_flush_hook('reminders', self.flush_reminders)
+    
+    async def cog_unload(self):
+        self.bot.unregister_flush_hook('reminders')
+        for task in self.reminder_tasks.values():
+            task.cancel()
+    
+    def snapshot_state(self):
+        """State handed to the new instance on hot reload"""
+        return {'reminders': dict(self.reminders)}
+    
+    def restore_state(self, state):
+        """Take over reminders from the previous instance"""
+        for task in self.reminder_tasks.values():
+            task.cancel()
+        self.reminder_tasks = {}
+        self.reminders = state['reminders']
+        for user_id in self.reminders:
+            self.schedule_reminder(user_id)
+    
+    async def flush_reminders(self):
+        """Save pending reminders to disk"""
+        async with self.reminders_lock:
+            data = {
+                str(user_id): {
+                    'message': reminder['message'],
+                    'time': reminder['time'].isoformat(),
+                    'channel': reminder['channel']
+                }
+                for user_id, reminder in self.reminders.items()
+            }
+            await asyncio.to_thread(write_json_atomic, data_path('reminders.json'), data)
+    
+    def schedule_reminder(self, user_id):
+        """Start (or restart) the delivery task for a user's reminder"""
+        previous = self.reminder_tasks.pop(user_id, None)
+        if previous:
+            previous.cancel()
+        self.reminder_tasks[user_id] = asyncio.create_task(self.deliver_reminder(user_id))
+    
+    async def deliver_reminder(self, user_id):
+        """Wait until a reminder is due and send it"""
+        reminder = self.reminders[user_id]
+        delay = (reminder['time'] - datetime.utcnow()).total_seconds()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        channel = self.bot.get_channel(reminder['channel'])
+        if channel:
+            embed = discord.Embed(
+                title="⏰ Reminder!",
+                description=f"Hey <@{user_id}>!",
+                color=0xffa500
+            )
+            embed.add_field(name="You asked me to remind you:", value=reminder['message'], inline=False)
+            embed.timestamp = datetime.utcnow()
+            
+            try:
+                await channel.send(embed=embed)
+            except discord.HTTPException as e:
+                logger.warning(f"Failed to deliver reminder to {user_id}: {e}")
+        
+        # Remove from memory and disk, so a crash doesn't send it again
+        self.reminders.pop(user_id, None)
+        self.reminder_tasks.pop(user_id, None)
+        await self.flush_reminders()
         
     @commands.command(name='serverinfo', aliases=['si', 'guildinfo'])
     async def server_info(self, ctx):
@@ -25,18 +144,21 @@ class UtilsCog(commands.Cog):
         embed.set_thumbnail(url=guild.icon.url if guild.icon else None)
         
         # Basic info
-        embed.add_field(name="Owner", value=guild.owner.mention, inline=True)
+        embed.add_field(name="Owner", value=f"<@{guild.owner_id}>", inline=True)
         embed.add_field(name="Created", value=guild.created_at.strftime("%B %d, %Y"), inline=True)
         embed.add_field(name="Region", value=str(guild.preferred_locale), inline=True)
         
         # Member stats
         total_members = guild.member_count
-        bots = len([m for m in guild.members if m.bot])
+        members = await self.bot.get_members(guild)
+        bots = len([m for m in members if m.bot])
         humans = total_members - bots
         
         embed.add_field(name="👥 Total Members", value=str(total_members), inline=True)
         embed.add_field(name="🤖 Bots", value=str(bots), inline=True)
         embed.add_field(name="👤 Humans", value=str(humans), inline=True)
+        if self.config.PRESENCE_INTENT:
+            embed.add_field(name="🟢 Online", value=str(self.bot.presence.count(guild.id)), inline=True)
         
         # Channel stats
         text_channels = len(guild.text_channels)
@@ -130,11 +252,9 @@ class UtilsCog(commands.Cog):
         )
         
         # Add options
-        option_emojis = ['1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟']
-        
         options_text = ""
         for i, option in enumerate(options):
-            options_text += f"{option_emojis[i]} {option}\n"
+            options_text += f"{POLL_OPTION_EMOJIS[i]} {option}\n"
         
         embed.add_field(name="Options", value=options_text, inline=False)
         embed.add_field(name="React with", value="Choose your option above!", inline=False)
@@ -146,7 +266,7 @@ class UtilsCog(commands.Cog):
         
         # Add reactions
         for i in range(len(options)):
-            await message.add_reaction(option_emojis[i])
+            await message.add_reaction(POLL_OPTION_EMOJIS[i])
         
         # Delete command message
         await ctx.message.delete()
@@ -176,13 +296,15 @@ class UtilsCog(commands.Cog):
                 await ctx.send("❌ Maximum reminder time is 7 days!")
                 return
             
-            # Store reminder (simplified - in production use a database)
+            # Store reminder; it is saved to disk now and rescheduled on startup
             reminder_time = datetime.utcnow() + timedelta(seconds=duration_seconds)
             self.reminders[ctx.author.id] = {
                 'message': message,
                 'time': reminder_time,
                 'channel': ctx.channel.id
             }
+            self.schedule_reminder(ctx.author.id)
+            await self.flush_reminders()
             
             embed = discord.Embed(
                 title="⏰ Reminder Set",
@@ -193,26 +315,6 @@ class UtilsCog(commands.Cog):
             embed.timestamp = datetime.utcnow()
             
             await ctx.send(embed=embed)
-            
-            # Schedule reminder (simplified)
-            await asyncio.sleep(duration_seconds)
-            
-            # Check if reminder still exists
-            if ctx.author.id in self.reminders:
-                channel = self.bot.get_channel(self.reminders[ctx.author.id]['channel'])
-                if channel:
-                    embed = discord.Embed(
-                        title="⏰ Reminder!",
-                        description=f"Hey {ctx.author.mention}!",
-                        color=0xffa500
-                    )
-                    embed.add_field(name="You asked me to remind you:", value=message, inline=False)
-                    embed.timestamp = datetime.utcnow()
-                    
-                    await channel.send(embed=embed)
-                
-                # Remove from memory
-                del self.reminders[ctx.author.id]
         
         except ValueError:
             await ctx.send("❌ Invalid time format! Use: 30s, 5m, 1h, 2d")
@@ -309,37 +411,12 @@ class UtilsCog(commands.Cog):
     @commands.command(name='invite', aliases=['botinvite'])
     async def invite_me(self, ctx):
         """Get bot invite link"""
-        embed = discord.Embed(
-            title="🔗 Bot Invite",
-            description="Use this link to invite me to your server!",
-            color=0x00ff00
-        )
-        
-        # Get client ID from config
-        client_id = self.config.DISCORD_CLIENT_ID
-        if client_id:
-            invite_url = f"https://discord.com/api/oauth2/authorize?client_id={client_id}&permissions=8&scope=bot%20applications.commands"
-            embed.add_field(name="Bot Invite Link", value=f"[Click here]({invite_url})", inline=False)
-        else:
-            embed.add_field(name="⚠️ Note", value="Client ID not configured. Please set DISCORD_CLIENT_ID in .env", inline=False)
-        
-        embed.timestamp = datetime.utcnow()
-        await ctx.send(embed=embed)
+        await ctx.send(embed=INVITE_TEMPLATE.render(ctx.guild))
     
     @commands.command(name='support', aliases=['helpme'])
     async def support(self, ctx):
         """Get support information"""
-        embed = discord.Embed(
-            title="🆘 Support",
-            description="Need help with the bot? Here's how to get support!",
-            color=0xffa500
-        )
-        embed.add_field(name="Commands Help", value=f"Use `{self.config.BOT_PREFIX}help` for all commands", inline=False)
-        embed.add_field(name="Report Issues", value="Contact server administrators", inline=False)
-        embed.add_field(name="Feature Requests", value="Suggest new features to moderators", inline=False)
-        embed.timestamp = datetime.utcnow()
-        
-        await ctx.send(embed=embed)
+        await ctx.send(embed=SUPPORT_TEMPLATE.render(ctx.guild))
 
 async def setup(bot):
     await bot.add_cog(UtilsCog(bot))
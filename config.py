@@ -22,6 +22,14 @@ class Config:
     # Logging
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
     
+    # Member Cache Settings
+    # MEMBER_CACHE: all, joined, voice or none
+    # MEMBER_CHUNKING: startup, lazy (chunk on first use) or never (fetch on demand)
+    MEMBER_CACHE: str = os.getenv('MEMBER_CACHE', 'all').lower()
+    MEMBER_CHUNKING: str = os.getenv('MEMBER_CHUNKING', 'startup').lower()
+    # Presence intent must also be enabled in the Discord Developer Portal
+    PRESENCE_INTENT: bool = os.getenv('PRESENCE_INTENT', 'false').lower() == 'true'
+    
     # Gaming Configuration
     GAMING_ROLE_NAME: str = os.getenv('GAMING_ROLE_NAME', 'Gamer')
     NEW_MEMBER_ROLE_NAME: str = os.getenv('NEW_MEMBER_ROLE_NAME', 'Newcomer')
@@ -32,10 +40,101 @@ class Config:
     SPAM_PROTECTION: bool = os.getenv('SPAM_PROTECTION', 'true').lower() == 'true'
     BAD_WORDS_FILTER: bool = os.getenv('BAD_WORDS_FILTER', 'true').lower() == 'true'
     
+    # Overdue tempbans, temporary roles and timed locks are undone at most this many per second
+    TIMED_ACTIONS_PER_SECOND: float = float(os.getenv('TIMED_ACTIONS_PER_SECOND', '2'))
+    
+    # Ban lists are cached per server and dropped after this long unused
+    BAN_CACHE_IDLE_SECONDS: int = int(os.getenv('BAN_CACHE_IDLE_SECONDS', '3600'))
+    # Pace of !bans unban; Discord's rate limit headers are respected on top of this
+    BULK_UNBAN_PER_SECOND: float = float(os.getenv('BULK_UNBAN_PER_SECOND', '2'))
+    # !massban/!masskick: most IDs per command, and single bans or kicks in flight at once
+    MASS_ACTION_LIMIT: int = int(os.getenv('MASS_ACTION_LIMIT', '5000'))
+    MASS_ACTION_CONCURRENCY: int = int(os.getenv('MASS_ACTION_CONCURRENCY', '4'))
+    
+    # Anti-nuke: an account (other than the owner and trusted IDs or roles) that passes one of these
+    # limits within the window loses its roles. Off by default, since staff banning raiders by hand
+    # trip it too; list their roles in ANTI_NUKE_TRUSTED_ROLE_IDS. Format: action:count,action:count
+    ANTI_NUKE: bool = os.getenv('ANTI_NUKE', 'false').lower() == 'true'
+    ANTI_NUKE_WINDOW_SECONDS: int = int(os.getenv('ANTI_NUKE_WINDOW_SECONDS', '60'))
+    ANTI_NUKE_THRESHOLDS = {
+        action.strip(): int(count)
+        for action, count in (
+            item.split(':', 1) for item in os.getenv(
+                'ANTI_NUKE_THRESHOLDS', 'channel_delete:4,role_delete:4,ban:10,kick:10,webhook_create:4'
+            ).split(',') if ':' in item
+        )
+    }
+    # Format: id,id
+    ANTI_NUKE_TRUSTED_IDS = {int(item) for item in os.getenv('ANTI_NUKE_TRUSTED_IDS', '').split(',') if item.strip()}
+    ANTI_NUKE_TRUSTED_ROLE_IDS = {
+        int(item) for item in os.getenv('ANTI_NUKE_TRUSTED_ROLE_IDS', '').split(',') if item.strip()
+    }
+    
+    # Channel for deleted-message and moderation logs
+    MOD_LOG_CHANNEL_ID: Optional[int] = int(os.getenv('MOD_LOG_CHANNEL_ID', '0')) if os.getenv('MOD_LOG_CHANNEL_ID') else None
+    # Recent message snapshots for the mod log and !snipe, shared by all channels
+    SNAPSHOT_CACHE_MB: int = int(os.getenv('SNAPSHOT_CACHE_MB', '16'))
+    SNAPSHOTS_PER_CHANNEL: int = int(os.getenv('SNAPSHOTS_PER_CHANNEL', '100'))
+    SNIPE_DEPTH: int = int(os.getenv('SNIPE_DEPTH', '10'))
+    
     # Welcome/Goodbye Messages
     WELCOME_CHANNEL_ID: Optional[int] = int(os.getenv('WELCOME_CHANNEL_ID', '0')) if os.getenv('WELCOME_CHANNEL_ID') else None
     GOODBYE_CHANNEL_ID: Optional[int] = int(os.getenv('GOODBYE_CHANNEL_ID', '0')) if os.getenv('GOODBYE_CHANNEL_ID') else None
     
+    # Welcome card images (requires Pillow)
+    WELCOME_CARDS: bool = os.getenv('WELCOME_CARDS', 'true').lower() == 'true'
+    WELCOME_CARD_WORKERS: int = int(os.getenv('WELCOME_CARD_WORKERS', '2'))
+    # Joins beyond this many renders in flight get the text welcome
+    WELCOME_CARD_MAX_PENDING: int = int(os.getenv('WELCOME_CARD_MAX_PENDING', '4'))
+    WELCOME_CARD_TIMEOUT: float = float(os.getenv('WELCOME_CARD_TIMEOUT', '5'))
+    WELCOME_CARD_FONT: str = os.getenv('WELCOME_CARD_FONT', 'DejaVuSans-Bold.ttf')
+    WELCOME_CARD_BACKGROUND: Optional[str] = os.getenv('WELCOME_CARD_BACKGROUND')
+    WELCOME_AVATAR_CACHE_SIZE: int = int(os.getenv('WELCOME_AVATAR_CACHE_SIZE', '256'))
+    
+    # Persistent state
+    DATA_DIR: str = os.getenv('DATA_DIR', 'data')
+    SHUTDOWN_TIMEOUT: float = float(os.getenv('SHUTDOWN_TIMEOUT', '10'))
+    
+    # Maintenance scheduler check interval
+    MAINTENANCE_TICK_SECONDS: int = int(os.getenv('MAINTENANCE_TICK_SECONDS', '15'))
+    
+    # Command usage statistics
+    STATS_FLUSH_SECONDS: int = int(os.getenv('STATS_FLUSH_SECONDS', '60'))
+    STATS_RETENTION_DAYS: int = int(os.getenv('STATS_RETENTION_DAYS', '30'))
+    
+    # Virtual currency
+    STARTING_BALANCE: int = int(os.getenv('STARTING_BALANCE', '1000'))
+    DAILY_REWARD: int = int(os.getenv('DAILY_REWARD', '500'))
+    LEDGER_LOG_FLUSH_SECONDS: int = int(os.getenv('LEDGER_LOG_FLUSH_SECONDS', '2'))
+    LEDGER_CHECKPOINT_SECONDS: int = int(os.getenv('LEDGER_CHECKPOINT_SECONDS', '60'))
+    
+    # Activity XP and levels
+    XP_COOLDOWN_SECONDS: int = int(os.getenv('XP_COOLDOWN_SECONDS', '60'))
+    XP_FLUSH_SECONDS: int = int(os.getenv('XP_FLUSH_SECONDS', '30'))
+    LEVEL_REWARD_INTERVAL: float = float(os.getenv('LEVEL_REWARD_INTERVAL', '1'))
+    # Format: level:Role Name,level:Role Name
+    LEVEL_ROLE_REWARDS = {
+        int(level): role.strip()
+        for level, role in (
+            item.split(':', 1) for item in os.getenv('LEVEL_ROLE_REWARDS', '').split(',') if ':' in item
+        )
+    }
+    
+    # Command rate limits: token buckets of capacity/seconds per user, channel and guild
+    RATE_LIMIT_USER = tuple(float(part) for part in os.getenv('RATE_LIMIT_USER', '6/30').split('/'))
+    RATE_LIMIT_CHANNEL = tuple(float(part) for part in os.getenv('RATE_LIMIT_CHANNEL', '15/30').split('/'))
+    RATE_LIMIT_GUILD = tuple(float(part) for part in os.getenv('RATE_LIMIT_GUILD', '60/60').split('/'))
+    RATE_LIMIT_MAX_BUCKETS: int = int(os.getenv('RATE_LIMIT_MAX_BUCKETS', '50000'))
+    # Tokens each command costs (default 1). Format: command:cost,command:cost
+    COMMAND_COSTS = {
+        name.strip(): float(cost)
+        for name, cost in (
+            item.split(':', 1) for item in os.getenv(
+                'COMMAND_COSTS', 'slots:2,dicegame:2,trivia:2,triviaparty:4,poll:2,weather:3,steam:3'
+            ).split(',') if ':' in item
+        )
+    }
+    
     # Bad words list for moderation
     BAD_WORDS = [
         # Add your server's specific bad words list here
@@ -43,23 +142,82 @@ class Config:
         'badword1', 'badword2', 'badword3', 'fuck', 'bitch', 'hore', 'swine'
     ]
     
+    # Rule engine threads (and regex worker processes) and time limit for expensive rules
+    AUTOMOD_WORKERS: int = int(os.getenv('AUTOMOD_WORKERS', '2'))
+    AUTOMOD_RULE_TIMEOUT: float = float(os.getenv('AUTOMOD_RULE_TIMEOUT', '0.5'))
+    # Cached verdicts, keyed by server and message content
+    AUTOMOD_CACHE_SIZE: int = int(os.getenv('AUTOMOD_CACHE_SIZE', '8192'))
+    
+    # Link scanning against a domain blocklist file (one domain per line, reloaded when it changes)
+    LINK_SCANNING: bool = os.getenv('LINK_SCANNING', 'true').lower() == 'true'
+    LINK_BLOCKLIST_PATH: str = os.getenv('LINK_BLOCKLIST_PATH', os.path.join(DATA_DIR, 'blocked_domains.txt'))
+    LINK_BLOCKLIST_RELOAD_SECONDS: int = int(os.getenv('LINK_BLOCKLIST_RELOAD_SECONDS', '60'))
+    INVITE_CACHE_SIZE: int = int(os.getenv('INVITE_CACHE_SIZE', '4096'))
+    
+    # Attachment screening against per-server image blocklists (requires Pillow)
+    IMAGE_SCREENING: bool = os.getenv('IMAGE_SCREENING', 'true').lower() == 'true'
+    IMAGE_SCREEN_MAX_BYTES: int = int(os.getenv('IMAGE_SCREEN_MAX_BYTES', str(8 * 1024 * 1024)))
+    # Maximum differing bits (out of 64) for two images to count as the same
+    IMAGE_SCREEN_DISTANCE: int = int(os.getenv('IMAGE_SCREEN_DISTANCE', '6'))
+    IMAGE_SCREEN_WORKERS: int = int(os.getenv('IMAGE_SCREEN_WORKERS', '1'))
+    IMAGE_HASH_CACHE_SIZE: int = int(os.getenv('IMAGE_HASH_CACHE_SIZE', '4096'))
+    
     # Spam detection settings
     MAX_MESSAGES_PER_MINUTE: int = 10
     MAX_MESSAGE_LENGTH: int = 1000
     
     # Gaming commands settings
     DICE_SIDES: int = 6
+    TRIVIA_BANK_PATH: str = os.getenv('TRIVIA_BANK_PATH', os.path.join(DATA_DIR, 'trivia.jsonl'))
     TRIVIA_QUESTIONS = [
-        {"question": "What year was the first PlayStation released?", "answer": "1994"},
-        {"question": "What is the most popular game of 2023?", "answer": "baldurs gate 3"},
-        {"question": "Who created Minecraft?", "answer": "notch"},
-        {"question": "What does RPG stand for?", "answer": "role playing game"},
-        {"question": "What is the best selling game of all time?", "answer": "minecraft"},
+        {"question": "What year was the first PlayStation released?", "answer": "1994", "difficulty": "medium", "category": "history"},
+        {"question": "What is the most popular game of 2023?", "answer": "baldurs gate 3", "aliases": ["bg3"], "difficulty": "easy", "category": "games"},
+        {"question": "Who created Minecraft?", "answer": "notch", "aliases": ["markus persson"], "difficulty": "easy", "category": "people"},
+        {"question": "What does RPG stand for?", "answer": "role playing game", "difficulty": "easy", "category": "general"},
+        {"question": "What is the best selling game of all time?", "answer": "minecraft", "difficulty": "hard", "category": "games"},
     ]
     
+    # Server structure !setup creates; more templates can be added as JSON files in TEMPLATE_DIR
+    TEMPLATE_DIR: str = os.getenv('TEMPLATE_DIR', os.path.join(DATA_DIR, 'templates'))
+    # Roles or channels created or edited at once when a template is applied
+    TEMPLATE_CONCURRENCY: int = int(os.getenv('TEMPLATE_CONCURRENCY', '5'))
+    # Server structure backups (!backup): versions kept per server, a full snapshot every
+    # BACKUP_FULL_EVERY versions (diffs in between), and automatic backups (0 turns them off)
+    BACKUP_DIR: str = os.getenv('BACKUP_DIR', os.path.join(DATA_DIR, 'backups'))
+    BACKUP_KEEP: int = int(os.getenv('BACKUP_KEEP', '20'))
+    BACKUP_FULL_EVERY: int = int(os.getenv('BACKUP_FULL_EVERY', '10'))
+    BACKUP_INTERVAL_HOURS: float = float(os.getenv('BACKUP_INTERVAL_HOURS', '24'))
+    DEFAULT_TEMPLATE = {
+        "roles": [
+            {"name": GAMING_ROLE_NAME, "color": "#00ff00"},
+            {"name": NEW_MEMBER_ROLE_NAME, "color": "#ffa500"},
+            {"name": VERIFIED_ROLE_NAME, "color": "#1e90ff"},
+        ],
+        "channels": [
+            {"name": "welcome", "topic": "Welcome new members!"},
+            {"name": "rules", "topic": "Server rules and guidelines"},
+            {"name": "general", "topic": "General discussion"},
+            {"name": "gaming", "topic": "Gaming discussions"},
+            {"name": "memes", "topic": "Share your best memes!"},
+            {"name": "voice-general", "type": "voice"},
+            {"name": "voice-gaming", "type": "voice"},
+        ],
+    }
+    
     @classmethod
     def validate(cls):
         """Validate required configuration"""
         if not cls.DISCORD_TOKEN:
             raise ValueError("DISCORD_TOKEN is required in environment variables")
+        if cls.MEMBER_CACHE not in ('all', 'joined', 'voice', 'none'):
+            raise ValueError("MEMBER_CACHE must be one of: all, joined, voice, none")
+        if cls.MEMBER_CHUNKING not in ('startup', 'lazy', 'never'):
+            raise ValueError("MEMBER_CHUNKING must be one of: startup, lazy, never")
+        for name in ('RATE_LIMIT_USER', 'RATE_LIMIT_CHANNEL', 'RATE_LIMIT_GUILD'):
+            limit = getattr(cls, name)
+            if len(limit) != 2 or min(limit) <= 0:
+                raise ValueError(f"{name} must be in the form capacity/seconds, e.g. 6/30")
+        unknown = set(cls.ANTI_NUKE_THRESHOLDS) - {'channel_delete', 'role_delete', 'ban', 'kick', 'webhook_create'}
+        if unknown:
+            raise ValueError(f"Unknown ANTI_NUKE_THRESHOLDS actions: {', '.join(sorted(unknown))}")
         return True
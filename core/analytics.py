@@ -0,0 +1,175 @@
+import asyncio
+import bisect
+import logging
+import os
+import struct
+import time
+from collections import Counter, defaultdict
+from core.storage import read_json, write_json_atomic
+
+logger = logging.getLogger('Analytics')
+
+# One row per (guild, command, minute): guild ID, minute since epoch, count, command ID
+USAGE_RECORD = struct.Struct('<QIIH')
+DAY_MINUTES = 1440
+
+class CommandUsageRecorder:
+    """Counts command invocations per guild, command and minute
+
+    Recording is a single dict increment. Counters are flushed in batches to a
+    fixed-width binary file, with command names stored once in a sidecar file.
+    A second sidecar indexes the byte offset where each day starts, so a query
+    only reads the rows in its time range.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.names_path = f"{path}.commands.json"
+        self.index_path = f"{path}.index.json"
+        self._index = None  # loaded with the first flush or query
+        self.pending = defaultdict(int)
+        self.command_names = read_json(self.names_path, [])
+        self.command_ids = {name: index for index, name in enumerate(self.command_names)}
+        self._lock = asyncio.Lock()
+
+    def record(self, guild_id, command):
+        """Count one invocation in the current minute bucket"""
+        self.pending[(guild_id or 0, command, int(time.time()) // 60)] += 1
+
+    def _command_id(self, command):
+        command_id = self.command_ids.get(command)
+        if command_id is None:
+            command_id = len(self.command_names)
+            self.command_names.append(command)
+            self.command_ids[command] = command_id
+        return command_id
+
+    async def flush(self):
+        """Append pending counters to the usage file"""
+        if not self.pending:
+            return 0
+
+        async with self._lock:
+            batch, self.pending = self.pending, defaultdict(int)
+            known_commands = len(self.command_names)
+            rows = b''.join(
+                USAGE_RECORD.pack(guild_id, minute, count, self._command_id(command))
+                for (guild_id, command, minute), count in batch.items()
+            )
+            minutes = [minute for guild_id, command, minute in batch]
+            names = list(self.command_names) if len(self.command_names) != known_commands else None
+            await asyncio.to_thread(self._append, rows, minutes, names)
+
+        logger.debug(f"Flushed {len(batch)} usage counters")
+        return len(batch)
+
+    def _append(self, rows, minutes, names):
+        # Names first, so every command ID in the usage file can be resolved
+        if names is not None:
+            write_json_atomic(self.names_path, names)
+        index = self._load_index()
+        with open(self.path, 'ab') as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(rows)
+        self._index_rows(index, minutes, offset)
+        index['size'] = offset + len(rows)
+        write_json_atomic(self.index_path, index)
+
+    def _index_rows(self, index, minutes, offset):
+        """Extend the day index with rows (by minute, in file order) written at offset
+
+        A day's entry is the first row at which the latest minute seen so far
+        reaches that day, so every row before it is from an earlier day even
+        if a batch isn't sorted.
+        """
+        for minute in minutes:
+            if minute > index['max_minute']:
+                index['max_minute'] = minute
+                day = minute // DAY_MINUTES
+                if not index['days'] or index['days'][-1][0] < day:
+                    index['days'].append([day, offset])
+            offset += USAGE_RECORD.size
+
+    def _load_index(self):
+        """The day index, rebuilt from the usage file if it doesn't match it"""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        if self._index is not None and self._index['size'] == size:
+            return self._index
+
+        index = read_json(self.index_path)
+        if not index or index.get('size') != size:
+            index = {'size': size, 'max_minute': -1, 'days': []}
+            self._index_rows(index, [row[1] for row in self._read_rows()], 0)
+            write_json_atomic(self.index_path, index)
+            logger.info(f"Rebuilt usage index for {self.path}")
+        self._index = index
+        return index
+
+    def _read_rows(self, offset=0):
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        # Ignore a partially written trailing row
+        usable = len(data) - len(data) % USAGE_RECORD.size
+        return USAGE_RECORD.iter_unpack(memoryview(data)[:usable])
+
+    async def query(self, guild_id, since_seconds):
+        """Command counts for a guild (or all guilds if None) over a time range"""
+        since_minute = int(time.time() - since_seconds) // 60
+        names = self.command_names
+
+        def scan():
+            days = self._load_index()['days']
+            # Start at the latest day that began at or before the range
+            position = bisect.bisect_right(days, [since_minute // DAY_MINUTES, float('inf')])
+            offset = days[position - 1][1] if position else 0
+
+            totals = Counter()
+            for row_guild, minute, count, command_id in self._read_rows(offset):
+                if minute >= since_minute and (guild_id is None or row_guild == guild_id):
+                    totals[names[command_id]] += count
+            return totals
+
+        async with self._lock:
+            totals = await asyncio.to_thread(scan)
+        for (row_guild, command, minute), count in self.pending.items():
+            if minute >= since_minute and (guild_id is None or row_guild == guild_id):
+                totals[command] += count
+        return totals
+
+    async def compact(self, retention_days):
+        """Merge duplicate buckets and drop rows older than the retention period"""
+        cutoff = int(time.time() - retention_days * 86400) // 60
+
+        def rewrite():
+            merged = defaultdict(int)
+            for guild_id, minute, count, command_id in self._read_rows():
+                if minute >= cutoff:
+                    merged[(guild_id, minute, command_id)] += count
+
+            rows = sorted(merged.items(), key=lambda item: item[0][1])
+            self._index = None
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(b''.join(
+                    USAGE_RECORD.pack(guild_id, minute, count, command_id)
+                    for (guild_id, minute, command_id), count in rows
+                ))
+            os.replace(tmp_path, self.path)
+
+            index = {'size': len(rows) * USAGE_RECORD.size, 'max_minute': -1, 'days': []}
+            self._index_rows(index, [minute for (guild_id, minute, command_id), count in rows], 0)
+            write_json_atomic(self.index_path, index)
+            self._index = index
+            return len(rows)
+
+        async with self._lock:
+            rows = await asyncio.to_thread(rewrite)
+        logger.info(f"Compacted usage file to {rows} rows")
@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict, deque
+
+import discord
+
+# Audit log actions that can wreck a server when repeated quickly
+WATCHED_ACTIONS = {
+    discord.AuditLogAction.channel_delete: 'channel_delete',
+    discord.AuditLogAction.role_delete: 'role_delete',
+    discord.AuditLogAction.ban: 'ban',
+    discord.AuditLogAction.kick: 'kick',
+    discord.AuditLogAction.webhook_create: 'webhook_create',
+}
+
+class ActionTracker:
+    """Per-actor sliding-window counts of destructive actions
+
+    For each (guild, actor, action) only the times of the last
+    ``threshold`` actions are kept, in a deque of that length. The limit
+    is passed when the deque is full and its oldest time is inside the
+    window, so each update is O(1) and the count is exact. At most
+    ``max_keys`` keys are kept, least recently active first out.
+    """
+
+    def __init__(self, thresholds, window=60, max_keys=10000):
+        self.thresholds = thresholds  # action -> actions allowed per window
+        self.window = window
+        self.max_keys = max_keys
+        self.tripped = 0
+        self._recent = OrderedDict()  # (guild_id, actor_id, action) -> deque of monotonic times
+        self._flagged = OrderedDict()  # (guild_id, actor_id) -> when they were last flagged, oldest first
+
+    def __len__(self):
+        return len(self._recent)
+
+    def record(self, guild_id, actor_id, action, now=None):
+        """Count an action; returns True the first time an actor passes a limit within a window"""
+        threshold = self.thresholds.get(action)
+        if not threshold:
+            return False
+        now = time.monotonic() if now is None else now
+
+        key = (guild_id, actor_id, action)
+        times = self._recent.get(key)
+        if times is None:
+            times = self._recent[key] = deque(maxlen=threshold)
+            if len(self._recent) > self.max_keys:
+                self._recent.popitem(last=False)
+        else:
+            self._recent.move_to_end(key)
+        times.append(now)
+        if len(times) < threshold or now - times[0] > self.window:
+            return False
+
+        # Only act once per window; later actions are by an account already being dealt with
+        flagged = self._flagged.get((guild_id, actor_id))
+        if flagged is not None and now - flagged <= self.window:
+            return False
+        self._flagged[(guild_id, actor_id)] = now
+        self._flagged.move_to_end((guild_id, actor_id))
+        # Flag times only grow, so expired entries (and, past max_keys, the oldest) are at the front
+        while self._flagged:
+            oldest = next(iter(self._flagged.values()))
+            if now - oldest <= self.window and len(self._flagged) <= self.max_keys:
+                break
+            self._flagged.popitem(last=False)
+        self.tripped += 1
+        return True
+
+    def forget(self, guild_id):
+        """Drop a guild's counters (e.g. after leaving it)"""
+        for key in [key for key in self._recent if key[0] == guild_id]:
+            del self._recent[key]
+        for key in [key for key in self._flagged if key[0] == guild_id]:
+            del self._flagged[key]
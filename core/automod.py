@@ -0,0 +1,559 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from core.linkscan import extract_links
+from core.regexsandbox import RegexSandbox
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+logger = logging.getLogger('AutoMod')
+
+class Verdict:
+    __slots__ = ('rule', 'reason', 'message')
+
+    def __init__(self, rule, reason, message):
+        self.rule = rule
+        self.reason = reason
+        self.message = message
+
+class RuleStats:
+    __slots__ = ('evaluations', 'hits', 'timeouts', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        self.evaluations = 0
+        self.hits = 0
+        self.timeouts = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    @property
+    def mean_us(self):
+        return self.total_ns / self.evaluations / 1000 if self.evaluations else 0.0
+
+    def record(self, elapsed_ns, hit):
+        self.evaluations += 1
+        self.hits += hit
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+class Rule:
+    """One auto-moderation check, compiled from its options
+
+    ``check(message)`` returns a reason string when the message breaks the
+    rule. ``cost`` is an estimate in microseconds that orders the rules
+    until real timings are available. ``offloadable`` rules only read
+    ``message.content`` and may run in the engine's thread pool;
+    ``isolated`` ones block on another process and always run there.
+    ``asynchronous`` rules define ``check`` as a coroutine and run last,
+    on the event loop. ``context`` holds shared resources (blocklists,
+    resolvers) the engine was given.
+    """
+
+    name = None
+    cost = 1
+    offloadable = False
+    isolated = False
+    asynchronous = False
+    defaults = {}
+    message = "That message isn't allowed here!"
+
+    def __init__(self, options, context=None):
+        self.options = options
+        self.context = context or {}
+
+    def check(self, message):
+        raise NotImplementedError
+
+class LengthRule(Rule):
+    name = 'length'
+    defaults = {'max_length': 1000}
+    message = "Your message was too long!"
+
+    def __init__(self, options, context=None):
+        super().__init__(options, context)
+        self.max_length = int(options['max_length'])
+
+    def check(self, message):
+        if len(message.content) > self.max_length:
+            return f"{len(message.content)} characters"
+
+class MentionRule(Rule):
+    name = 'mentions'
+    defaults = {'max_mentions': 5}
+    message = "Too many mentions!"
+
+    def __init__(self, options, context=None):
+        super().__init__(options, context)
+        self.max_mentions = int(options['max_mentions'])
+
+    def check(self, message):
+        count = len(message.raw_mentions) + len(message.raw_role_mentions) + message.mention_everyone
+        if count > self.max_mentions:
+            return f"{count} mentions"
+
+class CapsRule(Rule):
+    name = 'caps'
+    cost = 3
+    defaults = {'ratio': 0.7, 'min_length': 10}
+    message = "Please don't shout!"
+
+    def __init__(self, options, context=None):
+        super().__init__(options, context)
+        self.ratio = float(options['ratio'])
+        self.min_length = int(options['min_length'])
+
+    def check(self, message):
+        content = message.content
+        # Most messages have no capitals at all, and islower() answers that in C
+        if len(content) < self.min_length or content.islower():
+            return None
+        letters = sum(map(str.isalpha, content))
+        if letters < self.min_length:
+            return None
+        upper = sum(map(str.isupper, content))
+        if upper / letters >= self.ratio:
+            return f"{upper / letters:.0%} capitals"
+
+class PatternRule(Rule):
+    """Base for rules that are a single precompiled regex"""
+
+    cost = 4
+
+    def __init__(self, options, context=None):
+        super().__init__(options, context)
+        self.pattern = self.compile(options)
+
+    def compile(self, options):
+        raise NotImplementedError
+
+    def check(self, message):
+        match = self.pattern.search(message.content)
+        if match:
+            return f"matched {match.group(0)[:50]!r}"
+
+class InviteRule(PatternRule):
+    name = 'invites'
+    message = "Invite links aren't allowed here!"
+
+    def compile(self, options):
+        return re.compile(r'(?:discord(?:app)?\.com/invite|discord\.gg|dsc\.gg)/[\w-]+', re.IGNORECASE)
+
+class RepeatedCharacterRule(PatternRule):
+    name = 'repeated'
+    defaults = {'max_run': 9}
+    message = "Please don't spam characters!"
+
+    def compile(self, options):
+        return re.compile(r'(.)\1{%d,}' % int(options['max_run']), re.DOTALL)
+
+class ZalgoRule(PatternRule):
+    name = 'zalgo'
+    defaults = {'max_marks': 2}
+    message = "Zalgo text isn't allowed here!"
+
+    def compile(self, options):
+        # Runs of combining diacritical marks stacked on one character
+        marks = r'\u0300-\u036f\u0483-\u0489\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f'
+        return re.compile(f'[{marks}]{{{int(options["max_marks"]) + 1},}}')
+
+class BadWordRule(PatternRule):
+    name = 'badwords'
+    cost = 5
+    defaults = {'words': []}
+    message = "Inappropriate language detected!"
+
+    def compile(self, options):
+        words = sorted({word.lower() for word in options['words'] if word}, key=len, reverse=True)
+        # One alternation scans the message once instead of once per word. Matching the
+        # lowercased text is several times faster than re.IGNORECASE.
+        return re.compile('|'.join(map(re.escape, words))) if words else None
+
+    def check(self, message):
+        if self.pattern and self.pattern.search(message.content.lower()):
+            return "bad word"
+
+MAX_PATTERN_LENGTH = 200
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+# Characters stood in for "anything" when comparing what two parts of a pattern can match
+_SAMPLE = frozenset(map(chr, range(0x250)))
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: str.isdigit,
+    sre_parse.CATEGORY_NOT_DIGIT: lambda char: not char.isdigit(),
+    sre_parse.CATEGORY_SPACE: str.isspace,
+    sre_parse.CATEGORY_NOT_SPACE: lambda char: not char.isspace(),
+    sre_parse.CATEGORY_WORD: lambda char: char.isalnum() or char == '_',
+    sre_parse.CATEGORY_NOT_WORD: lambda char: not (char.isalnum() or char == '_'),
+}
+
+def _literal(code):
+    char = chr(code)
+    return {char, char.lower(), char.upper()}
+
+def _chars(items):
+    """Roughly the set of characters a parsed pattern can consume (patterns are case-insensitive)"""
+    chars = set()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars |= _literal(av)
+        elif op is sre_parse.NOT_LITERAL:
+            chars |= _SAMPLE - _literal(av)
+        elif op is sre_parse.ANY or op is sre_parse.GROUPREF:
+            chars |= _SAMPLE
+        elif op is sre_parse.IN:
+            members = set()
+            for member_op, value in av:
+                if member_op is sre_parse.LITERAL:
+                    members |= _literal(value)
+                elif member_op is sre_parse.RANGE:
+                    low, high = value
+                    members |= {char for char in _SAMPLE if low <= ord(char.lower()) <= high
+                                or low <= ord(char.upper()) <= high}
+                elif member_op is sre_parse.CATEGORY:
+                    test = _CATEGORIES.get(value)
+                    members |= {char for char in _SAMPLE if test(char)} if test else _SAMPLE
+            chars |= _SAMPLE - members if av and av[0][0] is sre_parse.NEGATE else members
+        elif op in _REPEATS:
+            chars |= _chars(av[2])
+        elif op is sre_parse.SUBPATTERN:
+            chars |= _chars(av[-1])
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                chars |= _chars(branch)
+        elif op is sre_parse.GROUPREF_EXISTS:
+            chars |= _chars(av[1]) | (_chars(av[2]) if av[2] else set())
+        # Anchors and lookarounds consume nothing
+    return chars
+
+def _check_pattern(items, repeated=False):
+    """Raise ValueError for constructs that can backtrack exponentially or worse
+
+    Rejects a variable-length quantifier inside any repeat (``(a+)+``, ``(a{1,30}){1,30}``),
+    overlapping alternatives inside a quantifier (``(a|ab)*``), backreferences
+    inside a quantifier, and back-to-back unbounded quantifiers that can
+    match the same characters (``\\d+\\d+``, ``.*.*``).
+    """
+    previous = None  # characters of the last unbounded quantifier, while nothing required follows it
+    for op, av in items:
+        if op in _REPEATS:
+            low, high, body = av
+            variable = low != high
+            if repeated and variable:
+                raise ValueError("nested quantifiers like (a+)+ can hang the bot")
+            _check_pattern(body, repeated or high > 1)
+            if high == sre_parse.MAXREPEAT:
+                chars = _chars(body)
+                if previous is not None and previous & chars:
+                    raise ValueError("adjacent quantifiers like \\d+\\d+ can hang the bot")
+                previous = chars
+                continue
+            if low == 0:
+                continue
+        elif op is sre_parse.BRANCH:
+            branches = av[1]
+            if repeated:
+                seen = set()
+                for branch in branches:
+                    chars = _chars(branch)
+                    # An alternative that can match nothing overlaps every other one
+                    if seen & chars or branch.getwidth()[0] == 0:
+                        raise ValueError("overlapping alternatives inside a quantifier can hang the bot")
+                    seen |= chars
+            for branch in branches:
+                _check_pattern(branch, repeated)
+        elif op is sre_parse.SUBPATTERN:
+            _check_pattern(av[-1], repeated)
+        elif op is sre_parse.GROUPREF_EXISTS:
+            _check_pattern(av[1], repeated)
+            if av[2]:
+                _check_pattern(av[2], repeated)
+        elif op is sre_parse.GROUPREF and repeated:
+            raise ValueError("backreferences inside a quantifier can hang the bot")
+        elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue
+        previous = None
+
+def compile_safe(pattern):
+    """Compile a moderator-supplied pattern, refusing ones that are known to backtrack catastrophically
+
+    Only a first filter: plenty of slow patterns look innocent, so matches
+    still run in a ``RegexSandbox`` that kills them after a time limit.
+    """
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        raise ValueError(f"patterns are limited to {MAX_PATTERN_LENGTH} characters")
+    _check_pattern(sre_parse.parse(pattern, re.IGNORECASE))
+    return re.compile(pattern, re.IGNORECASE)
+
+class RegexRule(Rule):
+    """Moderator-supplied patterns, matched in the engine's regex sandbox"""
+
+    name = 'regex'
+    cost = 200
+    offloadable = True
+    isolated = True
+    defaults = {'patterns': []}
+    max_content = 4000
+
+    def __init__(self, options, context=None):
+        super().__init__(options, context)
+        self.patterns = [compile_safe(pattern).pattern for pattern in options['patterns']]
+        self.sandbox = self.context['regex']
+
+    def check(self, message):
+        if not self.patterns:
+            return None
+        index = self.sandbox.search(self.patterns, message.content[:self.max_content])
+        if index is not None:
+            return f"matched /{self.patterns[index]}/"
+
+class LinkRule(Rule):
+    """Links to blocklisted domains, and invites to other servers if enabled"""
+
+    name = 'links'
+    cost = 10
+    asynchronous = True
+    defaults = {'foreign_invites': False, 'allowed_servers': []}
+    message = "That link isn't allowed here!"
+
+    def __init__(self, options, context=None):
+        super().__init__(options, context)
+        self.domains = self.context.get('domains')
+        self.invites = self.context.get('invites')
+        self.foreign_invites = bool(options['foreign_invites'])
+        self.allowed_servers = {int(server_id) for server_id in options['allowed_servers']}
+
+    async def check(self, message):
+        hosts, codes = extract_links(message.content)
+        if self.domains is not None:
+            for host in hosts:
+                blocked = self.domains.match(host)
+                if blocked:
+                    return f"blocked domain {blocked}"
+
+        if self.foreign_invites and self.invites is not None:
+            for code in codes:
+                guild_id = await self.invites.resolve(code)
+                if guild_id is not None and guild_id != message.guild.id and guild_id not in self.allowed_servers:
+                    return f"invite {code} to another server"
+
+RULE_TYPES = {rule.name: rule for rule in (
+    LengthRule, MentionRule, CapsRule, InviteRule, RepeatedCharacterRule, ZalgoRule, BadWordRule, RegexRule,
+    LinkRule
+)}
+
+class Plan:
+    """A guild's enabled rules in evaluation order"""
+
+    __slots__ = ('cheap', 'expensive', 'asynchronous')
+
+    def __init__(self, cheap, expensive, asynchronous):
+        self.cheap = cheap
+        self.expensive = expensive
+        self.asynchronous = asynchronous
+
+    @property
+    def rules(self):
+        return self.cheap + self.expensive + self.asynchronous
+
+class AutoModEngine:
+    """Per-guild auto-moderation rules compiled into evaluation plans
+
+    Guild settings override ``defaults``, which override each rule type's
+    own defaults. A guild's plan is compiled once when its rules change:
+    rules run cheapest first and evaluation stops at the first verdict.
+    Offloadable rules costing more than ``offload_us`` (about what a thread
+    hand-off costs) run together in a thread pool, as do isolated ones;
+    regex rules match in worker processes that are killed after
+    ``expensive_timeout``. Asynchronous rules run
+    last since they may wait on the network.
+
+    Verdicts of the synchronous rules are cached per guild by a hash of the
+    normalized content, so repeated spam and edits that leave the text
+    unchanged skip those rules. Changing a guild's rules invalidates its
+    cached verdicts.
+    """
+
+    def __init__(self, defaults=None, workers=2, expensive_timeout=0.5, offload_us=100, context=None,
+                 cache_size=8192):
+        self.defaults = defaults or {}  # rule name -> options, including 'enabled'
+        self.context = context or {}  # shared resources handed to every rule
+        self.settings = {}  # guild_id -> {rule name: option overrides}
+        self.stats = {}  # (guild_id, rule name) -> RuleStats
+        self.expensive_timeout = expensive_timeout
+        self.offload_us = offload_us
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._plans = {}
+        self._generations = {}  # guild_id -> settings version, part of every cache key
+        self._verdicts = OrderedDict()  # (guild_id, generation, content hash) -> Verdict or None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='automod')
+        # One sandbox process per pool thread, so a search never waits for a free process
+        self.sandbox = RegexSandbox(workers=workers, timeout=expensive_timeout)
+        self.context.setdefault('regex', self.sandbox)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.sandbox.close()
+
+    def load(self, data):
+        self.settings = {int(guild_id): rules for guild_id, rules in data.items()}
+        self._plans = {}
+        self._verdicts.clear()
+
+    def to_dict(self):
+        return {str(guild_id): rules for guild_id, rules in self.settings.items() if rules}
+
+    def options(self, guild_id, name):
+        return {
+            'enabled': False,
+            **RULE_TYPES[name].defaults,
+            **self.defaults.get(name, {}),
+            **self.settings.get(guild_id, {}).get(name, {}),
+        }
+
+    def configure(self, guild_id, name, **options):
+        """Change a rule's options for a guild; raises ValueError if they don't compile"""
+        merged = {**self.options(guild_id, name), **options}
+        try:
+            RULE_TYPES[name](merged, self.context)
+        except (re.error, TypeError, ValueError) as e:
+            raise ValueError(str(e)) from e
+        self.settings.setdefault(guild_id, {}).setdefault(name, {}).update(options)
+        self._plans.pop(guild_id, None)
+        self._generations[guild_id] = self._generations.get(guild_id, 0) + 1
+
+    def replan(self):
+        """Drop compiled plans so they are reordered by measured costs"""
+        self._plans = {}
+
+    def plan(self, guild_id):
+        plan = self._plans.get(guild_id)
+        if plan is None:
+            plan = self._plans[guild_id] = self.compile(guild_id)
+        return plan
+
+    def compile(self, guild_id):
+        rules = []
+        for name, rule_type in RULE_TYPES.items():
+            options = self.options(guild_id, name)
+            if not options['enabled']:
+                continue
+            try:
+                rules.append(rule_type(options, self.context))
+            except (re.error, TypeError, ValueError) as e:
+                logger.error(f"Skipping invalid {name} rule for guild {guild_id}: {e}")
+
+        def order(rule):
+            # Measured cost once a rule has history, otherwise its estimate
+            stats = self.stats.get((guild_id, rule.name))
+            return stats.mean_us if stats and stats.evaluations >= 100 else rule.cost
+
+        rules.sort(key=order)
+        asynchronous = [rule for rule in rules if rule.asynchronous]
+        expensive = [rule for rule in rules if rule.offloadable and not rule.asynchronous
+                     and (rule.isolated or order(rule) >= self.offload_us)]
+        return Plan(
+            tuple(rule for rule in rules if rule not in expensive and rule not in asynchronous),
+            tuple(expensive),
+            tuple(asynchronous)
+        )
+
+    def _stats(self, guild_id, name):
+        stats = self.stats.get((guild_id, name))
+        if stats is None:
+            stats = self.stats[(guild_id, name)] = RuleStats()
+        return stats
+
+    def _run(self, rules, message):
+        """Run rules in order until one fires; returns (rule, reason, [elapsed_ns, ...])"""
+        timings = []
+        for rule in rules:
+            start = time.perf_counter_ns()
+            reason = rule.check(message)
+            timings.append(time.perf_counter_ns() - start)
+            if reason:
+                return rule, reason, timings
+        return None, None, timings
+
+    def _record(self, guild_id, rules, hit_rule, timings):
+        for rule, elapsed in zip(rules, timings):
+            self._stats(guild_id, rule.name).record(elapsed, rule is hit_rule)
+
+    @property
+    def cache_hit_rate(self):
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+    def _cache_verdict(self, key, verdict):
+        self._verdicts[key] = verdict
+        if len(self._verdicts) > self.cache_size:
+            self._verdicts.popitem(last=False)
+
+    async def evaluate(self, message):
+        """The first verdict against a message, or None"""
+        guild_id = message.guild.id
+        plan = self.plan(guild_id)
+
+        if plan.cheap or plan.expensive:
+            # The exact content: length and repeated-character rules count whitespace too.
+            # mention_everyone also depends on the author's permissions, not just the text
+            key = (guild_id, self._generations.get(guild_id, 0),
+                   hash((message.content, message.mention_everyone)))
+            if key in self._verdicts:
+                self.cache_hits += 1
+                self._verdicts.move_to_end(key)
+                verdict = self._verdicts[key]
+                if verdict:
+                    return verdict
+            else:
+                self.cache_misses += 1
+                verdict = await self._evaluate_sync(guild_id, plan, message)
+                if verdict is not False:
+                    self._cache_verdict(key, verdict)
+                if verdict:
+                    return verdict
+
+        for rule in plan.asynchronous:
+            start = time.perf_counter_ns()
+            reason = await rule.check(message)
+            self._stats(guild_id, rule.name).record(time.perf_counter_ns() - start, bool(reason))
+            if reason:
+                return Verdict(rule.name, reason, rule.options.get('message') or rule.message)
+        return None
+
+    async def _evaluate_sync(self, guild_id, plan, message):
+        """Verdict of the cheap and expensive rules; False if expensive rules timed out"""
+        rule, reason, timings = self._run(plan.cheap, message)
+        self._record(guild_id, plan.cheap, rule, timings)
+        if rule:
+            return Verdict(rule.name, reason, rule.options.get('message') or rule.message)
+
+        if plan.expensive:
+            loop = asyncio.get_running_loop()
+            try:
+                rule, reason, timings = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self._run, plan.expensive, message),
+                    timeout=self.expensive_timeout
+                )
+            except (asyncio.TimeoutError, TimeoutError):
+                # TimeoutError is the sandbox killing a regex search
+                logger.warning(f"Auto-moderation rules timed out in guild {guild_id}")
+                for expensive_rule in plan.expensive:
+                    self._stats(guild_id, expensive_rule.name).timeouts += 1
+                # Not cached, so the message is checked again if it is reposted
+                return False
+            except (EOFError, OSError, RuntimeError) as e:
+                logger.error(f"Auto-moderation regex sandbox failed in guild {guild_id}: {e!r}")
+                return False
+            self._record(guild_id, plan.expensive, rule, timings)
+            if rule:
+                return Verdict(rule.name, reason, rule.options.get('message') or rule.message)
+        return None
@@ -0,0 +1,189 @@
+import gzip
+import json
+import os
+import time
+
+import discord
+
+from core.templates import EVERYONE, ChannelSpec, GuildTemplate, RoleSpec, channel_type
+
+FORMAT_VERSION = 1
+
+def _target_key(guild, target):
+    if target.id == guild.id:
+        return EVERYONE
+    if isinstance(target, discord.Role) or getattr(target, 'type', None) is discord.Role:
+        return str(target.id)
+    return f"member:{target.id}"
+
+def snapshot_guild(guild):
+    """A guild's roles, categories and channels as JSON-ready dicts keyed by ID
+
+    Managed roles (bots, boosters) can't be recreated, so they're left out;
+    overwrites that mention them still restore while the role exists.
+    Only text, voice and category channels are kept.
+    """
+    roles = {}
+    for role in guild.roles:
+        if role.managed:
+            continue
+        roles[EVERYONE if role.is_default() else str(role.id)] = {
+            'name': role.name,
+            'color': role.color.value,
+            'hoist': role.hoist,
+            'mentionable': role.mentionable,
+            'permissions': role.permissions.value,
+            'position': role.position,
+        }
+
+    channels = {}
+    for channel in guild.channels:
+        kind = channel_type(channel)
+        if kind is None:
+            continue
+        entry = {
+            'name': channel.name,
+            'type': kind,
+            'position': channel.position,
+            'overwrites': {},
+        }
+        for target, overwrite in channel.overwrites.items():
+            allow, deny = overwrite.pair()
+            entry['overwrites'][_target_key(guild, target)] = [allow.value, deny.value]
+        if kind != 'category':
+            entry['category'] = str(channel.category_id) if channel.category_id else None
+            entry['nsfw'] = channel.nsfw
+        if kind == 'text':
+            entry['topic'] = channel.topic or ''
+            entry['slowmode'] = channel.slowmode_delay
+        channels[str(channel.id)] = entry
+    return {'roles': roles, 'channels': channels}
+
+def diff_states(old, new):
+    """The changes from one snapshot to the next: {section: {'set': {...}, 'delete': [...]}}"""
+    changes = {}
+    for section in ('roles', 'channels'):
+        before, after = old[section], new[section]
+        changed = {key: value for key, value in after.items() if before.get(key) != value}
+        deleted = [key for key in before if key not in after]
+        if changed or deleted:
+            changes[section] = {'set': changed, 'delete': deleted}
+    return changes
+
+def apply_changes(state, changes):
+    state = {section: dict(entries) for section, entries in state.items()}
+    for section, change in changes.items():
+        state[section].update(change['set'])
+        for key in change['delete']:
+            state[section].pop(key, None)
+    return state
+
+def count_changes(changes):
+    return sum(len(change['set']) + len(change['delete']) for change in changes.values())
+
+def load_backup(state):
+    """A by-ID GuildTemplate that restores a snapshot"""
+    roles = [
+        RoleSpec(key, entry['name'], entry['color'], entry['hoist'], entry['mentionable'],
+                 discord.Permissions(entry['permissions']), entry['position'])
+        for key, entry in sorted(state['roles'].items(), key=lambda item: -item[1]['position'])
+    ]
+
+    def overwrites(entry):
+        return {
+            target: discord.PermissionOverwrite.from_pair(discord.Permissions(allow), discord.Permissions(deny))
+            for target, (allow, deny) in entry['overwrites'].items()
+        }
+
+    entries = sorted(state['channels'].items(), key=lambda item: item[1]['position'])
+    channels = [
+        ChannelSpec(key, entry['name'], entry['type'], entry.get('category'), entry.get('topic'),
+                    entry.get('nsfw'), entry.get('slowmode'), overwrites(entry), entry['position'])
+        for key, entry in entries
+    ]
+    return GuildTemplate(roles, channels, by_id=True)
+
+class BackupStore:
+    """Versioned structure snapshots, one gzipped JSON file per guild
+
+    Each version stores only what changed since the one before; every
+    ``full_every`` versions a full snapshot starts a new chain, so a
+    restore never replays more than that many diffs. Past ``keep``
+    versions the oldest are dropped and the new oldest becomes a full
+    snapshot. All methods block, so call them from a thread.
+    """
+
+    def __init__(self, directory, keep=20, full_every=10):
+        self.directory = directory
+        self.keep = keep
+        self.full_every = full_every
+
+    def path(self, guild_id):
+        return os.path.join(self.directory, f"{guild_id}.json.gz")
+
+    def load(self, guild_id):
+        try:
+            with gzip.open(self.path(guild_id), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'format': FORMAT_VERSION, 'guild_id': guild_id, 'versions': []}
+
+    def _save(self, guild_id, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(guild_id)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=9) as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def size(self, guild_id):
+        try:
+            return os.path.getsize(self.path(guild_id))
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def state(versions, number=None):
+        """The full snapshot at a version number (default the latest)"""
+        index = len(versions) - 1 if number is None else next(
+            (i for i, version in enumerate(versions) if version['version'] == number), None)
+        if index is None or index < 0:
+            raise KeyError(number)
+        base = max(i for i in range(index + 1) if 'full' in versions[i])
+        state = versions[base]['full']
+        for version in versions[base + 1:index + 1]:
+            state = apply_changes(state, version['changes'])
+        return state
+
+    def add(self, guild_id, snapshot, author):
+        """Store a snapshot; returns (version, changes since the last one), or (None, 0) if nothing changed"""
+        data = self.load(guild_id)
+        versions = data['versions']
+        entry = {
+            'version': versions[-1]['version'] + 1 if versions else 1,
+            'created_at': time.time(),
+            'author': author,
+        }
+        if versions:
+            changes = diff_states(self.state(versions), snapshot)
+            if not changes:
+                return None, 0
+            since_full = len(versions) - max(i for i, version in enumerate(versions) if 'full' in version)
+            if since_full >= self.full_every:
+                entry['full'] = snapshot
+            else:
+                entry['changes'] = changes
+            entry['changed'] = count_changes(changes)
+        else:
+            entry['full'] = snapshot
+            entry['changed'] = len(snapshot['roles']) + len(snapshot['channels'])
+        versions.append(entry)
+
+        if len(versions) > self.keep:
+            oldest = versions[-self.keep]
+            if 'full' not in oldest:
+                oldest['full'] = self.state(versions, oldest['version'])
+                del oldest['changes']
+            del versions[:-self.keep]
+        self._save(guild_id, data)
+        return entry, entry['changed']
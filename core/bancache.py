@@ -0,0 +1,156 @@
+import asyncio
+import fnmatch
+import logging
+import re
+import time
+
+import discord
+
+logger = logging.getLogger('BanCache')
+
+class BanRecord:
+    """One banned user; ``banned_at`` is None when the ban predates the audit log"""
+
+    __slots__ = ('user_id', 'name', 'reason', 'banned_at')
+
+    def __init__(self, user_id, name, reason=None, banned_at=None):
+        self.user_id = user_id
+        self.name = name
+        self.reason = reason
+        self.banned_at = banned_at
+
+def ban_matcher(pattern):
+    """A predicate for BanRecords matching a user ID, or a name or reason pattern
+
+    Patterns with ``*`` or ``?`` are globs over the whole name; anything
+    else matches as a case-insensitive substring of the name or reason.
+    """
+    pattern = pattern.strip().casefold()
+    if pattern.isdigit():
+        user_id = int(pattern)
+        return lambda record: record.user_id == user_id
+    if any(char in pattern for char in '*?['):
+        match = re.compile(fnmatch.translate(pattern)).match
+        return lambda record: match(record.name.casefold()) is not None
+    return lambda record: pattern in record.name.casefold() or pattern in (record.reason or '').casefold()
+
+class BanCache:
+    """Per-guild ban lists, loaded on first use and kept current by events
+
+    A guild's list is downloaded once with the paginated bans endpoint
+    (concurrent callers share the download) and then updated from ban and
+    unban events. Ban dates come from the audit log where it still has
+    them. Lists not used for ``idle_seconds`` are dropped by ``evict_idle``.
+    """
+
+    def __init__(self, idle_seconds=3600):
+        self.idle_seconds = idle_seconds
+        self._guilds = {}  # guild_id -> {user_id: BanRecord}
+        self._last_used = {}  # guild_id -> monotonic time
+        self._locks = {}  # guild_id -> asyncio.Lock held while downloading
+        self._changes = {}  # guild_id -> [(user_id, BanRecord or None), ...] seen during a download
+
+    def __len__(self):
+        return sum(len(records) for records in self._guilds.values())
+
+    @property
+    def guilds(self):
+        return len(self._guilds)
+
+    def loaded(self, guild_id):
+        return guild_id in self._guilds
+
+    async def get(self, guild):
+        """A guild's bans as {user_id: BanRecord}, downloading them if needed"""
+        self._last_used[guild.id] = time.monotonic()
+        records = self._guilds.get(guild.id)
+        if records is not None:
+            return records
+
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            records = self._guilds.get(guild.id)
+            if records is not None:
+                return records
+
+            start = time.perf_counter()
+            records = {}
+            self._changes[guild.id] = []
+            try:
+                async for entry in guild.bans(limit=None):
+                    records[entry.user.id] = BanRecord(entry.user.id, str(entry.user), entry.reason)
+                dated = await self._load_dates(guild, records)
+            finally:
+                changes = self._changes.pop(guild.id, [])
+            # Only now that the list is cached; after a failure the lock stays, so waiters
+            # retry one at a time instead of racing a caller with a fresh lock
+            self._locks.pop(guild.id, None)
+            # Bans and unbans that happened while the pages were downloading
+            for user_id, record in changes:
+                if record is None:
+                    records.pop(user_id, None)
+                else:
+                    records[user_id] = record
+            self._guilds[guild.id] = records
+            logger.info(f"Loaded {len(records)} bans for {guild.name} ({dated} dated) "
+                        f"in {time.perf_counter() - start:.1f}s")
+            return records
+
+    async def _load_dates(self, guild, records):
+        """Fill in ban dates from the audit log; returns how many were found"""
+        if not guild.me.guild_permissions.view_audit_log:
+            return 0
+        dated = 0
+        try:
+            # Newest first, so the first entry seen for a user is their current ban
+            async for entry in guild.audit_logs(limit=None, action=discord.AuditLogAction.ban):
+                record = records.get(getattr(entry.target, 'id', None))
+                if record is not None and record.banned_at is None:
+                    record.banned_at = entry.created_at.timestamp()
+                    dated += 1
+                    if dated == len(records):
+                        break
+        except discord.HTTPException as e:
+            logger.warning(f"Could not read ban dates for {guild.name}: {e}")
+        return dated
+
+    def get_cached(self, guild_id, user_id):
+        records = self._guilds.get(guild_id)
+        return records.get(user_id) if records is not None else None
+
+    def add(self, guild_id, user, reason=None):
+        """Record a ban; lists that aren't loaded yet will include it when they are"""
+        records = self._guilds.get(guild_id)
+        if records is not None:
+            existing = records.get(user.id)
+            if reason is None and existing is not None:
+                reason = existing.reason  # The ban event has no reason; keep the one the command gave
+            records[user.id] = BanRecord(user.id, str(user), reason, time.time())
+        elif guild_id in self._changes:
+            self._changes[guild_id].append((user.id, BanRecord(user.id, str(user), reason, time.time())))
+
+    def remove(self, guild_id, user_id):
+        records = self._guilds.get(guild_id)
+        if records is not None:
+            return records.pop(user_id, None)
+        if guild_id in self._changes:
+            self._changes[guild_id].append((user_id, None))
+        return None
+
+    def drop(self, guild_id):
+        self._guilds.pop(guild_id, None)
+        self._last_used.pop(guild_id, None)
+
+    def evict_idle(self):
+        """Drop ban lists nobody has looked at recently; returns how many"""
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [guild_id for guild_id in self._guilds if self._last_used.get(guild_id, 0) < cutoff]
+        for guild_id in idle:
+            self.drop(guild_id)
+        # Locks and timestamps left by downloads that failed
+        for guild_id in [guild_id for guild_id, lock in self._locks.items() if not lock.locked()]:
+            del self._locks[guild_id]
+        for guild_id in [guild_id for guild_id in self._last_used if guild_id not in self._guilds]:
+            if guild_id not in self._locks:
+                del self._last_used[guild_id]
+        return len(idle)
@@ -0,0 +1,56 @@
+import asyncio
+import logging
+import re
+import time
+
+logger = logging.getLogger('BulkActions')
+
+# Discord rejects audit log reasons longer than this
+AUDIT_REASON_LIMIT = 512
+
+# A user mention or a bare snowflake; Discord IDs are 17-20 digits today
+USER_ID_PATTERN = re.compile(r'<@!?(\d{15,20})>|(?<!\d)(\d{15,20})(?!\d)')
+
+def parse_user_ids(text):
+    """User IDs mentioned or pasted in text, deduplicated, in the order first seen"""
+    ids = dict.fromkeys(int(mention or bare) for mention, bare in USER_ID_PATTERN.findall(text))
+    return list(ids)
+
+def strip_user_ids(text):
+    """Text with its IDs and mentions removed, e.g. to keep what's left as a reason"""
+    return ' '.join(USER_ID_PATTERN.sub(' ', text).split())
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+async def run_bounded(items, func, concurrency=4, on_progress=None, progress_interval=5.0):
+    """Await func(item) for every item, at most ``concurrency`` at a time
+
+    Returns {item: exception or None}. A fixed pool of workers pulls from
+    the list, so thousands of items don't mean thousands of tasks; rate
+    limits are left to discord.py, which holds requests back per bucket.
+    ``on_progress(done)`` is awaited at most every ``progress_interval``
+    seconds while items are running; if it fails the run carries on.
+    """
+    results = {}
+    pending = iter(items)
+    last_progress = time.monotonic()
+
+    async def worker():
+        nonlocal last_progress
+        for item in pending:
+            try:
+                await func(item)
+                results[item] = None
+            except Exception as e:
+                results[item] = e
+            if on_progress and time.monotonic() - last_progress >= progress_interval:
+                last_progress = time.monotonic()
+                try:
+                    await on_progress(len(results))
+                except Exception as e:  # e.g. the status message was deleted
+                    logger.warning(f"Progress update failed: {e!r}")
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(items))))))
+    return results
@@ -0,0 +1,49 @@
+import copy
+from collections import OrderedDict
+import discord
+
+class EmbedTemplate:
+    """The static part of an embed, built once and reused
+
+    ``build(guild)`` returns the embed without any per-call content. Its
+    ``to_dict()`` is cached per (guild, locale) when the template is per-guild,
+    or once otherwise. ``render`` builds a new embed from a copy of it; callers
+    then fill in the dynamic parts.
+    """
+
+    def __init__(self, build, per_guild=False, cache_size=1024):
+        self._build = build
+        self.per_guild = per_guild
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def _state(self, guild):
+        key = (guild.id, str(guild.preferred_locale)) if self.per_guild and guild else None
+        state = self._cache.get(key)
+        if state is None:
+            state = self._cache[key] = self._build(guild).to_dict()
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return state
+
+    def render(self, guild=None, description=None, timestamp=True):
+        """A new embed from the cached one, safe to modify"""
+        # from_dict keeps the nested dicts it's given, and set_field_at/add_field
+        # edit them in place, so each render gets its own copy
+        embed = discord.Embed.from_dict(copy.deepcopy(self._state(guild)))
+
+        if description is not None:
+            embed.description = description
+        if timestamp:
+            embed.timestamp = discord.utils.utcnow()
+        return embed
+
+    def invalidate(self, guild_id=None):
+        """Drop cached embeds for a guild, or all of them"""
+        if guild_id is None:
+            self._cache.clear()
+            return
+        for key in [key for key in self._cache if key and key[0] == guild_id]:
+            del self._cache[key]
@@ -0,0 +1,124 @@
+import difflib
+
+class HelpEntry:
+    """What the help system needs to know about one command"""
+
+    __slots__ = ('name', 'aliases', 'signature', 'help', 'summary', 'category')
+
+    def __init__(self, command, category):
+        self.name = command.qualified_name
+        self.aliases = [f"{command.full_parent_name} {alias}".strip() for alias in command.aliases]
+        self.signature = command.signature
+        self.help = command.help or "No description available"
+        self.summary = command.short_doc or "No description available"
+        self.category = category
+
+class HelpCategory:
+    __slots__ = ('key', 'name', 'description', 'entries')
+
+    def __init__(self, key, name, description):
+        self.key = key
+        self.name = name
+        self.description = description
+        self.entries = []
+
+class PrefixTrie:
+    """Maps words to values and lists every value under a prefix"""
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, word, value):
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(value)
+
+    def search(self, prefix, limit=10):
+        """Values for words starting with ``prefix``, shortest words first"""
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+
+        found = []
+        level = [node]
+        while level and len(found) < limit:
+            next_level = []
+            for current in level:
+                for key, child in current.items():
+                    if key is None:
+                        found.extend(child)
+                    else:
+                        next_level.append(child)
+            level = next_level
+        return found[:limit]
+
+class HelpIndex:
+    """Commands of the loaded cogs, indexed by name, alias and prefix
+
+    Built once from the command tree; lookups and searches never walk it.
+    """
+
+    def __init__(self, bot, hidden_cogs=(), labels=None):
+        labels = labels or {}
+        self.categories = []
+        self._names = {}  # name or alias -> HelpEntry
+        self._categories = {}  # lowercase key or label -> HelpCategory
+        self._trie = PrefixTrie()
+
+        for cog_name, cog in sorted(bot.cogs.items()):
+            if cog_name in hidden_cogs:
+                continue
+            short_name = cog_name[:-3] if cog_name.endswith('Cog') else cog_name
+            name, description = labels.get(cog_name, (short_name, cog.description))
+            category = HelpCategory(cog_name, name, description)
+            for command in sorted(cog.walk_commands(), key=lambda command: command.qualified_name):
+                if not command.hidden:
+                    self._add(HelpEntry(command, category))
+            if category.entries:
+                self.categories.append(category)
+                for key in (cog_name, name, short_name):
+                    self._categories[key.lower()] = category
+
+        for command in bot.commands:
+            if command.cog is None and not command.hidden:
+                self._add(HelpEntry(command, None))
+
+    def _add(self, entry):
+        if entry.category:
+            entry.category.entries.append(entry)
+        for word in [entry.name, *entry.aliases]:
+            self._names[word] = entry
+            self._trie.insert(word, entry)
+
+    def __len__(self):
+        return sum(len(category.entries) for category in self.categories)
+
+    def lookup(self, query):
+        """The command named or aliased exactly ``query``"""
+        return self._names.get(' '.join(query.lower().split()))
+
+    def category(self, query):
+        """The category named ``query``, or the only one starting with it"""
+        query = query.lower().strip()
+        category = self._categories.get(query)
+        if category is None and query:
+            matches = {category for key, category in self._categories.items() if key.startswith(query)}
+            if len(matches) == 1:
+                category = matches.pop()
+        return category
+
+    def search(self, query, limit=5):
+        """Commands whose name starts with ``query``, then close misspellings"""
+        query = ' '.join(query.lower().split())
+        results = []
+        for entry in self._trie.search(query, limit * 4):
+            if entry not in results:
+                results.append(entry)
+        for word in difflib.get_close_matches(query, self._names, n=limit * 2, cutoff=0.6):
+            entry = self._names[word]
+            if entry not in results:
+                results.append(entry)
+        return results[:limit]
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import discord
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it attachments aren't screened
+    Image = None
+
+logger = logging.getLogger('ImageScreening')
+
+def dhash(data, size=8):
+    """64-bit difference hash of an image; runs in a pool process
+
+    Each bit says whether a pixel of the shrunken greyscale image is
+    brighter than its right neighbour, so re-encoding, resizing and small
+    edits only flip a few bits.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('L', (size * 4, size * 4))  # Lets JPEG decode at a fraction of full size
+        pixels = list(image.convert('L').resize((size + 1, size), Image.LANCZOS).getdata())
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for column in range(size):
+            value = (value << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    return value
+
+def _warm():
+    """Submitted at startup so workers are spawned before the first screen"""
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+class MultiIndexHash:
+    """Hashes indexed for Hamming-distance search
+
+    The bits are split into ``max_distance + 1`` chunks, with one table per
+    chunk. Two hashes within ``max_distance`` bits of each other must agree
+    exactly on at least one chunk, so a search only compares the hashes
+    that share a chunk with the query.
+    """
+
+    def __init__(self, items=(), max_distance=6, bits=64):
+        self.max_distance = max_distance
+        self._chunks = []  # (shift, mask) per chunk
+        shift = 0
+        count = max_distance + 1
+        for index in range(count):
+            width = bits // count + (1 if index < bits % count else 0)
+            self._chunks.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables = [{} for _ in self._chunks]  # chunk value -> [(hash, value), ...]
+        self._size = 0
+        for item_hash, value in items:
+            self.add(item_hash, value)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, item_hash, value):
+        self._size += 1
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault((item_hash >> shift) & mask, []).append((item_hash, value))
+
+    def search(self, item_hash):
+        """(distance, hash, value) for every entry within max_distance, closest first"""
+        seen = set()
+        found = []
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            for candidate, value in table.get((item_hash >> shift) & mask, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = hamming(item_hash, candidate)
+                if distance <= self.max_distance:
+                    found.append((distance, candidate, value))
+        found.sort(key=lambda match: match[0])
+        return found
+
+class ImageScreener:
+    """Perceptual-hash matching of attachments against per-guild blocklists
+
+    Hashing runs in a process pool. Results are cached by the attachment's
+    CDN path and size, so an attachment seen before (an edited or forwarded
+    message) isn't even downloaded again, and by the SHA-256 of the file,
+    so a re-upload of the same image is matched without decoding it.
+    """
+
+    def __init__(self, max_bytes, max_distance=6, workers=1, cache_size=4096):
+        self.max_bytes = max_bytes
+        self.max_distance = max_distance
+        self.workers = workers
+        self.cache_size = cache_size
+        self.blocklists = {}  # guild_id -> {hash: entry dict}
+        self._indexes = {}  # guild_id -> MultiIndexHash, rebuilt when a blocklist changes
+        self._hashes = OrderedDict()  # SHA-256 digest -> dhash, or None if not an image
+        self._urls = OrderedDict()  # (CDN path, size) -> dhash, or None
+        self._executor = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def available(self):
+        return Image is not None
+
+    def start(self):
+        if not self.available or self._executor:
+            return
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        for _ in range(self.workers):
+            self._executor.submit(_warm)
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def load(self, blocklists):
+        """Replace all blocklists from saved data ({guild_id: [entry, ...]})"""
+        self.blocklists = {
+            int(guild_id): {int(entry['hash'], 16): entry for entry in entries}
+            for guild_id, entries in blocklists.items()
+        }
+        self._indexes = {}
+
+    def to_dict(self):
+        return {str(guild_id): list(entries.values()) for guild_id, entries in self.blocklists.items() if entries}
+
+    def block(self, guild_id, image_hash, entry):
+        self.blocklists.setdefault(guild_id, {})[image_hash] = entry
+        self._indexes.pop(guild_id, None)
+
+    def unblock(self, guild_id, image_hash):
+        removed = self.blocklists.get(guild_id, {}).pop(image_hash, None)
+        self._indexes.pop(guild_id, None)
+        return removed
+
+    def index(self, guild_id):
+        index = self._indexes.get(guild_id)
+        if index is None:
+            index = self._indexes[guild_id] = MultiIndexHash(self.blocklists.get(guild_id, {}).items(), self.max_distance)
+        return index
+
+    def screenable(self, attachment):
+        content_type = attachment.content_type or ''
+        return content_type.startswith('image/') and attachment.size <= self.max_bytes
+
+    def _remember(self, cache, key, image_hash):
+        cache[key] = image_hash
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    async def hash_attachment(self, attachment):
+        """The attachment's dhash, or None if it isn't a readable image (or is gone)"""
+        # The query string holds an expiring signature; the path names the file itself
+        url_key = (urlsplit(attachment.url).path, attachment.size)
+        if url_key in self._urls:
+            self.cache_hits += 1
+            self._urls.move_to_end(url_key)
+            return self._urls[url_key]
+
+        try:
+            data = await attachment.read()
+        except discord.HTTPException as e:  # Includes NotFound, e.g. the message was deleted meanwhile
+            logger.debug(f"Could not download {attachment.filename}: {e!r}")
+            return None
+        digest = hashlib.sha256(data).digest()
+        if digest in self._hashes:
+            self.cache_hits += 1
+            self._hashes.move_to_end(digest)
+            image_hash = self._hashes[digest]
+            self._remember(self._urls, url_key, image_hash)
+            return image_hash
+
+        self.cache_misses += 1
+        loop = asyncio.get_running_loop()
+        try:
+            image_hash = await loop.run_in_executor(self._executor, dhash, data)
+        except Exception as e:
+            logger.debug(f"Could not hash {attachment.filename}: {e!r}")
+            image_hash = None
+
+        self._remember(self._hashes, digest, image_hash)
+        self._remember(self._urls, url_key, image_hash)
+        return image_hash
+
+    async def screen(self, guild_id, attachments):
+        """The first blocklisted attachment as (attachment, distance, entry), or None"""
+        if not self._executor or not self.blocklists.get(guild_id):
+            return None
+
+        for attachment in attachments:
+            if not self.screenable(attachment):
+                continue
+            image_hash = await self.hash_attachment(attachment)
+            if image_hash is None:
+                continue
+            matches = self.index(guild_id).search(image_hash)
+            if matches:
+                distance, _, entry = matches[0]
+                return attachment, distance, entry
+        return None
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from collections import defaultdict
+from core.rankindex import RankIndex
+
+logger = logging.getLogger('Ledger')
+
+class InsufficientFunds(Exception):
+    """Raised when an update would make a balance negative"""
+
+    def __init__(self, balance, delta):
+        self.balance = balance
+        self.delta = delta
+        super().__init__(f"Balance {balance} is too low for {delta}")
+
+class Ledger:
+    """Virtual currency balances with write-behind persistence
+
+    Balances live in memory and every update is synchronous, so it is atomic
+    on the event loop. Each update appends the new balance to a transaction
+    log that is flushed every few seconds; checkpoints write changed balances
+    to SQLite in one transaction and truncate the log. On startup the log is
+    replayed on top of SQLite to recover updates since the last checkpoint.
+    """
+
+    def __init__(self, db_path, log_path, starting_balance=0):
+        self.db_path = db_path
+        self.log_path = log_path
+        self.starting_balance = starting_balance
+        self.balances = {}  # (guild_id, user_id) -> balance
+        self.leaderboards = defaultdict(RankIndex)  # guild_id -> RankIndex of user_id
+        self.dirty = set()
+        self.seq = 0
+        self._log_buffer = []
+        self._io_lock = asyncio.Lock()
+        self._db = None
+
+    def load(self, replay_log=True):
+        """Load balances and replay the transaction log; blocking, run it in a thread"""
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS balances (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                balance INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id)
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()
+        self.seq = row[0] if row else 0
+
+        for guild_id, user_id, balance in self._db.execute("SELECT guild_id, user_id, balance FROM balances"):
+            self.balances[(guild_id, user_id)] = balance
+
+        replayed = self._replay_log() if replay_log else 0
+        if replay_log and (replayed or os.path.exists(self.log_path)):
+            # Fold the recovered updates into SQLite so new records never follow a torn line;
+            # a log that wasn't replayed is left alone, since truncating it would lose its entries
+            self._write_checkpoint([(g, u, self.balances[(g, u)]) for g, u in self.dirty], self.seq)
+            self.dirty = set()
+
+        by_guild = defaultdict(dict)
+        for (guild_id, user_id), balance in self.balances.items():
+            by_guild[guild_id][user_id] = balance
+        self.leaderboards = defaultdict(RankIndex, {guild_id: RankIndex(scores) for guild_id, scores in by_guild.items()})
+
+        logger.info(f"Loaded {len(self.balances)} balances ({replayed} log records replayed)")
+
+    def _replay_log(self):
+        replayed = 0
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        seq, guild_id, user_id, balance = json.loads(line)
+                    except ValueError:
+                        break  # Torn write at the end of the log
+                    if seq > self.seq:
+                        self.balances[(guild_id, user_id)] = balance
+                        self.dirty.add((guild_id, user_id))
+                        self.seq = seq
+                        replayed += 1
+        except FileNotFoundError:
+            pass
+        return replayed
+
+    def balance(self, guild_id, user_id):
+        return self.balances.get((guild_id, user_id), self.starting_balance)
+
+    def apply(self, guild_id, user_id, delta):
+        """Add delta to a balance and return the new balance
+
+        Raises InsufficientFunds instead of going negative.
+        """
+        key = (guild_id, user_id)
+        current = self.balances.get(key, self.starting_balance)
+        new_balance = current + delta
+        if new_balance < 0:
+            raise InsufficientFunds(current, delta)
+
+        self.balances[key] = new_balance
+        self.leaderboards[guild_id].update(user_id, new_balance)
+        self.dirty.add(key)
+        self.seq += 1
+        self._log_buffer.append(f"[{self.seq},{guild_id},{user_id},{new_balance}]\n")
+        return new_balance
+
+    async def flush_log(self):
+        """Append buffered updates to the transaction log"""
+        async with self._io_lock:
+            await self._flush_log_locked()
+
+    async def _flush_log_locked(self):
+        if not self._log_buffer:
+            return
+        lines, self._log_buffer = self._log_buffer, []
+        await asyncio.to_thread(self._append_log, ''.join(lines))
+
+    def _append_log(self, data):
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def checkpoint(self):
+        """Write changed balances to SQLite and truncate the transaction log"""
+        async with self._io_lock:
+            await self._flush_log_locked()
+            if not self.dirty:
+                return 0
+
+            # Snapshot on the event loop so later updates land in the next checkpoint
+            rows = [(guild_id, user_id, self.balances[(guild_id, user_id)]) for guild_id, user_id in self.dirty]
+            seq = self.seq
+            self.dirty = set()
+            try:
+                await asyncio.to_thread(self._write_checkpoint, rows, seq)
+            except Exception:
+                self.dirty.update((guild_id, user_id) for guild_id, user_id, _ in rows)
+                raise
+
+        logger.debug(f"Checkpointed {len(rows)} balances at seq {seq}")
+        return len(rows)
+
+    def _write_checkpoint(self, rows, seq):
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO balances (guild_id, user_id, balance) VALUES (?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET balance = excluded.balance",
+                rows
+            )
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seq', ?)", (seq,))
+        # Every logged update up to seq is now in SQLite
+        open(self.log_path, 'w').close()
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
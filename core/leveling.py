@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import sqlite3
+from bisect import bisect_right
+from collections import defaultdict
+from core.rankindex import RankIndex
+
+logger = logging.getLogger('Leveling')
+
+def xp_for_next_level(level):
+    """XP needed to go from a level to the next one"""
+    return 5 * level ** 2 + 50 * level + 100
+
+# Total XP needed to reach each level, so level lookups are a binary search
+LEVEL_THRESHOLDS = [0]
+for _level in range(500):
+    LEVEL_THRESHOLDS.append(LEVEL_THRESHOLDS[-1] + xp_for_next_level(_level))
+
+def level_for_xp(xp):
+    return bisect_right(LEVEL_THRESHOLDS, xp) - 1
+
+class XPTracker:
+    """Per-guild XP totals with batched persistence
+
+    ``add`` is the message hot path and only touches dicts. Rank indexes and
+    SQLite are brought up to date in batches by ``flush``.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.xp = {}  # (guild_id, user_id) -> total XP
+        self.dirty = set()
+        self.unranked = set()
+        self.ranks = defaultdict(RankIndex)  # guild_id -> RankIndex of user_id
+        self._db = None
+        self._lock = asyncio.Lock()
+
+    def load(self):
+        """Load XP totals from SQLite; blocking, run it in a thread"""
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS xp (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                xp INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+        by_guild = defaultdict(dict)
+        for guild_id, user_id, xp in self._db.execute("SELECT guild_id, user_id, xp FROM xp"):
+            self.xp[(guild_id, user_id)] = xp
+            by_guild[guild_id][user_id] = xp
+        self.ranks = defaultdict(RankIndex, {guild_id: RankIndex(scores) for guild_id, scores in by_guild.items()})
+        logger.info(f"Loaded XP for {len(self.xp)} members")
+
+    def add(self, guild_id, user_id, amount):
+        """Add XP and return (old_level, new_level)"""
+        key = (guild_id, user_id)
+        old = self.xp.get(key, 0)
+        new = old + amount
+        self.xp[key] = new
+        self.dirty.add(key)
+        self.unranked.add(key)
+        return level_for_xp(old), level_for_xp(new)
+
+    def get(self, guild_id, user_id):
+        return self.xp.get((guild_id, user_id), 0)
+
+    def refresh_ranks(self):
+        """Move members whose XP changed to their new rank positions"""
+        keys, self.unranked = self.unranked, set()
+        for guild_id, user_id in keys:
+            self.ranks[guild_id].update(user_id, self.xp[(guild_id, user_id)])
+
+    async def flush(self):
+        """Update the rank indexes and write changed XP totals to SQLite"""
+        self.refresh_ranks()
+        if not self.dirty:
+            return 0
+
+        async with self._lock:
+            rows = [(guild_id, user_id, self.xp[(guild_id, user_id)]) for guild_id, user_id in self.dirty]
+            self.dirty = set()
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception:
+                self.dirty.update((guild_id, user_id) for guild_id, user_id, _ in rows)
+                raise
+
+        logger.debug(f"Flushed XP for {len(rows)} members")
+        return len(rows)
+
+    def _write(self, rows):
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO xp (guild_id, user_id, xp) VALUES (?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET xp = excluded.xp",
+                rows
+            )
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
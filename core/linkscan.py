@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+import discord
+
+logger = logging.getLogger('LinkScan')
+
+# A host name with an optional scheme, port and path. Bare domains count too,
+# since phishing links are often posted without https:// to dodge embeds.
+LINK_PATTERN = re.compile(
+    r'(?:https?://)?'
+    r'((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{1,62})'
+    r'(?::\d{1,5})?'
+    r'(/[^\s<>]*)?',
+    re.IGNORECASE
+)
+# Hosts whose links are Discord invites, and the path prefix before the code
+INVITE_HOSTS = {
+    'discord.gg': '/',
+    'www.discord.gg': '/',
+    'discord.com': '/invite/',
+    'www.discord.com': '/invite/',
+    'discordapp.com': '/invite/',
+    'www.discordapp.com': '/invite/',
+}
+INVITE_CODE = re.compile(r'[\w-]{2,32}')
+# A dot followed by a letter; plain prose ("Hi. How are you?") has none
+_LINK_HINT = re.compile(r'[a-z0-9]\.[a-z]', re.IGNORECASE)
+_MASK = (1 << 64) - 1
+_BUCKET_BITS = 16
+
+def extract_links(text):
+    """(hosts, invite codes) linked in a message, both lowercased and deduplicated"""
+    # Most messages have no links, and this check is far cheaper than the full pattern
+    if '.' not in text or not _LINK_HINT.search(text):
+        return (), ()
+    hosts = []
+    invites = []
+    for match in LINK_PATTERN.finditer(text):
+        host = match.group(1).lower()
+        if host not in hosts:
+            hosts.append(host)
+        prefix = INVITE_HOSTS.get(host)
+        path = match.group(2)
+        if prefix and path and path.startswith(prefix):
+            code = INVITE_CODE.match(path, len(prefix))
+            if code and code.group(0) not in invites:
+                invites.append(code.group(0))
+    return hosts, invites
+
+def _domain_hash(domain):
+    return hash(domain) & _MASK
+
+def parse_blocklist(path):
+    """Bucketed, sorted 64-bit hashes of the domains in a blocklist file
+
+    One domain per line. ``*.example.com``, hosts-file lines
+    (``0.0.0.0 example.com``) and ``#`` comments are accepted. Hashes
+    aren't stable across processes, so this has to run in the bot's own
+    process (a thread is fine).
+    """
+    hashes = set()
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            line = line.split('#', 1)[0].split()
+            if not line:
+                continue
+            domain = line[-1].lower().rstrip('.')
+            if domain.startswith('*.'):
+                domain = domain[2:]
+            if domain and domain not in ('localhost', '0.0.0.0'):
+                hashes.add(_domain_hash(domain))
+    return bucketed(array('Q', sorted(hashes)))
+
+def bucketed(hashes):
+    """(hashes, offsets) where offsets[b] is the index of the first hash with top bits >= b"""
+    offsets = array('L', [0]) * ((1 << _BUCKET_BITS) + 1)
+    shift = 64 - _BUCKET_BITS
+    for value in hashes:
+        offsets[(value >> shift) + 1] += 1
+    for bucket in range(1, len(offsets)):
+        offsets[bucket] += offsets[bucket - 1]
+    return hashes, offsets
+
+class DomainBlocklist:
+    """Blocked domains, matched against a host and all of its parent domains
+
+    Blocking ``example.com`` also blocks every subdomain. Domains are kept
+    as a sorted array of 64-bit hashes (8 bytes each), so millions of
+    entries fit in a few megabytes. The top bits of a hash pick a bucket
+    of the array, so a lookup is a short binary search per label of the
+    host. The file is reloaded when its modification time changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.loaded_at = None
+        self._hashes, self._offsets = bucketed(array('Q'))
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _contains(self, domain):
+        value = _domain_hash(domain)
+        bucket = value >> (64 - _BUCKET_BITS)
+        hi = self._offsets[bucket + 1]
+        index = bisect_left(self._hashes, value, self._offsets[bucket], hi)
+        return index < hi and self._hashes[index] == value
+
+    def match(self, host):
+        """The blocked domain covering host, or None"""
+        if not self._hashes:
+            return None
+        domain = host
+        while True:
+            if self._contains(domain):
+                return domain
+            dot = domain.find('.')
+            if dot < 0:
+                return None
+            domain = domain[dot + 1:]
+
+    async def reload_if_changed(self):
+        """Reload the file if it changed since the last load; returns whether it did"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            if self._hashes:
+                logger.warning(f"Domain blocklist {self.path} was removed, clearing it")
+                self._hashes, self._offsets = bucketed(array('Q'))
+                self.mtime = None
+            return False
+        if mtime == self.mtime:
+            return False
+
+        start = time.perf_counter()
+        try:
+            hashes, offsets = await asyncio.to_thread(parse_blocklist, self.path)
+        except OSError as e:
+            logger.error(f"Could not read domain blocklist {self.path}: {e}")
+            return False
+        self._hashes, self._offsets = hashes, offsets
+        self.mtime = mtime
+        self.loaded_at = time.time()
+        logger.info(f"Loaded {len(hashes):,} blocked domains in {time.perf_counter() - start:.2f}s")
+        return True
+
+class InviteResolver:
+    """Cached lookups of which server an invite code belongs to
+
+    Valid invites are cached for ``ttl`` seconds and unknown or expired
+    codes for ``negative_ttl``. Concurrent lookups of the same code share
+    one request, and at most ``max_concurrency`` requests run at once.
+    """
+
+    def __init__(self, bot, cache_size=4096, ttl=3600, negative_ttl=600, max_concurrency=4, timeout=3.0):
+        self.bot = bot
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()  # code -> (guild id or None, expires at)
+        self._pending = {}  # code -> future shared by concurrent lookups
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _store(self, code, guild_id, ttl):
+        self._cache[code] = (guild_id, time.monotonic() + ttl)
+        self._cache.move_to_end(code)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _fetch(self, code):
+        async with self._semaphore:
+            try:
+                invite = await self.bot.fetch_invite(code, with_counts=False, with_expiration=False)
+            except discord.NotFound:
+                self._store(code, None, self.negative_ttl)
+                return None
+        # Group DM invites have no guild; 0 marks them as not this server
+        guild_id = invite.guild.id if invite.guild else 0
+        self._store(code, guild_id, self.ttl)
+        return guild_id
+
+    def _finished(self, code, future):
+        self._pending.pop(code, None)
+        if not future.cancelled():
+            future.exception()  # Retrieved here in case every waiter timed out
+
+    async def resolve(self, code):
+        """The invite's guild id, or None if it is invalid or couldn't be looked up"""
+        cached = self._cache.get(code)
+        if cached and cached[1] > time.monotonic():
+            self.hits += 1
+            self._cache.move_to_end(code)
+            return cached[0]
+
+        self.misses += 1
+        future = self._pending.get(code)
+        if future is None:
+            future = self._pending[code] = asyncio.ensure_future(self._fetch(code))
+            future.add_done_callback(lambda done: self._finished(code, done))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except (asyncio.TimeoutError, discord.HTTPException) as e:
+            logger.debug(f"Could not resolve invite {code}: {e!r}")
+            return None
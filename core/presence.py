@@ -0,0 +1,51 @@
+import random
+
+class OnlineIndex:
+    """Online member IDs per guild with O(1) add, remove and uniform sampling
+
+    Each guild keeps a list of IDs plus a dict of list positions; removals
+    swap the last ID into the freed slot, so the list never has holes.
+    """
+
+    def __init__(self):
+        self._members = {}  # guild_id -> [member_id, ...]
+        self._positions = {}  # guild_id -> {member_id: index}
+
+    def add(self, guild_id, member_id):
+        positions = self._positions.setdefault(guild_id, {})
+        if member_id not in positions:
+            members = self._members.setdefault(guild_id, [])
+            positions[member_id] = len(members)
+            members.append(member_id)
+
+    def discard(self, guild_id, member_id):
+        positions = self._positions.get(guild_id)
+        if not positions or member_id not in positions:
+            return
+        members = self._members[guild_id]
+        index = positions.pop(member_id)
+        last = members.pop()
+        if last != member_id:
+            members[index] = last
+            positions[last] = index
+
+    def sample(self, guild_id):
+        """A uniformly random online member ID, or None"""
+        members = self._members.get(guild_id)
+        return random.choice(members) if members else None
+
+    def count(self, guild_id):
+        return len(self._members.get(guild_id, ()))
+
+    def rebuild(self, guild_id, member_ids):
+        """Replace a guild's online set"""
+        members = list(dict.fromkeys(member_ids))
+        self._members[guild_id] = members
+        self._positions[guild_id] = {member_id: index for index, member_id in enumerate(members)}
+
+    def drop_guild(self, guild_id):
+        self._members.pop(guild_id, None)
+        self._positions.pop(guild_id, None)
+
+    def __len__(self):
+        return sum(len(members) for members in self._members.values())
@@ -0,0 +1,47 @@
+from bisect import bisect_left, insort
+
+class RankIndex:
+    """Scores kept in descending order so leaderboards never sort on demand
+
+    Updates are a binary search plus a list insert, and ``top``/``rank`` read
+    straight from the sorted list. Ties are ordered by key.
+    """
+
+    def __init__(self, scores=None):
+        self._scores = dict(scores or {})
+        self._entries = sorted((-score, key) for key, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._scores
+
+    def get(self, key, default=None):
+        return self._scores.get(key, default)
+
+    def update(self, key, score):
+        """Set a key's score, moving it to its new position"""
+        old = self._scores.get(key)
+        if old == score:
+            return
+        if old is not None:
+            del self._entries[bisect_left(self._entries, (-old, key))]
+        insort(self._entries, (-score, key))
+        self._scores[key] = score
+
+    def remove(self, key):
+        old = self._scores.pop(key, None)
+        if old is not None:
+            del self._entries[bisect_left(self._entries, (-old, key))]
+
+    def top(self, count, offset=0):
+        """The highest (key, score) pairs, best first"""
+        return [(key, -score) for score, key in self._entries[offset:offset + count]]
+
+    def rank(self, key):
+        """1-based rank of a key, or None if it has no score"""
+        score = self._scores.get(key)
+        if score is None:
+            return None
+        return bisect_left(self._entries, (-score, key)) + 1
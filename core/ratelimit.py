@@ -0,0 +1,154 @@
+import time
+from collections import OrderedDict
+from discord.ext import commands
+
+# Which key each scope's buckets are stored under, and the BucketType reported on cooldown
+SCOPES = {
+    'user': commands.BucketType.member,
+    'channel': commands.BucketType.channel,
+    'guild': commands.BucketType.guild,
+}
+
+def parse_limit(text):
+    """Parse "capacity/seconds" into a (capacity, seconds) tuple"""
+    capacity, per = text.split('/', 1)
+    capacity, per = float(capacity), float(per)
+    if capacity <= 0 or per <= 0:
+        raise ValueError("capacity and seconds must be positive")
+    return capacity, per
+
+class BucketPool:
+    """Token buckets for one scope, sharing a capacity and refill rate
+
+    Buckets are kept in last-used order, so idle ones collect at the front
+    and the pool can be capped by dropping the least recently used bucket.
+    """
+
+    def __init__(self, capacity, per, max_buckets):
+        self.capacity = capacity
+        self.per = per
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()  # key -> [tokens, last update]
+
+    @property
+    def rate(self):
+        return self.capacity / self.per
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def available(self, key, now):
+        """Tokens in a bucket right now; a missing bucket is full"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.capacity
+        tokens, updated = bucket
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def take(self, key, tokens, now):
+        self._buckets[key] = [self.available(key, now) - tokens, now]
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+
+    def evict_idle(self, now):
+        """Drop buckets that have refilled completely; returns how many"""
+        evicted = 0
+        while self._buckets:
+            key = next(iter(self._buckets))
+            if self.available(key, now) < self.capacity:
+                break
+            del self._buckets[key]
+            evicted += 1
+        return evicted
+
+class CommandLimiter:
+    """Token-bucket rate limits per user, channel and guild
+
+    Every command costs tokens (1 unless weighted) from all three of its
+    buckets, charged by the bot's ``before_invoke`` hook; if any bucket is short, nothing is taken and the command is
+    rejected with ``CommandOnCooldown``.
+    """
+
+    def __init__(self, limits, costs=None, max_buckets=50000):
+        self.max_buckets = max_buckets
+        self.pools = {scope: BucketPool(*limits[scope], max_buckets) for scope in SCOPES}
+        self.configured_costs = dict(costs or {})
+        self.costs = dict(self.configured_costs)
+        self.rejected = 0
+        self._notified = {}  # (user key, command) -> monotonic time until which cooldown replies are muted
+
+    def cost(self, command_name):
+        return self.costs.get(command_name, 1)
+
+    def set_limit(self, scope, capacity, per):
+        """Change a scope's limit; existing buckets keep their tokens"""
+        pool = self.pools[scope]
+        pool.capacity = capacity
+        pool.per = per
+
+    def set_cost(self, command_name, cost):
+        # A configured cost set back to 1 is kept, so loading saved costs over the configured ones keeps it
+        if cost == 1 and command_name not in self.configured_costs:
+            self.costs.pop(command_name, None)
+        else:
+            self.costs[command_name] = cost
+
+    def keys(self, ctx):
+        guild_id = ctx.guild.id if ctx.guild else None
+        return {
+            'user': (guild_id, ctx.author.id),
+            'channel': ctx.channel.id,
+            # DMs share the user's bucket instead of one global "no guild" bucket
+            'guild': guild_id if guild_id is not None else ('dm', ctx.author.id),
+        }
+
+    def check(self, ctx):
+        """Charge a command to its buckets, or raise CommandOnCooldown"""
+        cost = self.cost(ctx.command.qualified_name)
+        if cost <= 0:
+            return
+        now = time.monotonic()
+        keys = self.keys(ctx)
+
+        retry_after, limited_scope = 0.0, None
+        for scope, key in keys.items():
+            pool = self.pools[scope]
+            missing = cost - pool.available(key, now)
+            if missing > 0 and missing / pool.rate > retry_after:
+                retry_after, limited_scope = missing / pool.rate, scope
+
+        if limited_scope:
+            self.rejected += 1
+            pool = self.pools[limited_scope]
+            raise commands.CommandOnCooldown(
+                commands.Cooldown(pool.capacity, pool.per), retry_after, SCOPES[limited_scope]
+            )
+
+        for scope, key in keys.items():
+            self.pools[scope].take(key, cost, now)
+
+    def should_notify(self, ctx, retry_after):
+        """Whether to reply to a rejected command; one reply per user and command per cooldown
+
+        Replies are muted for at most the longest limiter window, so a long
+        per-command cooldown (like a daily reward) still gets an answer when
+        it's retried later.
+        """
+        key = (self.keys(ctx)['user'], ctx.command.qualified_name if ctx.command else None)
+        now = time.monotonic()
+        if self._notified.get(key, 0) > now:
+            return False
+        self._notified[key] = now + min(retry_after, max(pool.per for pool in self.pools.values()))
+        return True
+
+    def evict_idle(self):
+        now = time.monotonic()
+        self._notified = {key: until for key, until in self._notified.items() if until > now}
+        return sum(pool.evict_idle(now) for pool in self.pools.values())
+
+    def to_dict(self):
+        return {
+            'limits': {scope: [pool.capacity, pool.per] for scope, pool in self.pools.items()},
+            'costs': self.costs,
+        }
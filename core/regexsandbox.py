@@ -0,0 +1,97 @@
+import logging
+import multiprocessing
+import queue
+import re
+from functools import lru_cache
+
+logger = logging.getLogger('RegexSandbox')
+
+@lru_cache(maxsize=1024)
+def _compile(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
+def _serve(conn):
+    """Worker process loop: answer (patterns, text) with the index of the first pattern that matches"""
+    conn.send('ready')
+    while True:
+        try:
+            patterns, text = conn.recv()
+        except EOFError:
+            return
+        conn.send(next((i for i, pattern in enumerate(patterns) if _compile(pattern).search(text)), None))
+
+class _Worker:
+    __slots__ = ('process', 'conn')
+
+    def __init__(self, context, start_timeout):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn,), daemon=True, name='regex-sandbox')
+        self.process.start()
+        child_conn.close()
+        # Startup (a fresh interpreter under spawn) doesn't count against a search's timeout
+        if not self.conn.poll(start_timeout):
+            self.kill()
+            raise RuntimeError("regex worker didn't start")
+        self.conn.recv()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class RegexSandbox:
+    """Regex searches in worker processes that are killed when a search runs too long
+
+    A match holds the GIL, so a runaway pattern can't be stopped from a
+    thread; a process can. ``search`` blocks while it waits on a pipe
+    (which releases the GIL), so call it from a thread. There's one
+    worker per concurrent caller, up to ``workers``, started on first
+    use and restarted after a timeout.
+    """
+
+    def __init__(self, workers=2, timeout=0.5, start_timeout=30):
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.timeouts = 0
+        self._context = multiprocessing.get_context('spawn')
+        self._slots = queue.Queue()  # a _Worker, or None for one not started yet
+        for _ in range(workers):
+            self._slots.put(None)
+        self._closed = False
+
+    def search(self, patterns, text):
+        """Index of the first of ``patterns`` that matches ``text``, or None; raises TimeoutError"""
+        if self._closed:
+            raise RuntimeError("regex sandbox is closed")
+        worker = self._slots.get()
+        try:
+            if worker is None:
+                worker = _Worker(self._context, self.start_timeout)
+            worker.conn.send((tuple(patterns), text))
+            if worker.conn.poll(self.timeout):
+                return worker.conn.recv()
+            self.timeouts += 1
+            worker.kill()
+            worker = None
+            raise TimeoutError(f"regex search took longer than {self.timeout}s")
+        except (EOFError, OSError):
+            # The worker died; start a new one next time
+            if worker is not None:
+                worker.kill()
+                worker = None
+            raise
+        finally:
+            if self._closed and worker is not None:
+                worker.kill()
+                worker = None
+            self._slots.put(worker)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                worker = self._slots.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.kill()
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+logger = logging.getLogger('Maintenance')
+
+async def cooperative(iterable, batch_size=500):
+    """Iterate over items, yielding to the event loop every batch_size items
+
+    Long maintenance jobs should loop with ``async for item in cooperative(...)``
+    so a big cache sweep never blocks the gateway heartbeat.
+    """
+    for index, item in enumerate(iterable, 1):
+        yield item
+        if index % batch_size == 0:
+            await asyncio.sleep(0)
+
+class MaintenanceJob:
+    """A periodic job registered with the maintenance scheduler"""
+
+    def __init__(self, name, func, interval, jitter=0.0, timeout=None, history=20):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.durations = deque(maxlen=history)
+        self.task = None
+        self.next_run = time.monotonic() + self.next_delay()
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.last_error = None
+
+    def next_delay(self):
+        """Seconds until the next run, with jitter to spread jobs apart"""
+        return self.interval + random.uniform(0, self.jitter)
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    @property
+    def last_duration(self):
+        return self.durations[-1] if self.durations else None
+
+    @property
+    def average_duration(self):
+        return sum(self.durations) / len(self.durations) if self.durations else None
+
+class MaintenanceScheduler:
+    """Runs registered maintenance jobs on their own intervals
+
+    Each job runs in its own task with a timeout, and at most one run of a
+    job is in flight at a time. The bot drives the scheduler by calling
+    ``run_due`` from its cleanup task.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+
+    def register(self, name, func, *, interval, jitter=0.0, timeout=None, run_immediately=False):
+        """Register an async callable to run every interval seconds"""
+        if name in self.jobs:
+            self.unregister(name)
+
+        job = MaintenanceJob(name, func, interval, jitter=jitter, timeout=timeout)
+        if run_immediately:
+            job.next_run = time.monotonic()
+
+        self.jobs[name] = job
+        logger.info(f"Registered maintenance job {name} (every {interval}s)")
+        return job
+
+    def unregister(self, name):
+        """Remove a job, cancelling it if it is running"""
+        job = self.jobs.pop(name, None)
+        if job and job.running:
+            job.task.cancel()
+        return job
+
+    def run_due(self):
+        """Start every job whose next run time has passed"""
+        now = time.monotonic()
+        for job in list(self.jobs.values()):
+            if job.next_run > now:
+                continue
+
+            job.next_run = now + job.next_delay()
+            if job.running:
+                # Single flight: never start a second run of a slow job
+                job.skipped += 1
+                logger.warning(f"Maintenance job {job.name} still running, skipping this run")
+                continue
+
+            job.task = asyncio.create_task(self._run(job), name=f"maintenance:{job.name}")
+
+    def run_now(self, name):
+        """Start a job immediately unless it is already running"""
+        job = self.jobs[name]
+        if not job.running:
+            job.task = asyncio.create_task(self._run(job), name=f"maintenance:{job.name}")
+        return job.task
+
+    async def _run(self, job):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(job.func(), timeout=job.timeout)
+            job.last_error = None
+        except asyncio.TimeoutError:
+            job.timeouts += 1
+            job.last_error = f"timed out after {job.timeout}s"
+            logger.warning(f"Maintenance job {job.name} timed out after {job.timeout}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.error(f"Maintenance job {job.name} failed: {e}")
+        finally:
+            job.runs += 1
+            job.durations.append(time.perf_counter() - start)
+
+    async def stop(self):
+        """Cancel all running jobs and wait for them to finish"""
+        tasks = [job.task for job in self.jobs.values() if job.running]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
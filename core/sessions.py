@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger('Sessions')
+
+class GameSession:
+    """An interactive session that receives the events routed to it
+
+    Events arrive as ``(kind, payload)`` tuples where kind is ``'message'``
+    (payload: the message) or ``'reaction'`` (payload: ``(reaction, user)``).
+    """
+
+    def __init__(self, router):
+        self.router = router
+        self.queue = asyncio.Queue()
+        self.channel_ids = set()
+        self.message_ids = set()
+
+    def watch_channel(self, channel_id):
+        """Receive messages sent in a channel"""
+        self.channel_ids.add(channel_id)
+        self.router._by_channel.setdefault(channel_id, []).append(self)
+
+    def watch_message(self, message_id):
+        """Receive reactions added to a message"""
+        self.message_ids.add(message_id)
+        self.router._by_message[message_id] = self
+
+    async def wait_for(self, kind, check=None, timeout=None):
+        """Wait for the next event of a kind that passes check
+
+        Raises asyncio.TimeoutError like ``Bot.wait_for``.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise asyncio.TimeoutError
+            event_kind, payload = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+            if event_kind != kind:
+                continue
+            if check is None or (check(*payload) if kind == 'reaction' else check(payload)):
+                return payload
+
+    def close(self):
+        """Stop receiving events"""
+        for channel_id in self.channel_ids:
+            sessions = self.router._by_channel.get(channel_id)
+            if sessions and self in sessions:
+                sessions.remove(self)
+                if not sessions:
+                    del self.router._by_channel[channel_id]
+        for message_id in self.message_ids:
+            if self.router._by_message.get(message_id) is self:
+                del self.router._by_message[message_id]
+        self.channel_ids.clear()
+        self.message_ids.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class SessionRouter:
+    """Routes messages and reactions straight to the session that owns them
+
+    Unlike ``Bot.wait_for``, where every pending waiter checks every event,
+    each event costs one dict lookup plus the sessions in its own channel.
+    """
+
+    def __init__(self):
+        self._by_channel = {}
+        self._by_message = {}
+
+    def open(self, channel_id=None, message_id=None):
+        """Start a session, optionally watching a channel and/or a message"""
+        session = GameSession(self)
+        if channel_id is not None:
+            session.watch_channel(channel_id)
+        if message_id is not None:
+            session.watch_message(message_id)
+        return session
+
+    @property
+    def active(self):
+        """Number of channels and messages currently being watched"""
+        return len(self._by_channel), len(self._by_message)
+
+    async def on_message(self, message):
+        sessions = self._by_channel.get(message.channel.id)
+        if sessions and not message.author.bot:
+            for session in sessions:
+                session.queue.put_nowait(('message', message))
+
+    async def on_reaction_add(self, reaction, user):
+        session = self._by_message.get(reaction.message.id)
+        if session and not user.bot:
+            session.queue.put_nowait(('reaction', (reaction, user)))
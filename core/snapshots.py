@@ -0,0 +1,117 @@
+import sys
+import time
+from collections import OrderedDict, deque
+
+# Approximate bytes a snapshot costs besides its strings: the object, its
+# slots, its ints and float, and its share of the deque (measured with tracemalloc)
+SNAPSHOT_OVERHEAD = 300
+MAX_CONTENT = 2000
+
+class MessageSnapshot:
+    """What a message said, kept after the message itself is gone"""
+
+    __slots__ = ('id', 'author_id', 'author_name', 'content', 'attachments', 'created_at', 'edited', 'size')
+
+    def __init__(self, id, author_id, author_name, content, attachments=(), created_at=None, edited=False):
+        self.id = id
+        self.author_id = author_id
+        self.author_name = author_name
+        self.content = content[:MAX_CONTENT]
+        self.attachments = tuple(attachments)
+        self.created_at = created_at if created_at is not None else time.time()
+        self.edited = edited
+        self.size = (SNAPSHOT_OVERHEAD + sys.getsizeof(self.content) + sys.getsizeof(author_name)
+                     + sum(sys.getsizeof(name) for name in self.attachments))
+
+    @classmethod
+    def from_message(cls, message):
+        return cls(
+            message.id,
+            message.author.id,
+            str(message.author),
+            message.content,
+            (attachment.filename for attachment in message.attachments),
+            message.created_at.timestamp(),
+            message.edited_at is not None
+        )
+
+class SnapshotBuffer:
+    """Per-channel ring buffers of message snapshots under one memory budget
+
+    Each channel keeps at most ``per_channel`` snapshots, dropping its
+    oldest. Channels are kept in last-activity order, and while the total
+    size is over ``max_bytes`` the oldest snapshot of the least recently
+    active channel is dropped, so quiet channels give way to busy ones.
+    """
+
+    def __init__(self, per_channel=100, max_bytes=16 * 1024 * 1024):
+        self.per_channel = per_channel
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evicted = 0
+        self._channels = OrderedDict()  # channel_id -> deque of snapshots, oldest first
+
+    def __len__(self):
+        return sum(len(snapshots) for snapshots in self._channels.values())
+
+    @property
+    def channels(self):
+        return len(self._channels)
+
+    def add(self, channel_id, snapshot):
+        snapshots = self._channels.get(channel_id)
+        if snapshots is None:
+            snapshots = self._channels[channel_id] = deque()
+        else:
+            self._channels.move_to_end(channel_id)
+        if len(snapshots) >= self.per_channel:
+            self.size -= snapshots.popleft().size
+        snapshots.append(snapshot)
+        self.size += snapshot.size
+
+        while self.size > self.max_bytes:
+            oldest_channel, oldest = next(iter(self._channels.items()))
+            self.size -= oldest.popleft().size
+            self.evicted += 1
+            if not oldest:
+                del self._channels[oldest_channel]
+
+    def pop(self, channel_id, message_id):
+        """Remove and return a message's snapshot, or None if it isn't buffered"""
+        snapshots = self._channels.get(channel_id)
+        if not snapshots:
+            return None
+        # Deletions are usually of recent messages, so search from the newest end
+        for index in range(len(snapshots) - 1, -1, -1):
+            if snapshots[index].id == message_id:
+                snapshot = snapshots[index]
+                del snapshots[index]
+                self.size -= snapshot.size
+                if not snapshots:
+                    del self._channels[channel_id]
+                return snapshot
+        return None
+
+    def replace(self, channel_id, snapshot):
+        """Swap in a newer snapshot of a buffered message (after an edit), keeping its place"""
+        snapshots = self._channels.get(channel_id)
+        if not snapshots:
+            return
+        for index in range(len(snapshots) - 1, -1, -1):
+            if snapshots[index].id == snapshot.id:
+                self.size += snapshot.size - snapshots[index].size
+                snapshots[index] = snapshot
+                return
+
+    def recent(self, channel_id, limit=None):
+        """A channel's snapshots, newest first"""
+        snapshots = self._channels.get(channel_id, ())
+        newest_first = reversed(snapshots)
+        if limit is None:
+            return list(newest_first)
+        return [snapshot for snapshot, _ in zip(newest_first, range(limit))]
+
+    def drop_channel(self, channel_id):
+        snapshots = self._channels.pop(channel_id, None)
+        if snapshots:
+            self.size -= sum(snapshot.size for snapshot in snapshots)
@@ -0,0 +1,26 @@
+import json
+import os
+from config import Config
+
+def data_path(*parts):
+    """Path inside the bot's data directory, creating parent folders"""
+    path = os.path.join(Config.DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def read_json(path, default=None):
+    """Read a JSON file, returning default if it is missing or corrupt"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+def write_json_atomic(path, data):
+    """Write a JSON file so readers never see a half-written file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,447 @@
+import logging
+
+import discord
+
+from core.bulkactions import run_bounded
+
+logger = logging.getLogger('Templates')
+
+CHANNEL_TYPES = ('category', 'text', 'voice')
+EVERYONE = '@everyone'
+
+class RoleSpec:
+    """A role a template wants; None fields are left as Discord or the live role has them
+
+    ``position`` is only set by backups, whose restores put every role
+    back in its place in the hierarchy.
+    """
+
+    __slots__ = ('key', 'name', 'color', 'hoist', 'mentionable', 'permissions', 'position')
+
+    def __init__(self, key, name, color=None, hoist=None, mentionable=None, permissions=None, position=None):
+        self.key = key
+        self.name = name
+        self.color = color
+        self.hoist = hoist
+        self.mentionable = mentionable
+        self.permissions = permissions
+        self.position = position
+
+class ChannelSpec:
+    """A category or channel a template wants
+
+    ``category`` is the key of its category's spec, and ``overwrites``
+    maps role keys (or ``member:<id>``) to PermissionOverwrites.
+    """
+
+    __slots__ = ('key', 'name', 'type', 'category', 'topic', 'nsfw', 'slowmode', 'overwrites', 'position')
+
+    def __init__(self, key, name, type, category=None, topic=None, nsfw=None, slowmode=None,
+                 overwrites=None, position=None):
+        self.key = key
+        self.name = name
+        self.type = type
+        self.category = category
+        self.topic = topic
+        self.nsfw = nsfw
+        self.slowmode = slowmode
+        self.overwrites = overwrites or {}
+        self.position = position
+
+class GuildTemplate:
+    """Roles, categories and channels, highest role first and channels in display order
+
+    Specs refer to each other by key: the name in a template file, or the
+    original ID in a backup (``by_id``), where live objects are matched
+    by ID before falling back to their name.
+    """
+
+    def __init__(self, roles, channels, by_id=False):
+        self.roles = roles
+        self.channels = channels
+        self.by_id = by_id
+
+def _color(value):
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(str(value).lstrip('#'), 16)
+    except ValueError:
+        raise ValueError(f"invalid color: {value}") from None
+
+def _permissions(value):
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return discord.Permissions(value)
+    unknown = [name for name in value if name not in discord.Permissions.VALID_FLAGS]
+    if unknown:
+        raise ValueError(f"unknown permissions: {', '.join(unknown)}")
+    return discord.Permissions(**{name: True for name in value})
+
+def _overwrite(value):
+    # [allow, deny] bit fields (as backups store them) or {"permission": true/false}
+    if isinstance(value, list) and len(value) == 2:
+        return discord.PermissionOverwrite.from_pair(discord.Permissions(value[0]), discord.Permissions(value[1]))
+    if not isinstance(value, dict):
+        raise ValueError(f"invalid overwrite: {value}")
+    unknown = [name for name in value if name not in discord.Permissions.VALID_FLAGS]
+    if unknown:
+        raise ValueError(f"unknown permissions: {', '.join(unknown)}")
+    return discord.PermissionOverwrite(**value)
+
+def _name(entry, what):
+    name = entry.get('name') if isinstance(entry, dict) else None
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError(f"every {what} needs a name")
+    return name.strip()
+
+def load_template(data):
+    """A GuildTemplate from a parsed template file; raises ValueError if it is malformed
+
+    The format is {"roles": [...], "categories": [{..., "channels": [...]}],
+    "channels": [...]}: see the README for the fields of each.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("a template must be a JSON object")
+
+    roles = []
+    for entry in data.get('roles', []):
+        name = _name(entry, 'role')
+        if any(role.name == name for role in roles):
+            raise ValueError(f"role {name} is listed twice")
+        roles.append(RoleSpec(
+            name, name, _color(entry.get('color')), entry.get('hoist'), entry.get('mentionable'),
+            _permissions(entry.get('permissions'))
+        ))
+
+    channels = []
+    seen = set()
+
+    def add_channel(entry, category, position):
+        name = _name(entry, 'channel')
+        kind = entry.get('type', 'text')
+        if kind not in CHANNEL_TYPES or kind == 'category':
+            raise ValueError(f"channel {name} has unknown type {kind}")
+        key = f"{category}/{name}" if category else name
+        if key in seen:
+            raise ValueError(f"channel {name} is listed twice")
+        seen.add(key)
+        channels.append(ChannelSpec(
+            key, name, kind, category, entry.get('topic'), entry.get('nsfw'), entry.get('slowmode'),
+            {target: _overwrite(value) for target, value in entry.get('overwrites', {}).items()}, position
+        ))
+
+    for position, entry in enumerate(data.get('categories', [])):
+        name = _name(entry, 'category')
+        if f"#{name}" in seen:
+            raise ValueError(f"category {name} is listed twice")
+        seen.add(f"#{name}")
+        channels.append(ChannelSpec(
+            f"#{name}", name, 'category',
+            overwrites={target: _overwrite(value) for target, value in entry.get('overwrites', {}).items()},
+            position=position
+        ))
+        for index, channel in enumerate(entry.get('channels', [])):
+            add_channel(channel, f"#{name}", index)
+    for index, entry in enumerate(data.get('channels', [])):
+        add_channel(entry, None, index)
+    return GuildTemplate(roles, channels)
+
+def channel_type(channel):
+    if isinstance(channel, discord.CategoryChannel):
+        return 'category'
+    if isinstance(channel, discord.VoiceChannel):
+        return 'voice'
+    if isinstance(channel, discord.TextChannel):
+        return 'text'
+    return None
+
+class Step:
+    """One change in a plan: create something, edit the fields in ``changes``, or move a role"""
+
+    __slots__ = ('action', 'spec', 'target', 'changes', 'error')
+
+    def __init__(self, action, spec, target=None, changes=None):
+        self.action = action
+        self.spec = spec
+        self.target = target
+        self.changes = changes or {}
+        self.error = None
+
+    @property
+    def label(self):
+        spec = self.spec
+        if isinstance(spec, RoleSpec):
+            return f"role **{spec.name}**"
+        if spec.type == 'category':
+            return f"category **{spec.name}**"
+        return f"{'🔊' if spec.type == 'voice' else '#'}{spec.name}"
+
+    def describe(self):
+        if self.action == 'create':
+            return f"➕ {self.label}"
+        if self.action == 'move':
+            return f"↕️ {self.label} (position)"
+        return f"✏️ {self.label} ({', '.join(self.changes)})"
+
+class Plan:
+    """What applying a template to a guild would change
+
+    Steps run in dependency order: roles, then categories, then channels.
+    Role moves (backups only) happen in one call after the roles are made.
+    ``resolved`` maps spec keys to the live objects they matched or created.
+    """
+
+    def __init__(self, guild, template):
+        self.guild = guild
+        self.template = template
+        self.roles = []
+        self.moves = []
+        self.categories = []
+        self.channels = []
+        self.unchanged = 0
+        self.resolved = {}
+        self.creating = set()  # keys of the specs being created
+        self._roles_by_name = {}
+        for role in guild.roles:
+            self._roles_by_name.setdefault(role.name, role)
+
+    def __len__(self):
+        return len(self.roles) + len(self.moves) + len(self.categories) + len(self.channels)
+
+    @property
+    def steps(self):
+        return self.roles + self.moves + self.categories + self.channels
+
+    def drop_updates(self):
+        """Only create what's missing, leaving existing roles and channels as they are; returns how many edits were dropped"""
+        dropped = 0
+        for steps in (self.roles, self.moves, self.categories, self.channels):
+            kept = [step for step in steps if step.action == 'create']
+            dropped += len(steps) - len(kept)
+            steps[:] = kept
+        self.unchanged += dropped
+        return dropped
+
+    def role(self, key):
+        if key == EVERYONE:
+            return self.guild.default_role
+        role = self.resolved.get(key)
+        if role is None and self.template.by_id and key.isdigit():
+            role = self.guild.get_role(int(key))
+        if role is None and not self.template.by_id:
+            role = self._roles_by_name.get(key)
+        return role
+
+    def overwrite_target(self, key):
+        if key.startswith('member:'):
+            member_id = int(key[7:])
+            return self.guild.get_member(member_id) or discord.Object(member_id, type=discord.Member)
+        return self.role(key)
+
+    def overwrites(self, spec, channel=None):
+        """A channel's overwrites with the spec's applied on top; targets that don't exist are left out"""
+        overwrites = dict(channel.overwrites) if channel is not None else {}
+        for key, overwrite in spec.overwrites.items():
+            target = self.overwrite_target(key)
+            if target is not None:
+                overwrites[target] = overwrite
+        return overwrites
+
+def _role_changes(spec, role):
+    # Names only differ when matched by ID, i.e. a backup restoring a renamed role
+    changes = {'name': spec.name} if role.name != spec.name else {}
+    if spec.color is not None and role.color.value != spec.color:
+        changes['color'] = spec.color
+    if spec.hoist is not None and role.hoist != spec.hoist:
+        changes['hoist'] = spec.hoist
+    if spec.mentionable is not None and role.mentionable != spec.mentionable:
+        changes['mentionable'] = spec.mentionable
+    if spec.permissions is not None and role.permissions != spec.permissions:
+        changes['permissions'] = spec.permissions
+    return changes
+
+def _channel_changes(plan, spec, channel):
+    changes = {'name': spec.name} if channel.name != spec.name else {}
+    if spec.type == 'text':
+        if spec.topic is not None and (channel.topic or '') != spec.topic:
+            changes['topic'] = spec.topic
+        if spec.slowmode is not None and channel.slowmode_delay != spec.slowmode:
+            changes['slowmode_delay'] = spec.slowmode
+    if spec.nsfw is not None and spec.type != 'category' and channel.nsfw != spec.nsfw:
+        changes['nsfw'] = spec.nsfw
+    # Channels are only moved into a category the template names, never out of one
+    if spec.category is not None:
+        category = plan.resolved.get(spec.category)
+        if category is None or channel.category_id != category.id:
+            changes['category'] = spec.category
+    for key, overwrite in spec.overwrites.items():
+        target = plan.overwrite_target(key)
+        # Overwrites for roles that neither exist nor are being created are skipped
+        changed = key in plan.creating if target is None else channel.overwrites_for(target) != overwrite
+        if changed:
+            changes['overwrites'] = spec.overwrites
+            break
+    return changes
+
+def plan_template(guild, template):
+    """Diff a template against a guild's live roles and channels"""
+    plan = Plan(guild, template)
+
+    for spec in template.roles:
+        role = plan.role(spec.key)
+        if role is None and template.by_id:
+            role = plan._roles_by_name.get(spec.name)
+        if role is None:
+            plan.roles.append(Step('create', spec))
+            plan.creating.add(spec.key)
+            continue
+        plan.resolved[spec.key] = role
+        changes = _role_changes(spec, role)
+        if changes:
+            plan.roles.append(Step('update', spec, role, changes))
+        else:
+            plan.unchanged += 1
+
+    if template.by_id:
+        specs = {role.id: spec for spec, role in _resolved_roles(plan)}
+        updated = {step.target.id for step in plan.roles if step.action == 'update'}
+        for role, position in _role_positions(plan, []).items():
+            if role.position != position and role.id in specs:
+                plan.moves.append(Step('move', specs[role.id], role, {'position': position}))
+                if role.id not in updated:
+                    plan.unchanged -= 1
+
+    # Channels are matched by ID (backups), then by type and name, preferring one in the right category
+    by_name = {}
+    for channel in guild.channels:
+        by_name.setdefault((channel_type(channel), channel.name), []).append(channel)
+    claimed = set()
+    for spec in sorted(template.channels, key=lambda spec: spec.type != 'category'):
+        channel = guild.get_channel(int(spec.key)) if template.by_id and spec.key.isdigit() else None
+        if channel is None or channel.id in claimed or channel_type(channel) != spec.type:
+            candidates = [c for c in by_name.get((spec.type, spec.name), ()) if c.id not in claimed]
+            category = plan.resolved.get(spec.category)
+            channel = next((c for c in candidates if category and c.category_id == category.id), None)
+            channel = channel or (candidates[0] if candidates else None)
+        steps = plan.categories if spec.type == 'category' else plan.channels
+        if channel is None:
+            steps.append(Step('create', spec))
+            plan.creating.add(spec.key)
+            continue
+        claimed.add(channel.id)
+        plan.resolved[spec.key] = channel
+        changes = _channel_changes(plan, spec, channel)
+        if changes:
+            steps.append(Step('update', spec, channel, changes))
+        else:
+            plan.unchanged += 1
+    return plan
+
+def _create_fields(spec):
+    if isinstance(spec, RoleSpec):
+        fields = {'color': spec.color, 'hoist': spec.hoist, 'mentionable': spec.mentionable,
+                  'permissions': spec.permissions}
+    else:
+        fields = {'position': spec.position, 'overwrites': spec.overwrites or None}
+        if spec.type != 'category':
+            fields.update(category=spec.category, nsfw=spec.nsfw)
+        if spec.type == 'text':
+            fields.update(topic=spec.topic, slowmode_delay=spec.slowmode)
+    return {name: value for name, value in fields.items() if value is not None}
+
+async def _execute(plan, step, reason):
+    guild = plan.guild
+    spec = step.spec
+    fields = _create_fields(spec) if step.action == 'create' else dict(step.changes)
+    if 'overwrites' in fields:
+        fields['overwrites'] = plan.overwrites(spec, step.target)
+    if 'category' in fields:
+        fields['category'] = plan.resolved.get(fields['category'])  # None if creating it failed
+
+    if isinstance(spec, RoleSpec):
+        if step.action == 'create':
+            return await guild.create_role(name=spec.name, reason=reason, **fields)
+    elif step.action == 'create':
+        create = {
+            'category': guild.create_category,
+            'text': guild.create_text_channel,
+            'voice': guild.create_voice_channel,
+        }[spec.type]
+        return await create(spec.name, reason=reason, **fields)
+    await step.target.edit(reason=reason, **fields)
+    return step.target
+
+def _resolved_roles(plan):
+    return [(spec, plan.resolved[spec.key]) for spec in plan.template.roles if spec.key in plan.resolved]
+
+def _role_positions(plan, created):
+    """Positions for every role the bot can move that put the backup's roles back in their order
+
+    The backup's roles are sorted by their saved positions into the slots
+    they hold now; roles the backup doesn't know keep their places. Only
+    roles below the bot's top role can be moved. ``created`` roles were
+    just made, so they sit at the bottom even if the cache hasn't caught up.
+    """
+    me = plan.guild.me
+    top = me.top_role.position if me else float('inf')
+    created_ids = {role.id for role in created}
+    roles = {role.id: role for role in plan.guild.roles}
+    roles.update((role.id, role) for role in created)
+    movable = sorted(
+        (role for role in roles.values() if not role.is_default() and 0 < role.position < top),
+        key=lambda role: (role.id not in created_ids, role.position)
+    )
+    saved = {role.id: spec.position for spec, role in _resolved_roles(plan)}
+    slots = [index for index, role in enumerate(movable) if role.id in saved]
+    ordered = sorted((role for role in movable if role.id in saved), key=lambda role: saved[role.id])
+    for index, role in zip(slots, ordered):
+        movable[index] = role
+    return {role: index + 1 for index, role in enumerate(movable)}
+
+async def _order_roles(plan, created, reason):
+    """One bulk call that puts new roles in template order, or a backup's whole hierarchy back"""
+    if plan.template.by_id:
+        positions = _role_positions(plan, created)
+        if not plan.moves and not created:
+            return
+    elif len(created) >= 2:
+        # New roles all land just above @everyone, so they hold the bottom positions
+        positions = {role: len(created) - index for index, role in enumerate(created)}
+    else:
+        return
+    try:
+        await plan.guild.edit_role_positions(positions, reason=reason)
+    except discord.HTTPException as e:
+        logger.warning(f"Could not order the roles in {plan.guild.name}: {e}")
+        for step in plan.moves:
+            step.error = str(e)
+
+async def apply_plan(plan, concurrency=5, reason="Server template", on_progress=None):
+    """Run a plan's steps, each phase concurrently; failed steps keep their error
+
+    Returns how many steps failed. A step whose dependency failed still
+    runs without it (a channel whose category couldn't be made is created
+    outside any category).
+    """
+    done = 0
+    for phase in (plan.roles, plan.categories, plan.channels):
+        if phase:
+            async def run(step):
+                plan.resolved[step.spec.key] = step.target = await _execute(plan, step, reason)
+
+            async def progress(count, offset=done):
+                await on_progress(offset + count)
+
+            results = await run_bounded(phase, run, concurrency=concurrency,
+                                        on_progress=progress if on_progress else None)
+            for step, error in results.items():
+                if error is not None:
+                    step.error = str(error)
+                    logger.warning(f"Template step failed in {plan.guild.name}: {step.describe()}: {error!r}")
+            done += len(phase)
+        if phase is plan.roles:
+            created = [step.target for step in plan.roles if step.action == 'create' and step.error is None]
+            await _order_roles(plan, created, reason)
+    return sum(step.error is not None for step in plan.steps)
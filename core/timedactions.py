@@ -0,0 +1,280 @@
+import asyncio
+import heapq
+import json
+import logging
+import re
+import sqlite3
+import time
+
+import discord
+
+logger = logging.getLogger('TimedActions')
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+DURATION_PART = re.compile(r'(\d+)([smhdw])')
+MAX_ATTEMPTS = 5
+
+def parse_duration(text):
+    """Seconds in a duration like 30m, 2d or 1d12h; raises ValueError"""
+    text = text.lower().strip()
+    parts = DURATION_PART.findall(text)
+    if not parts or ''.join(value + unit for value, unit in parts) != text:
+        raise ValueError(f"invalid duration: {text}")
+    seconds = sum(int(value) * DURATION_UNITS[unit] for value, unit in parts)
+    if seconds <= 0:
+        raise ValueError("duration must be positive")
+    return seconds
+
+def format_duration(seconds):
+    """Largest two units of a duration, e.g. 1d 12h"""
+    seconds = int(seconds)
+    parts = []
+    for unit, size in (('d', 86400), ('h', 3600), ('m', 60), ('s', 1)):
+        if seconds >= size:
+            parts.append(f"{seconds // size}{unit}")
+            seconds %= size
+    return ' '.join(parts[:2]) or '0s'
+
+class TimedAction:
+    """A moderation action to undo at ``expires_at`` (a Unix time)
+
+    ``target_id`` is the member, user or channel acted on; ``subject_id``
+    optionally narrows it (the role of a temporary role).
+    """
+
+    __slots__ = ('id', 'kind', 'guild_id', 'target_id', 'subject_id', 'expires_at', 'data', 'attempts')
+
+    def __init__(self, id, kind, guild_id, target_id, subject_id, expires_at, data=None, attempts=0):
+        self.id = id
+        self.kind = kind
+        self.guild_id = guild_id
+        self.target_id = target_id
+        self.subject_id = subject_id
+        self.expires_at = expires_at
+        self.data = data or {}
+        self.attempts = attempts
+
+    @property
+    def key(self):
+        return (self.kind, self.guild_id, self.target_id, self.subject_id)
+
+class TimedActionScheduler:
+    """Durable timed actions run by one task off a min-heap of expiries
+
+    Actions are stored in SQLite and loaded back on startup. Kinds are
+    handled by async callables registered by the cogs that create them.
+    Due actions run one at a time, at most ``rate`` per second, so a
+    backlog after downtime drains steadily instead of all at once. A
+    failed action is retried with backoff; one that can no longer apply
+    (missing guild, member or permission) is dropped.
+    """
+
+    def __init__(self, bot, db_path, rate=2.0):
+        self.bot = bot
+        self.db_path = db_path
+        self.rate = rate
+        self.handlers = {}  # kind -> async callable(guild, action)
+        self.actions = {}  # id -> TimedAction
+        self.completed = 0
+        self.failed = 0
+        self._keys = {}  # (kind, guild_id, target_id, subject_id) -> id, one pending action per target
+        self._heap = []  # (expires_at, id); entries of cancelled actions are skipped when popped
+        self._wakeup = asyncio.Event()
+        self._io_lock = asyncio.Lock()
+        self._db = None
+        self._task = None
+
+    def __len__(self):
+        return len(self.actions)
+
+    def register_handler(self, kind, func):
+        self.handlers[kind] = func
+
+    def unregister_handler(self, kind):
+        self.handlers.pop(kind, None)
+
+    def _open(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS actions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                guild_id INTEGER NOT NULL,
+                target_id INTEGER NOT NULL,
+                subject_id INTEGER,
+                expires_at REAL NOT NULL,
+                data TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        return [
+            TimedAction(id, kind, guild_id, target_id, subject_id, expires_at, json.loads(data), attempts)
+            for id, kind, guild_id, target_id, subject_id, expires_at, data, attempts in self._db.execute(
+                "SELECT id, kind, guild_id, target_id, subject_id, expires_at, data, attempts FROM actions"
+            )
+        ]
+
+    def _insert(self, action, replaced_id):
+        with self._db:
+            if replaced_id is not None:
+                self._db.execute("DELETE FROM actions WHERE id = ?", (replaced_id,))
+            cursor = self._db.execute(
+                "INSERT INTO actions (kind, guild_id, target_id, subject_id, expires_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (action.kind, action.guild_id, action.target_id, action.subject_id, action.expires_at,
+                 json.dumps(action.data))
+            )
+        return cursor.lastrowid
+
+    def _delete(self, action_id):
+        with self._db:
+            self._db.execute("DELETE FROM actions WHERE id = ?", (action_id,))
+
+    def _reschedule(self, action):
+        with self._db:
+            self._db.execute("UPDATE actions SET expires_at = ?, attempts = ? WHERE id = ?",
+                             (action.expires_at, action.attempts, action.id))
+
+    async def _write(self, func, *args):
+        async with self._io_lock:
+            return await asyncio.to_thread(func, *args)
+
+    async def start(self):
+        """Load pending actions and start the scheduler task"""
+        actions = await asyncio.to_thread(self._open)
+        for action in actions:
+            self._track(action)
+        heapq.heapify(self._heap)
+        overdue = sum(action.expires_at <= time.time() for action in actions)
+        logger.info(f"Loaded {len(actions)} timed actions ({overdue} overdue)")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._db:
+            async with self._io_lock:
+                await asyncio.to_thread(self._db.close)
+            self._db = None
+
+    def _track(self, action):
+        self.actions[action.id] = action
+        self._keys[action.key] = action.id
+        self._heap.append((action.expires_at, action.id))
+
+    def _forget(self, action):
+        self.actions.pop(action.id, None)
+        if self._keys.get(action.key) == action.id:
+            del self._keys[action.key]
+
+    def _push(self, action):
+        heapq.heappush(self._heap, (action.expires_at, action.id))
+        # Wake the task if this is now the earliest expiry
+        if self._heap[0][1] == action.id:
+            self._wakeup.set()
+
+    async def schedule(self, kind, guild_id, target_id, duration, subject_id=None, **data):
+        """Schedule an action duration seconds from now, replacing one for the same target"""
+        action = TimedAction(None, kind, guild_id, target_id, subject_id, time.time() + duration, data)
+        # Looked up under the lock, so concurrent calls for one key replace each other instead of both inserting
+        async with self._io_lock:
+            replaced = self.actions.get(self._keys.get(action.key))
+            action.id = await asyncio.to_thread(self._insert, action, replaced.id if replaced else None)
+            if replaced:
+                self._forget(replaced)
+            self.actions[action.id] = action
+            self._keys[action.key] = action.id
+        self._push(action)
+        return action
+
+    def get(self, kind, guild_id, target_id, subject_id=None):
+        return self.actions.get(self._keys.get((kind, guild_id, target_id, subject_id)))
+
+    async def cancel(self, action):
+        """Drop a pending action without running it"""
+        if self.actions.get(action.id) is not action:
+            return False
+        self._forget(action)
+        await self._write(self._delete, action.id)
+        return True
+
+    def pending(self, guild_id=None):
+        """Pending actions, soonest first"""
+        actions = [action for action in self.actions.values() if guild_id is None or action.guild_id == guild_id]
+        return sorted(actions, key=lambda action: action.expires_at)
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        interval = 1 / self.rate
+        failures = 0
+        while True:
+            try:
+                await self._step(interval)
+                failures = 0
+            except Exception:
+                # The only scheduler task must survive, or nothing expires until a restart
+                failures += 1
+                delay = min(60, 2 ** failures)
+                logger.exception(f"Timed action scheduler failed, retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def _step(self, interval):
+        """Wait for the next due action and run it"""
+        # Skip heap entries of cancelled or rescheduled actions
+        while self._heap:
+            expires_at, action_id = self._heap[0]
+            action = self.actions.get(action_id)
+            if action is not None and action.expires_at == expires_at:
+                break
+            heapq.heappop(self._heap)
+
+        self._wakeup.clear()
+        delay = self._heap[0][0] - time.time() if self._heap else None
+        if delay is None or delay > 0:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        _, action_id = heapq.heappop(self._heap)
+        await self._execute(self.actions[action_id])
+        await asyncio.sleep(interval)
+
+    async def _execute(self, action):
+        handler = self.handlers.get(action.kind)
+        guild = self.bot.get_guild(action.guild_id)
+        try:
+            if guild is None:
+                logger.info(f"Dropping {action.kind} #{action.id}: no longer in guild {action.guild_id}")
+            elif handler is None:
+                # The cog that handles it is being reloaded or was unloaded; try again later
+                await self._retry(action, 60, count_attempt=False)
+                return
+            else:
+                await handler(guild, action)
+                self.completed += 1
+        except (discord.NotFound, discord.Forbidden) as e:
+            self.failed += 1
+            logger.warning(f"Dropping {action.kind} #{action.id} in {guild}: {e}")
+        except Exception as e:
+            if action.attempts + 1 < MAX_ATTEMPTS:
+                logger.warning(f"{action.kind} #{action.id} failed, retrying: {e!r}")
+                await self._retry(action, 60 * 2 ** action.attempts)
+                return
+            self.failed += 1
+            logger.error(f"Giving up on {action.kind} #{action.id} after {MAX_ATTEMPTS} attempts: {e!r}")
+
+        self._forget(action)
+        await self._write(self._delete, action.id)
+
+    async def _retry(self, action, delay, count_attempt=True):
+        action.expires_at = time.time() + delay
+        action.attempts += count_attempt
+        # Queued first, so the retry still happens in this run if saving it fails
+        self._push(action)
+        await self._write(self._reschedule, action)
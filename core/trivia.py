@@ -0,0 +1,242 @@
+import json
+import logging
+import math
+import mmap
+import os
+import random
+import re
+import unicodedata
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from core.storage import read_json, write_json_atomic
+
+logger = logging.getLogger('Trivia')
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+INDEX_VERSION = 2
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_ARTICLES = re.compile(r"^(the|a|an)\s+")
+# Words a guess may add around the answer, e.g. "it's minecraft" (normalised, so "its")
+FILLER_WORDS = frozenset({'its', 'it', 'is', 'was', 'the', 'a', 'an', 'i', 'think'})
+
+def normalize_answer(text):
+    """Normalise an answer for comparison: no accents, case, punctuation or leading article"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = _PUNCTUATION.sub('', text)
+    text = ' '.join(text.split())
+    return _ARTICLES.sub('', text)
+
+def validate_question(data):
+    """Raise ValueError if a bank entry can't be turned into a TriviaQuestion"""
+    if not isinstance(data, dict):
+        raise ValueError("not an object")
+    for key in ('question', 'answer'):
+        if not isinstance(data.get(key), str) or not data[key].strip():
+            raise ValueError(f"missing {key}")
+    for key in ('difficulty', 'category'):
+        if not isinstance(data.get(key, ''), str):
+            raise ValueError(f"{key} isn't a string")
+    aliases = data.get('aliases', [])
+    if not isinstance(aliases, list) or not all(isinstance(a, str) for a in aliases):
+        raise ValueError("aliases isn't a list of strings")
+
+class TriviaQuestion:
+    """A parsed question with its answers pre-normalised for matching"""
+
+    __slots__ = ('question', 'answer', 'difficulty', 'category', 'normalized_answers')
+
+    def __init__(self, data):
+        self.question = data['question']
+        self.answer = data['answer']
+        self.difficulty = data.get('difficulty', 'easy')
+        self.category = data.get('category', 'general')
+        answers = [self.answer] + list(data.get('aliases', []))
+        self.normalized_answers = tuple({normalize_answer(a) for a in answers if a})
+
+    def check(self, guess, threshold=0.85):
+        """Check a guess with fuzzy matching against the accepted answers"""
+        guess = normalize_answer(guess)
+        if not guess:
+            return False
+        if guess in self.normalized_answers:
+            return True
+
+        guess_words = set(guess.split())
+        for answer in self.normalized_answers:
+            # "it's minecraft" style guesses: every answer word plus only filler words,
+            # so listing several candidates ("1992 1993 1994") doesn't count
+            answer_words = set(answer.split())
+            if guess_words >= answer_words and guess_words - answer_words <= FILLER_WORDS:
+                return True
+            if SequenceMatcher(None, guess, answer).ratio() >= threshold:
+                return True
+        return False
+
+class ShuffleCursor:
+    """Walks a bucket in a random order without repeats, using O(1) memory
+
+    The order is an affine permutation ``(a * i + b) mod n`` with a coprime to
+    n, so no per-channel copy of a 100k entry bucket is needed. A new
+    permutation is drawn once every question has been asked.
+    """
+
+    __slots__ = ('size', 'step', 'offset', 'position')
+
+    def __init__(self, size):
+        self.size = size
+        self.reseed()
+
+    def reseed(self):
+        self.position = 0
+        self.offset = random.randrange(self.size)
+        self.step = 1
+        if self.size > 2:
+            while True:
+                self.step = random.randrange(1, self.size)
+                if math.gcd(self.step, self.size) == 1:
+                    break
+
+    def next(self):
+        if self.position >= self.size:
+            self.reseed()
+        index = (self.step * self.position + self.offset) % self.size
+        self.position += 1
+        return index
+
+class QuestionBank:
+    """Trivia questions indexed by difficulty and category
+
+    Questions are read from a JSON lines file. Only byte offsets are kept in
+    memory, grouped by (difficulty, category); a question is parsed when it is
+    chosen. The offset index is cached next to the bank and rebuilt when the
+    bank changes. Without a bank file, the built-in questions are used.
+    """
+
+    def __init__(self, path, fallback_questions=(), cache_size=1024, max_cursors=10000):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.fallback = [TriviaQuestion(q) for q in fallback_questions]
+        self.buckets = {}
+        self.categories = set()
+        self._mmap = None
+        self._file = None
+        self._parsed = OrderedDict()
+        self._cache_size = cache_size
+        self._cursors = OrderedDict()
+        self._max_cursors = max_cursors
+
+    def __len__(self):
+        return sum(len(refs) for (difficulty, category), refs in self.buckets.items() if category is None)
+
+    def load(self):
+        """Load (or build) the offset index; blocking, run it in a thread"""
+        self.close()
+        if os.path.exists(self.path):
+            stat = os.stat(self.path)
+            index = read_json(self.index_path)
+            if not index or index.get('version') != INDEX_VERSION or \
+                    index.get('size') != stat.st_size or index.get('mtime') != stat.st_mtime:
+                index = self._build_index(stat)
+            buckets = index['buckets']
+
+            if stat.st_size:
+                self._file = open(self.path, 'rb')
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buckets = {}
+            for ref, question in enumerate(self.fallback):
+                buckets.setdefault(f"{question.difficulty}|{question.category}", []).append(ref)
+
+        self.buckets = {}
+        self.categories = set()
+        for key, refs in buckets.items():
+            difficulty, category = key.split('|', 1)
+            self.categories.add(category)
+            self.buckets[(difficulty, category)] = refs
+            self.buckets.setdefault((difficulty, None), []).extend(refs)
+
+        self._parsed.clear()
+        self._cursors.clear()
+        logger.info(f"Loaded {len(self)} trivia questions in {len(self.categories)} categories")
+
+    def _build_index(self, stat):
+        buckets = {}
+        skipped = 0
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    # Bad lines never get an offset, so get() only parses entries that were checked here
+                    try:
+                        data = json.loads(line)
+                        validate_question(data)
+                    except ValueError as e:
+                        skipped += 1
+                        if skipped <= 10:
+                            logger.warning(f"Skipping trivia line {number}: {e}")
+                    else:
+                        key = f"{data.get('difficulty', 'easy').lower()}|{data.get('category', 'general').lower()}"
+                        buckets.setdefault(key, []).append(offset)
+                offset += len(line)
+
+        if skipped:
+            logger.warning(f"Skipped {skipped} malformed trivia lines")
+
+        index = {'version': INDEX_VERSION, 'size': stat.st_size, 'mtime': stat.st_mtime, 'buckets': buckets}
+        write_json_atomic(self.index_path, index)
+        logger.info(f"Built trivia index for {self.path}")
+        return index
+
+    def close(self):
+        if self._mmap:
+            self._mmap.close()
+            self._file.close()
+        self._mmap = None
+        self._file = None
+
+    def get(self, ref):
+        """Parse the question at a reference (byte offset or fallback index)"""
+        if self._mmap is None:
+            return self.fallback[ref]
+
+        question = self._parsed.get(ref)
+        if question is None:
+            end = self._mmap.find(b'\n', ref)
+            question = TriviaQuestion(json.loads(self._mmap[ref:end if end != -1 else None]))
+            self._parsed[ref] = question
+            if len(self._parsed) > self._cache_size:
+                self._parsed.popitem(last=False)
+        else:
+            self._parsed.move_to_end(ref)
+        return question
+
+    def route(self, difficulty, category=None):
+        """Pick the bucket for a request, falling back to other difficulties"""
+        key = (difficulty, category)
+        if self.buckets.get(key):
+            return key
+        for other in DIFFICULTIES:
+            if self.buckets.get((other, category)):
+                return other, category
+        return None
+
+    def pick(self, channel_id, difficulty, category=None):
+        """Next unasked question for a channel, or None if nothing matches"""
+        key = self.route(difficulty, category)
+        if key is None:
+            return None
+
+        refs = self.buckets[key]
+        cursor_key = (channel_id, key)
+        cursor = self._cursors.get(cursor_key)
+        if cursor is None or cursor.size != len(refs):
+            cursor = ShuffleCursor(len(refs))
+            self._cursors[cursor_key] = cursor
+            if len(self._cursors) > self._max_cursors:
+                self._cursors.popitem(last=False)
+        else:
+            self._cursors.move_to_end(cursor_key)
+
+        return self.get(refs[cursor.next()])
@@ -0,0 +1,206 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageOps
+except ImportError:  # Pillow is optional; without it only text welcomes are sent
+    Image = None
+
+logger = logging.getLogger('WelcomeCards')
+
+CARD_SIZE = (900, 300)
+AVATAR_SIZE = 200
+
+# Per-worker state, set by _init_worker in each pool process
+_font_path = None
+_background_path = None
+
+def _init_worker(font_path, background_path):
+    global _font_path, _background_path
+    _font_path = font_path
+    _background_path = background_path
+
+@lru_cache(maxsize=8)
+def _font(size):
+    try:
+        return ImageFont.truetype(_font_path, size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+@lru_cache(maxsize=1)
+def _background():
+    """The card background, loaded or drawn once per worker"""
+    if _background_path:
+        try:
+            with Image.open(_background_path) as image:
+                return ImageOps.fit(image.convert('RGB'), CARD_SIZE)
+        except OSError:
+            pass
+    # Dark blue gradient, lighter towards the right
+    gradient = Image.linear_gradient('L').rotate(90).resize(CARD_SIZE)
+    return ImageOps.colorize(gradient, black=(24, 26, 48), white=(30, 100, 180))
+
+@lru_cache(maxsize=1)
+def _avatar_mask():
+    mask = Image.new('L', (AVATAR_SIZE * 4, AVATAR_SIZE * 4), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, AVATAR_SIZE * 4, AVATAR_SIZE * 4), fill=255)
+    # Drawn at 4x and scaled down for a smooth edge
+    return mask.resize((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+
+def _fit_text(draw, text, size, max_width):
+    """The largest font (down to half size) that fits, truncating if needed"""
+    for font_size in range(size, size // 2, -4):
+        font = _font(font_size)
+        if draw.textlength(text, font=font) <= max_width:
+            return text, font
+    font = _font(size // 2)
+    while text and draw.textlength(text + '…', font=font) > max_width:
+        text = text[:-1]
+    return text + '…', font
+
+def _warm():
+    """Load fonts and the background so the first join isn't slow"""
+    _background()
+    _avatar_mask()
+    _font(56)
+
+def render_card(avatar, name, guild_name, member_count):
+    """Render a welcome card as PNG bytes; runs in a pool process"""
+    card = _background().copy()
+    draw = ImageDraw.Draw(card)
+
+    top = (CARD_SIZE[1] - AVATAR_SIZE) // 2
+    if avatar:
+        with Image.open(io.BytesIO(avatar)) as image:
+            image = ImageOps.fit(image.convert('RGB'), (AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+        draw.ellipse((36, top - 4, 44 + AVATAR_SIZE, top + AVATAR_SIZE + 4), fill=(255, 255, 255))
+        card.paste(image, (40, top), _avatar_mask())
+
+    left = 80 + AVATAR_SIZE
+    width = CARD_SIZE[0] - left - 40
+    text, font = _fit_text(draw, f"Welcome, {name}!", 56, width)
+    draw.text((left, 70), text, font=font, fill=(255, 255, 255))
+    text, font = _fit_text(draw, f"to {guild_name}", 36, width)
+    draw.text((left, 150), text, font=font, fill=(200, 215, 240))
+    draw.text((left, 205), f"Member #{member_count:,}", font=_font(32), fill=(255, 215, 0))
+
+    output = io.BytesIO()
+    card.save(output, 'PNG', optimize=False)
+    return output.getvalue()
+
+class WelcomeCardRenderer:
+    """Renders welcome cards in a process pool without blocking the bot
+
+    Avatars are fetched once and kept in an LRU cache. ``render`` returns
+    None instead of a card when Pillow is missing, a render fails or times
+    out, or too many renders are already queued (a join burst), so callers
+    can fall back to the text welcome. The timeout covers the avatar
+    download as well as the render, and a render that timed out still
+    counts as pending until its worker is done with it.
+    """
+
+    def __init__(self, workers=2, max_pending=4, timeout=5.0, avatar_cache_size=256,
+                 font_path=None, background_path=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.avatar_cache_size = avatar_cache_size
+        self.font_path = font_path
+        self.background_path = background_path
+        self.pending = 0
+        self.rendered = 0
+        self.degraded = 0
+        self._avatars = OrderedDict()  # avatar key -> PNG bytes
+        self._executor = None
+
+    @property
+    def available(self):
+        return Image is not None
+
+    def start(self):
+        if not self.available or self._executor:
+            return
+        # Spawned workers don't inherit the bot's threads, sockets or event loop
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.font_path, self.background_path)
+        )
+        for _ in range(self.workers):
+            self._executor.submit(_warm)
+        logger.info(f"Started {self.workers} welcome card workers")
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def avatar_bytes(self, member):
+        asset = member.display_avatar.with_static_format('png').with_size(256)
+        data = self._avatars.get(asset.key)
+        if data is not None:
+            self._avatars.move_to_end(asset.key)
+            return data
+
+        data = await asset.read()
+        self._avatars[asset.key] = data
+        if len(self._avatars) > self.avatar_cache_size:
+            self._avatars.popitem(last=False)
+        return data
+
+    async def render(self, member):
+        """PNG bytes of a member's welcome card, or None to fall back to text"""
+        if not self._executor or self.pending >= self.max_pending:
+            self.degraded += 1
+            return None
+
+        # A slot is held until the worker is done with the card, even if we stopped waiting for it
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        submitted = False
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:  # The loop closed during shutdown
+                pass
+
+        async def fetch_and_render():
+            nonlocal submitted
+            avatar = await self.avatar_bytes(member)
+            future = self._executor.submit(
+                render_card, avatar, member.display_name, member.guild.name, member.guild.member_count or 0
+            )
+            submitted = True
+            future.add_done_callback(release)
+            return await asyncio.wrap_future(future)
+
+        try:
+            # The avatar download counts against the timeout too
+            card = await asyncio.wait_for(fetch_and_render(), timeout=self.timeout)
+        except BrokenProcessPool:
+            logger.error("Welcome card worker died, restarting the pool")
+            self.close()
+            self.start()
+            self.degraded += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Could not render welcome card for {member}: {e!r}")
+            self.degraded += 1
+            return None
+        finally:
+            if not submitted:
+                self.pending -= 1
+
+        self.rendered += 1
+        return card
+
+    def _release(self):
+        self.pending -= 1
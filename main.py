@@ -2,9 +2,20 @@ import discord
 from discord.ext import commands, tasks
 import logging
 import asyncio
+import io
+import os
+import signal
 import sys
+import time
 from datetime import datetime
 from config import Config
+from core.scheduler import MaintenanceScheduler, cooperative
+from core.presence import OnlineIndex
+from core.ratelimit import CommandLimiter
+from core.sessions import SessionRouter
+from core.timedactions import TimedActionScheduler
+from core.welcomecard import WelcomeCardRenderer
+from core.storage import data_path, read_json, write_json_atomic
 
 # Configure logging
 logging.basicConfig(
@@ -26,26 +37,96 @@ class GamingCommunityBot(commands.Bot):
         intents.guilds = True
         intents.guild_messages = True
         intents.guild_reactions = True
+        intents.presences = Config.PRESENCE_INTENT
+        
+        self.member_cache_flags = self.build_member_cache_flags(Config.MEMBER_CACHE)
         
         super().__init__(
             command_prefix=Config.BOT_PREFIX,
             case_insensitive=True,
             intents=intents,
-            help_command=None
+            help_command=None,
+            member_cache_flags=self.member_cache_flags,
+            chunk_guilds_at_startup=Config.MEMBER_CHUNKING == 'startup' and self.member_cache_flags.joined,
+            enable_raw_presences=Config.PRESENCE_INTENT
         )
         
         self.start_time = datetime.now()
+        self._chunk_locks = {}
+        self.maintenance = MaintenanceScheduler()
+        self.sessions = SessionRouter()
+        self.presence = OnlineIndex()
+        self.limiter = CommandLimiter(
+            {'user': Config.RATE_LIMIT_USER, 'channel': Config.RATE_LIMIT_CHANNEL, 'guild': Config.RATE_LIMIT_GUILD},
+            Config.COMMAND_COSTS,
+            max_buckets=Config.RATE_LIMIT_MAX_BUCKETS
+        )
+        # Runs after a command's own checks, so commands that fail them cost nothing
+        self.before_invoke(self.charge_rate_limit)
+        self.welcome_cards = WelcomeCardRenderer(
+            workers=Config.WELCOME_CARD_WORKERS,
+            max_pending=Config.WELCOME_CARD_MAX_PENDING,
+            timeout=Config.WELCOME_CARD_TIMEOUT,
+            avatar_cache_size=Config.WELCOME_AVATAR_CACHE_SIZE,
+            font_path=Config.WELCOME_CARD_FONT,
+            background_path=Config.WELCOME_CARD_BACKGROUND
+        )
+        # Tempbans, temporary roles and timed locks; cogs register a handler per kind
+        self.timed_actions = TimedActionScheduler(self, data_path('timed_actions.db'), rate=Config.TIMED_ACTIONS_PER_SECOND)
+        self.flush_hooks = {}
+        self._flushed = False
+        self.restoring = set()  # cogs whose state is carried across the reload in progress
+        
+        # A clean marker means the last run flushed its state, so recovery scans can be skipped
+        self.clean_start = self.consume_clean_marker()
+    
+    @staticmethod
+    def build_member_cache_flags(policy):
+        """Build the member cache flags for a MEMBER_CACHE policy"""
+        if policy == 'none':
+            return discord.MemberCacheFlags.none()
+        if policy == 'joined':
+            return discord.MemberCacheFlags.only_joined()
+        if policy == 'voice':
+            flags = discord.MemberCacheFlags.none()
+            flags.voice = True
+            return flags
+        return discord.MemberCacheFlags.all()
+    
+    async def get_members(self, guild):
+        """Get all members of a guild, chunking or fetching them on demand"""
+        if guild.chunked:
+            return guild.members
+        
+        # Only one chunk request per guild at a time; concurrent callers share it
+        lock = self._chunk_locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            if guild.chunked:
+                return guild.members
+            
+            # Lazy chunking keeps the result in the cache, otherwise it is fetched and dropped
+            cache = Config.MEMBER_CHUNKING == 'lazy' and self.member_cache_flags.joined
+            members = await guild.chunk(cache=cache)
+            logger.info(f"Fetched {len(members)} members for {guild.name} (cached: {cache})")
+            return members
         
     async def setup_hook(self):
         """Setup the bot when it starts"""
         logger.info("Setting up bot...")
         
+        # Limits tuned at runtime with !limits override the configured ones
+        await asyncio.to_thread(self.load_rate_limits)
+        
         # Load all cogs
         cogs = [
             'cogs.moderation',
             'cogs.fun',
             'cogs.utils',
             'cogs.server_mgmt',
+            'cogs.economy',
+            'cogs.leveling',
+            'cogs.stats',
+            'cogs.admin',
             'cogs.help'
         ]
         
@@ -56,18 +137,59 @@ class GamingCommunityBot(commands.Bot):
             except Exception as e:
                 logger.error(f"Failed to load cog {cog}: {e}")
         
+        # Started after the cogs so every kind of pending action has its handler
+        await self.timed_actions.start()
+        
+        # Route game and confirmation events straight to their sessions
+        self.add_listener(self.sessions.on_message, 'on_message')
+        self.add_listener(self.sessions.on_reaction_add, 'on_reaction_add')
+        
+        if Config.WELCOME_CARDS and Config.WELCOME_CHANNEL_ID:
+            if self.welcome_cards.available:
+                self.welcome_cards.start()
+            else:
+                logger.warning("Pillow is not installed, welcome cards are disabled")
+        
+        # Register bot-level maintenance jobs
+        self.maintenance.register('chunk-locks', self.prune_chunk_locks, interval=3600, jitter=300, timeout=60)
+        self.maintenance.register('ratelimit-evict', self.evict_rate_limit_buckets, interval=300, jitter=30, timeout=30)
+        
         # Start background tasks
         if not self.cleanup_task.is_running():
             self.cleanup_task.start()
             
         logger.info("Bot setup complete!")
     
+    async def charge_rate_limit(self, ctx):
+        """Charge a command to the caller's rate limit buckets; cogs opt out with ``rate_limited = False``"""
+        if getattr(ctx.cog, 'rate_limited', True):
+            self.limiter.check(ctx)
+    
+    def load_rate_limits(self):
+        saved = read_json(data_path('ratelimits.json'))
+        if not saved:
+            return
+        for scope, (capacity, per) in saved.get('limits', {}).items():
+            if scope in self.limiter.pools:
+                self.limiter.set_limit(scope, capacity, per)
+        # Saved costs override the configured ones, but costs added to COMMAND_COSTS since still apply
+        self.limiter.costs = {**self.limiter.costs, **saved.get('costs', {})}
+        logger.info("Loaded rate limits from ratelimits.json")
+    
+    def save_rate_limits(self):
+        write_json_atomic(data_path('ratelimits.json'), self.limiter.to_dict())
+    
     async def on_ready(self):
         """Called when bot is ready"""
         logger.info(f'Bot is ready! Logged in as {self.user} (ID: {self.user.id})')
         logger.info(f'Bot is in {len(self.guilds)} guilds')
         logger.info(f'Prefix: {Config.BOT_PREFIX}')
         
+        # Seed the online index from the presences received at startup
+        if Config.PRESENCE_INTENT:
+            for guild in self.guilds:
+                await self.index_presences(guild)
+        
         # Update bot activity
         await self.change_presence(
             activity=discord.Activity(
@@ -76,10 +198,37 @@ class GamingCommunityBot(commands.Bot):
             )
         )
     
+    async def index_presences(self, guild):
+        """Rebuild a guild's online member index from the member cache"""
+        if not self.member_cache_flags.joined:
+            return  # Nothing cached; the index is filled by presence events alone
+        
+        online = []
+        async for member in cooperative(guild.members):
+            if member.status == discord.Status.online and not member.bot:
+                online.append(member.id)
+        self.presence.rebuild(guild.id, online)
+    
+    async def on_raw_presence_update(self, payload):
+        """Keep the online member index current"""
+        if payload.guild_id is None:
+            return
+        if payload.status == discord.Status.online:
+            self.presence.add(payload.guild_id, payload.user_id)
+        else:
+            self.presence.discard(payload.guild_id, payload.user_id)
+    
+    async def on_guild_remove(self, guild):
+        """Called when bot leaves a guild"""
+        self.presence.drop_guild(guild.id)
+    
     async def on_guild_join(self, guild):
         """Called when bot joins a new guild"""
         logger.info(f"Joined new guild: {guild.name} (ID: {guild.id})")
         
+        if Config.PRESENCE_INTENT:
+            await self.index_presences(guild)
+        
         # Send welcome message to general channel if available
         general_channel = discord.utils.get(guild.channels, name='general')
         if general_channel:
@@ -114,7 +263,13 @@ class GamingCommunityBot(commands.Bot):
                 embed.add_field(name="Account Created", value=member.created_at.strftime("%B %d, %Y"), inline=True)
                 embed.add_field(name="Member Count", value=member.guild.member_count, inline=True)
                 
-                await channel.send(embed=embed)
+                # Falls back to the plain embed when cards are off or the renderer is busy
+                card = await self.welcome_cards.render(member) if Config.WELCOME_CARDS else None
+                if card:
+                    embed.set_image(url="attachment://welcome.png")
+                    await channel.send(embed=embed, file=discord.File(io.BytesIO(card), filename="welcome.png"))
+                else:
+                    await channel.send(embed=embed)
         
         # Auto-assign newcomer role if exists
         if Config.NEW_MEMBER_ROLE_NAME:
@@ -128,6 +283,8 @@ class GamingCommunityBot(commands.Bot):
     
     async def on_member_remove(self, member):
         """Called when a member leaves"""
+        self.presence.discard(member.guild.id, member.id)
+        
         if Config.GOODBYE_CHANNEL_ID:
             channel = self.get_channel(Config.GOODBYE_CHANNEL_ID)
             if channel:
@@ -138,15 +295,26 @@ class GamingCommunityBot(commands.Bot):
                 )
                 embed.set_thumbnail(url=member.avatar.url if member.avatar else member.default_avatar.url)
                 embed.add_field(name="Member Count", value=member.guild.member_count, inline=True)
-                
                 await channel.send(embed=embed)
     
-    @tasks.loop(minutes=30)
+    @tasks.loop(seconds=Config.MAINTENANCE_TICK_SECONDS)
     async def cleanup_task(self):
-        """Background task for cleanup operations"""
-        logger.info("Running cleanup task...")
-        # Add any cleanup operations here
-        # For example: clean old database records, reset daily counters, etc.
+        """Background task that starts due maintenance jobs"""
+        # Cogs register their own jobs with self.maintenance
+        self.maintenance.run_due()
+    
+    async def prune_chunk_locks(self):
+        """Drop chunk locks for guilds the bot is no longer in"""
+        async for guild_id in cooperative(list(self._chunk_locks)):
+            lock = self._chunk_locks.get(guild_id)
+            if lock and not lock.locked() and not self.get_guild(guild_id):
+                self._chunk_locks.pop(guild_id, None)
+    
+    async def evict_rate_limit_buckets(self):
+        """Forget rate limit buckets that have refilled completely"""
+        evicted = self.limiter.evict_idle()
+        if evicted:
+            logger.debug(f"Evicted {evicted} idle rate limit buckets")
     
     @cleanup_task.before_loop
     async def before_cleanup_task(self):
@@ -159,15 +327,122 @@ class GamingCommunityBot(commands.Bot):
         elif isinstance(error, commands.MissingPermissions):
             await ctx.send("❌ You don't have permission to use this command!")
         elif isinstance(error, commands.CommandOnCooldown):
-            await ctx.send(f"⏰ Command on cooldown. Try again in {error.retry_after:.1f} seconds!")
+            # Spamming a limited command gets one reply, not one per attempt
+            if self.limiter.should_notify(ctx, error.retry_after):
+                await ctx.send(f"⏰ Command on cooldown. Try again in {error.retry_after:.1f} seconds!")
         else:
             logger.error(f"Command error in {ctx.command}: {error}")
             await ctx.send("❌ An error occurred while executing the command!")
     
+    async def add_cog(self, cog, **kwargs):
+        await super().add_cog(cog, **kwargs)
+        self.dispatch('cogs_changed')
+    
+    async def remove_cog(self, name, **kwargs):
+        cog = await super().remove_cog(name, **kwargs)
+        self.dispatch('cogs_changed')
+        return cog
+    
+    async def reload_extension_with_state(self, name):
+        """Reload an extension, carrying its cogs' in-memory state across
+
+        Cogs opt in by defining ``snapshot_state()`` and ``restore_state(state)``.
+        While a cog is in ``self.restoring`` its ``cog_load`` can skip loading
+        what ``restore_state`` will hand over. Returns the reload time in
+        seconds and the names of the restored cogs.
+        """
+        start = time.perf_counter()
+        
+        states = {}
+        for cog_name, cog in self.cogs.items():
+            snapshot = getattr(cog, 'snapshot_state', None)
+            if cog.__module__ == name and snapshot:
+                states[cog_name] = snapshot()
+        
+        self.restoring.update(states)
+        try:
+            await self.reload_extension(name)
+        finally:
+            self.restoring.difference_update(states)
+            # On failure discord.py rolls back to the old module, which still needs its state
+            restored = []
+            for cog_name, state in states.items():
+                cog = self.get_cog(cog_name)
+                if cog and hasattr(cog, 'restore_state'):
+                    cog.restore_state(state)
+                    restored.append(cog_name)
+        
+        elapsed = time.perf_counter() - start
+        logger.info(f"Reloaded {name} in {elapsed * 1000:.1f}ms (state restored: {', '.join(restored) or 'none'})")
+        return elapsed, restored
+    
+    def register_flush_hook(self, name, func):
+        """Register an async callable that saves in-memory state on shutdown"""
+        self.flush_hooks[name] = func
+    
+    def unregister_flush_hook(self, name):
+        """Remove a flush hook"""
+        self.flush_hooks.pop(name, None)
+    
+    @staticmethod
+    def consume_clean_marker():
+        """Check for and remove the clean shutdown marker"""
+        path = data_path('clean_shutdown.json')
+        marker = read_json(path)
+        if marker is None:
+            logger.warning("No clean shutdown marker found, previous run may have crashed")
+            return False
+        
+        os.remove(path)
+        logger.info(f"Previous run shut down cleanly at {marker.get('time')}")
+        return True
+    
+    async def flush_state(self):
+        """Run all flush hooks in parallel under the shutdown deadline"""
+        if self._flushed:
+            return True
+        self._flushed = True
+        
+        names = list(self.flush_hooks)
+        logger.info(f"Flushing state: {', '.join(names) or 'nothing to flush'}")
+        
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*(self.flush_hooks[name]() for name in names), return_exceptions=True),
+                timeout=Config.SHUTDOWN_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"State flush did not finish within {Config.SHUTDOWN_TIMEOUT}s")
+            return False
+        
+        clean = True
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Flush hook {name} failed: {result}")
+                clean = False
+        
+        if clean:
+            write_json_atomic(data_path('clean_shutdown.json'), {'time': datetime.utcnow().isoformat()})
+        return clean
+    
+    async def close(self):
+        """Stop background work and flush state before closing the connection"""
+        self.cleanup_task.cancel()
+        await self.maintenance.stop()
+        await self.timed_actions.stop()
+        await self.flush_state()
+        self.welcome_cards.close()
+        await super().close()
+    
     async def get_uptime(self):
         """Get bot uptime"""
         return datetime.now() - self.start_time
 
+async def shutdown(bot, sig):
+    """Close the bot after a termination signal"""
+    logger.info(f"Received {sig.name}, shutting down...")
+    await bot.close()
+
 async def main():
     """Main function to run the bot"""
     # Validate configuration
@@ -180,6 +455,14 @@ async def main():
     # Create and run bot
     bot = GamingCommunityBot()
     
+    # Shut down gracefully on SIGTERM/SIGINT so cogs can flush their state
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, lambda sig=sig: asyncio.create_task(shutdown(bot, sig)))
+        except NotImplementedError:
+            pass  # Signal handlers are not supported on Windows
+    
     try:
         await bot.start(Config.DISCORD_TOKEN)
     except discord.LoginFailure:
@@ -0,0 +1,70 @@
+"""Dispatch cost of a message with N idle games waiting in other channels
+
+Compares ``Bot.wait_for``, where every waiter's check runs on every event,
+with ``SessionRouter``. Run from the repository root:
+
+    python -m tests.bench_session_router
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+
+from core.sessions import SessionRouter
+
+SIZES = (10, 100, 1000, 10000)
+EVENTS = 2000
+
+class Bot(commands.Bot):
+    @property
+    def on_message(self):
+        # No command handler, so dispatch only runs the waiter checks
+        raise AttributeError('on_message')
+
+def message(channel_id):
+    return SimpleNamespace(channel=SimpleNamespace(id=channel_id), author=SimpleNamespace(bot=False))
+
+async def bench_wait_for(waiting):
+    async with Bot(command_prefix='!', intents=discord.Intents.none()) as bot:
+        waiters = [
+            asyncio.ensure_future(bot.wait_for('message', check=lambda m, c=channel_id: m.channel.id == c))
+            for channel_id in range(1, waiting + 1)
+        ]
+        await asyncio.sleep(0)
+        event = message(0)
+
+        start = time.perf_counter()
+        for _ in range(EVENTS):
+            bot.dispatch('message', event)
+        elapsed = time.perf_counter() - start
+
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+    return elapsed / EVENTS
+
+async def bench_router(waiting):
+    router = SessionRouter()
+    sessions = [router.open(channel_id=channel_id) for channel_id in range(1, waiting + 1)]
+    event = message(0)
+
+    start = time.perf_counter()
+    for _ in range(EVENTS):
+        await router.on_message(event)
+    elapsed = time.perf_counter() - start
+
+    for session in sessions:
+        session.close()
+    return elapsed / EVENTS
+
+async def main():
+    print(f"{'N':>7} {'bot.wait_for':>14} {'router':>10}")
+    for waiting in SIZES:
+        wait_for = await bench_wait_for(waiting)
+        router = await bench_router(waiting)
+        print(f"{waiting:>7} {wait_for * 1e6:>12.1f}us {router * 1e6:>8.2f}us")
+
+if __name__ == '__main__':
+    asyncio.run(main())
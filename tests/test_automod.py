@@ -0,0 +1,97 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.automod import AutoModEngine, compile_safe
+
+HOSTILE = [r'(a+)+$', r'(a|aa)+$', r'(\w+\s?)+$', r'\d+\d+x', r'.*.*=.*', r'(x)\1*', r'(a{1,30}){1,30}b',
+           'a' * 201]
+SAFE = [r'f+u+c+k+', r'discord\.gg/\w+', r'(\d\d\d\.){3}\d{1,3}', r'.*foo.*', r'(foo|bar)+']
+# Slow on long input but not caught by compile_safe; only the sandbox's time limit stops them
+SLOW = [(r'.*a.*a.*a.*x', 'a' * 200), (r'\w+\s*\w+\s*\w+!', 'a' * 400)]
+
+def message(content, guild_id=1):
+    return SimpleNamespace(content=content, guild=SimpleNamespace(id=guild_id), mention_everyone=False)
+
+@pytest.mark.parametrize('pattern', HOSTILE)
+def test_hostile_patterns_are_rejected(pattern):
+    with pytest.raises(ValueError):
+        compile_safe(pattern)
+
+@pytest.mark.parametrize('pattern', SAFE)
+def test_ordinary_patterns_compile(pattern):
+    assert compile_safe(pattern).pattern == pattern
+
+def test_configure_refuses_hostile_pattern():
+    engine = AutoModEngine()
+    with pytest.raises(ValueError):
+        engine.configure(1, 'regex', enabled=True, patterns=[r'(a+)+$'])
+    assert 'regex' not in engine.settings.get(1, {})
+    engine.close()
+
+def test_stored_hostile_pattern_cannot_stall_the_loop():
+    # Settings saved before patterns were checked still load, but the rule is skipped
+    engine = AutoModEngine()
+    engine.load({'1': {'regex': {'enabled': True, 'patterns': [r'(a+)+$', r'(a{1,30}){1,30}b']}}})
+
+    async def evaluate():
+        return await engine.evaluate(message('a' * 27 + 'b'))
+
+    start = time.perf_counter()
+    assert asyncio.run(evaluate()) is None
+    assert time.perf_counter() - start < 0.5
+    engine.close()
+
+@pytest.mark.parametrize('pattern, content', SLOW)
+def test_slow_pattern_is_killed_without_stalling_the_loop(pattern, content):
+    engine = AutoModEngine(expensive_timeout=0.3)
+    engine.configure(1, 'regex', enabled=True, patterns=[pattern])
+    engine.sandbox.search(['warm up'], '')  # start the worker outside the timed part
+
+    async def evaluate():
+        # The loop keeps ticking while the search runs
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        verdict = await engine.evaluate(message(content))
+        ticker.cancel()
+        return verdict, ticks
+
+    start = time.perf_counter()
+    verdict, ticks = asyncio.run(evaluate())
+    assert verdict is None
+    assert time.perf_counter() - start < 2
+    assert ticks >= 10
+    assert engine.stats[(1, 'regex')].timeouts == 1
+
+    # The killed worker is replaced
+    assert engine.sandbox.search([r'free\s+nitro'], 'free nitro') == 0
+    engine.close()
+
+def test_safe_pattern_still_matches():
+    engine = AutoModEngine()
+    engine.configure(1, 'regex', enabled=True, patterns=[r'free\s+nitro'])
+    verdict = asyncio.run(engine.evaluate(message('get FREE   nitro here')))
+    assert verdict.rule == 'regex'
+    engine.close()
+
+def test_cached_verdict_respects_surrounding_whitespace():
+    # A message that only passed because it was shorter must not clear its padded copy
+    engine = AutoModEngine()
+    engine.configure(1, 'length', enabled=True, max_length=10)
+
+    async def evaluate():
+        return await engine.evaluate(message('hello')), await engine.evaluate(message('hello' + ' ' * 10))
+
+    short, padded = asyncio.run(evaluate())
+    assert short is None
+    assert padded.rule == 'length'
+    engine.close()